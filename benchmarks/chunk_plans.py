@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the chunk plans of `cf_data_struct.io.chunking` for grid products.
+
+A synthetic (time, yc, xc) grid is written once per access pattern with the planned
+chunk shapes and compression settings. For each plan the write throughput, the file
+size and the read latency of both access patterns is reported: a map read (first
+time step) and a time series read (center grid cell). The reads use the chunk
+cache size of the plan.
+
+Usage:
+
+    python benchmarks/chunk_plans.py --shape 365 400 400 --output chunk_plans.json
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple, Union
+
+import netCDF4
+import numpy as np
+
+from cf_data_struct.datastruct import CFVariable, GridCFStruct
+from cf_data_struct.io.chunking import (VALID_ACCESS_PATTERNS, ChunkPlan,
+                                        plan_chunks, set_chunk_caches)
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import CFStructBaseClass
+
+
+def benchmark_chunk_plans(
+        struct: "CFStructBaseClass",
+        directory: Union[str, Path],
+        access_patterns: Sequence[str] = None,
+        repeat: int = 3,
+        **kwargs
+) -> List[Dict[str, Any]]:
+    """
+    Write the data structure once per chunk plan and report the write throughput
+    and the read latency of both access patterns for the variable with the most
+    dimensions (a map read of the first index of the non-horizontal dimensions and
+    a time series read of the center grid cell). The reads use the planned chunk caches.
+
+    :param struct: The CF data structure
+    :param directory: Directory for the benchmark files
+    :param access_patterns: The access patterns to benchmark (default: all)
+    :param repeat: Number of read repetitions (the minimum latency is reported)
+    :param kwargs: Keywords for `plan_chunks`
+
+    :return: List of result dictionaries (one per access pattern)
+    """
+    access_patterns = VALID_ACCESS_PATTERNS if access_patterns is None else access_patterns
+    if not struct._vars:
+        raise ValueError("Data structure has no variables")
+    var = max(struct._vars.values(), key=lambda v: (len(v.dims), v.value.size))
+    size_mb = sum(v.value.nbytes for v in list(struct._dims.values()) + list(struct._vars.values())) / 1024 ** 2
+
+    results = []
+    for access_pattern in access_patterns:
+        plans = plan_chunks(struct, access_pattern=access_pattern, **kwargs)
+        path = Path(directory) / f"chunk_benchmark_{access_pattern}.nc"
+        t0 = time.perf_counter()
+        struct.to_netcdf(path, encoding={name: plan.encoding for name, plan in plans.items()})
+        write_time = time.perf_counter() - t0
+
+        map_index = tuple(0 for _ in var.dims[:-2]) + (slice(None),) * min(2, len(var.dims))
+        timeseries_index = tuple(slice(None) for _ in var.dims[:-2]) + tuple(
+            size // 2 for size in var.value.shape[-2:]
+        )
+        results.append({
+            "access_pattern": access_pattern,
+            "variable": var.name,
+            "chunksizes": plans[var.name].chunksizes,
+            "write_mb_per_s": size_mb / write_time,
+            "file_size_mb": path.stat().st_size / 1024 ** 2,
+            "map_read_latency_s": _read_latency(path, var.name, map_index, repeat, plans),
+            "timeseries_read_latency_s": _read_latency(path, var.name, timeseries_index, repeat, plans),
+        })
+    return results
+
+
+def _read_latency(path: Path, var_name: str, index: Tuple, repeat: int, plans: Dict[str, ChunkPlan]) -> float:
+    """
+    Minimum time to open a file and read a hyperslab of a variable
+
+    :param path: The netCDF file
+    :param var_name: The variable name
+    :param index: The hyperslab index
+    :param repeat: Number of repetitions
+    :param plans: The chunk plans (for the chunk cache sizes)
+
+    :return: Read latency in seconds
+    """
+    latencies = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with netCDF4.Dataset(path) as dataset:
+            set_chunk_caches(dataset, plans)
+            dataset.variables[var_name][index]
+        latencies.append(time.perf_counter() - t0)
+    return min(latencies)
+
+
+def _get_grid(shape: Tuple[int, int, int]) -> GridCFStruct:
+    dims = (
+        CFVariable("time", np.arange(shape[0], dtype="f8"), "time"),
+        CFVariable("yc", np.arange(shape[1], dtype="f8"), "yc"),
+        CFVariable("xc", np.arange(shape[2], dtype="f8"), "xc")
+    )
+    struct = GridCFStruct(dims=dims)
+    value = np.random.default_rng(0).random(shape, dtype="float32")
+    struct.add_variable(CFVariable("sea_ice_thickness", value, ("time", "yc", "xc"), var_id="sit"))
+    return struct
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shape", type=int, nargs=3, default=(100, 200, 200), help="Grid shape (time, yc, xc)")
+    parser.add_argument("--chunk-bytes", type=int, default=None, help="Target chunk size in bytes")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of read repetitions")
+    parser.add_argument("--output", type=Path, default=None, help="Result JSON file")
+    args = parser.parse_args(argv)
+
+    kwargs = {} if args.chunk_bytes is None else {"chunk_bytes": args.chunk_bytes}
+    with tempfile.TemporaryDirectory(prefix="cf_data_struct_chunk_plans_") as directory:
+        results = benchmark_chunk_plans(_get_grid(tuple(args.shape)), directory, repeat=args.repeat, **kwargs)
+    for result in results:
+        print(
+            f"{result['access_pattern']:<12s} chunks={result['chunksizes']} "
+            f"write={result['write_mb_per_s']:8.1f} MB/s size={result['file_size_mb']:8.1f} MB "
+            f"map={result['map_read_latency_s'] * 1e3:8.2f} ms "
+            f"timeseries={result['timeseries_read_latency_s'] * 1e3:8.2f} ms"
+        )
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite for the hot paths of cf_data_struct:
+
+- construction of `CFVariable` instances of different size
+- adding hundreds of variables to a `GridCFStruct`
+- validation throughput of the variable attribute models
+- CF time encoding and decoding of datetime64 arrays
+- end-to-end netCDF export of small, medium and large trajectory and grid products
+- skipped export of unchanged grid products (content digest only)
+- Zarr export of grid products (if zarr is installed)
+
+Each scenario is timed with `timeit` (the number of calls per repeat is calibrated
+automatically) and the results are written to a JSON file. If a baseline result file
+is given, the median timings are compared and the script exits with a non-zero
+return code if a scenario is slower than the baseline by more than the tolerance.
+
+Usage:
+
+    python benchmarks/run_benchmarks.py --output baseline.json
+    python benchmarks/run_benchmarks.py --output current.json --baseline baseline.json --tolerance 0.2
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import argparse
+import functools
+import importlib.util
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import cf_data_struct
+from cf_data_struct.coding.times import (TimeEncoding, decode_times,
+                                         encode_times, get_time_encoding)
+from cf_data_struct.datamodels import (BasicVarAttrs, FlagVarAttrs,
+                                       GridVarAttrs, TimeVarAttrs)
+from cf_data_struct.datastruct import (CFVariable, GridCFStruct,
+                                       TrajectoryCFStruct)
+
+RESULT_FORMAT_VERSION = 1
+
+# Product sizes: trajectory (number of records) and grid (ny, nx)
+TRAJECTORY_SIZES = {"small": 1_000, "medium": 100_000, "large": 2_000_000}
+GRID_SIZES = {"small": (100, 100), "medium": (500, 500), "large": (2000, 2000)}
+N_EXPORT_VARIABLES = 8
+
+
+@dataclass
+class Scenario:
+    """
+    A benchmark scenario. `setup` is called once (not timed) and returns the
+    arguments of `func`, which is timed.
+    """
+    name: str
+    param: str
+    setup: Callable[[], Tuple]
+    func: Callable[..., Any]
+    quick: bool = True
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.param}]"
+
+
+# --- Scenarios ---
+
+def _setup_variable(size: int) -> Tuple:
+    return (np.random.default_rng(0).random(size), )
+
+
+def _create_variable(value: np.ndarray) -> CFVariable:
+    return CFVariable("sea_ice_thickness", value, "time", attributes={"long_name": "sea ice thickness"})
+
+
+def _create_variable_copy(value: np.ndarray) -> CFVariable:
+    return CFVariable("sea_ice_thickness", value, "time", copy=True)
+
+
+def _setup_grid_variables(n_variables: int) -> Tuple:
+    shape = (100, 100)
+    dims = (CFVariable("yc", np.arange(shape[0], dtype="f8"), "yc"),
+            CFVariable("xc", np.arange(shape[1], dtype="f8"), "xc"))
+    value = np.zeros(shape, dtype="float32")
+    attributes = {"long_name": "variable", "units": "m", "grid_mapping": "Lambert_Azimuthal_Grid"}
+    variables = [
+        CFVariable(f"variable_{i}", value, ("yc", "xc"), var_id=f"v{i}", attributes=attributes)
+        for i in range(n_variables)
+    ]
+    return dims, variables
+
+
+def _add_grid_variables(dims: Tuple[CFVariable, ...], variables: List[CFVariable]) -> GridCFStruct:
+    grid = GridCFStruct(dims=dims)
+    for var in variables:
+        grid.add_variable(var)
+    return grid
+
+
+ATTRIBUTE_SAMPLES = {
+    "BasicVarAttrs": (BasicVarAttrs, {
+        "long_name": "sea ice thickness", "standard_name": "sea_ice_thickness", "units": "m",
+        "coverage_content_type": "physicalMeasurement", "valid_min": 0.0, "valid_max": 10.0
+    }),
+    "GridVarAttrs": (GridVarAttrs, {
+        "long_name": "sea ice thickness", "units": "m", "grid_mapping": "Lambert_Azimuthal_Grid",
+        "cell_methods": "area: mean"
+    }),
+    "FlagVarAttrs": (FlagVarAttrs, {
+        "long_name": "status flag", "flag_values": [0, 1, 2, 3], "flag_meanings": "nominal no_data land ocean"
+    }),
+    "TimeVarAttrs": (TimeVarAttrs, {
+        "long_name": "time", "units": "seconds since 1970-01-01", "calendar": "standard"
+    }),
+}
+N_ATTRIBUTE_VALIDATIONS = 1000
+
+
+def _setup_attributes(model_name: str) -> Tuple:
+    model, attributes = ATTRIBUTE_SAMPLES[model_name]
+    return model, [dict(attributes, comment=f"record {i}") for i in range(N_ATTRIBUTE_VALIDATIONS)]
+
+
+def _validate_attributes(model: type, records: List[Dict]) -> None:
+    for record in records:
+        model.model_validate(record)
+
+
+def _setup_trajectory_export(size_name: str) -> Tuple:
+    n_records = TRAJECTORY_SIZES[size_name]
+    rng = np.random.default_rng(0)
+    time = np.datetime64("2024-01-01T00:00:00") + np.arange(n_records).astype("m8[s]")
+    attributes = {"long_name": "time", "calendar": "standard"}
+    struct = TrajectoryCFStruct(dims=CFVariable("time", time, "time", attributes=attributes))
+    for i in range(N_EXPORT_VARIABLES):
+        struct.add_variable(CFVariable(f"variable_{i}", rng.random(n_records), "time", var_id=f"v{i}"))
+    return struct, _get_output_path(f"trajectory_{size_name}.nc")
+
+
+def _setup_time_coding(size: int, calendar: str) -> Tuple:
+    # 1 second resolution, 1 Hz sampling with a gap (no leap day for the noleap calendar)
+    time = np.datetime64("2023-03-01T00:00:00") + np.arange(size).astype("m8[s]")
+    time[size // 2:] += np.timedelta64(3600, "s")
+    return time, get_time_encoding(time, calendar=calendar)
+
+
+def _setup_time_decoding(size: int, calendar: str) -> Tuple:
+    time, encoding = _setup_time_coding(size, calendar)
+    return encode_times(time, encoding), encoding
+
+
+def _encode_times(time: np.ndarray, encoding: TimeEncoding) -> np.ndarray:
+    return encode_times(time, encoding)
+
+
+def _decode_times(value: np.ndarray, encoding: TimeEncoding) -> np.ndarray:
+    return decode_times(value, encoding.units, encoding.calendar)
+
+
+def _setup_grid_export(size_name: str) -> Tuple:
+    shape = GRID_SIZES[size_name]
+    rng = np.random.default_rng(0)
+    dims = (CFVariable("yc", np.arange(shape[0], dtype="f8"), "yc"),
+            CFVariable("xc", np.arange(shape[1], dtype="f8"), "xc"))
+    struct = GridCFStruct(dims=dims)
+    for i in range(N_EXPORT_VARIABLES):
+        value = rng.random(shape, dtype="float32")
+        struct.add_variable(CFVariable(f"variable_{i}", value, ("yc", "xc"), var_id=f"v{i}"))
+    return struct, _get_output_path(f"grid_{size_name}.nc")
+
+
+def _setup_grid_export_zarr(size_name: str) -> Tuple:
+    struct, path = _setup_grid_export(size_name)
+    return struct, path.with_suffix(".zarr")
+
+
+def _setup_grid_export_unchanged(size_name: str) -> Tuple:
+    struct, path = _setup_grid_export(size_name)
+    path = path.with_name(f"unchanged_{path.name}")
+    struct.to_netcdf(path, skip_unchanged=True)
+    return struct, path
+
+
+def _export(struct: Any, path: Path) -> Path:
+    return struct.to_netcdf(path)
+
+
+def _export_skip_unchanged(struct: Any, path: Path) -> Path:
+    return struct.to_netcdf(path, skip_unchanged=True)
+
+
+def _export_zarr(struct: Any, path: Path) -> Path:
+    return struct.to_zarr(path)
+
+
+_OUTPUT_DIR: Optional[tempfile.TemporaryDirectory] = None
+
+
+def _get_output_path(filename: str) -> Path:
+    global _OUTPUT_DIR
+    if _OUTPUT_DIR is None:
+        _OUTPUT_DIR = tempfile.TemporaryDirectory(prefix="cf_data_struct_benchmarks_")
+    return Path(_OUTPUT_DIR.name) / filename
+
+
+def get_scenarios() -> List[Scenario]:
+    """
+    All benchmark scenarios. Scenarios with `quick=False` are skipped in quick mode.
+
+    :return: List of scenarios
+    """
+    scenarios = []
+    for size in (1_000, 100_000, 10_000_000):
+        quick = size <= 100_000
+        scenarios.append(Scenario(
+            "cfvariable_create", str(size), lambda size=size: _setup_variable(size), _create_variable, quick
+        ))
+        scenarios.append(Scenario(
+            "cfvariable_create_copy", str(size), lambda size=size: _setup_variable(size), _create_variable_copy, quick
+        ))
+    for n_variables in (100, 500):
+        scenarios.append(Scenario(
+            "grid_add_variables", str(n_variables), lambda n=n_variables: _setup_grid_variables(n), _add_grid_variables
+        ))
+    for model_name in ATTRIBUTE_SAMPLES:
+        scenarios.append(Scenario(
+            "attribute_validation", model_name, lambda name=model_name: _setup_attributes(name), _validate_attributes
+        ))
+    for size in (100_000, 10_000_000):
+        for calendar in ("standard", "noleap"):
+            param, quick = f"{calendar}-{size}", size <= 100_000
+            setup = functools.partial(_setup_time_coding, size, calendar)
+            scenarios.append(Scenario("time_encoding", param, setup, _encode_times, quick))
+            setup = functools.partial(_setup_time_decoding, size, calendar)
+            scenarios.append(Scenario("time_decoding", param, setup, _decode_times, quick))
+    for size_name in TRAJECTORY_SIZES:
+        scenarios.append(Scenario(
+            "export_trajectory", size_name, lambda name=size_name: _setup_trajectory_export(name), _export,
+            size_name != "large"
+        ))
+    for size_name in GRID_SIZES:
+        scenarios.append(Scenario(
+            "export_grid", size_name, lambda name=size_name: _setup_grid_export(name), _export,
+            size_name != "large"
+        ))
+    for size_name in GRID_SIZES:
+        scenarios.append(Scenario(
+            "export_grid_unchanged", size_name, lambda name=size_name: _setup_grid_export_unchanged(name),
+            _export_skip_unchanged, size_name != "large"
+        ))
+    if importlib.util.find_spec("zarr") is not None:
+        for size_name in GRID_SIZES:
+            scenarios.append(Scenario(
+                "export_grid_zarr", size_name, lambda name=size_name: _setup_grid_export_zarr(name), _export_zarr,
+                size_name != "large"
+            ))
+    return scenarios
+
+
+# --- Runner ---
+
+def run_scenario(scenario: Scenario, repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    """
+    Time a scenario. The number of calls per repeat is calibrated such that one repeat
+    takes at least `min_time` seconds.
+
+    :param scenario: The benchmark scenario
+    :param repeat: Number of repeats
+    :param min_time: Minimum duration of a repeat in seconds
+
+    :return: Timing statistics in seconds per call
+    """
+    args = scenario.setup()
+    timer = timeit.Timer(lambda: scenario.func(*args))
+    number = 1
+    while (duration := timer.timeit(number)) < min_time and number < 1_000_000:
+        number = max(number * 2, int(number * min_time / max(duration, 1e-9) * 1.1))
+    timings = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "name": scenario.name,
+        "param": scenario.param,
+        "number": number,
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def get_metadata() -> Dict[str, Any]:
+    """
+    Environment of the benchmark run (versions, host and git revision)
+    """
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "format_version": RESULT_FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cf_data_struct": getattr(cf_data_struct, "__version__", None),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def compare_results(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Compare median timings against a baseline.
+
+    :param results: The benchmark results {key: timing statistics}
+    :param baseline: The baseline results {key: timing statistics}
+    :param tolerance: Allowed relative slowdown (e.g. 0.2 for 20%)
+
+    :return: List of comparisons with the ratio current/baseline and the status
+        ("regression", "improvement", "unchanged" or "new")
+    """
+    comparisons = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            comparisons.append({"key": key, "ratio": None, "status": "new"})
+            continue
+        ratio = result["median"] / reference["median"]
+        if ratio > 1.0 + tolerance:
+            status = "regression"
+        elif ratio < 1.0 / (1.0 + tolerance):
+            status = "improvement"
+        else:
+            status = "unchanged"
+        comparisons.append({"key": key, "ratio": ratio, "status": status})
+    return comparisons
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"), help="Result JSON file")
+    parser.add_argument("--baseline", type=Path, default=None, help="Baseline result JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown (default: 0.2)")
+    parser.add_argument("--filter", default=None, help="Run only scenarios containing this string")
+    parser.add_argument("--quick", action="store_true", help="Skip the large scenarios")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repeats per scenario")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum duration of a repeat [s]")
+    args = parser.parse_args(argv)
+
+    scenarios = [
+        scenario for scenario in get_scenarios()
+        if (args.filter is None or args.filter in scenario.key) and (scenario.quick or not args.quick)
+    ]
+    results = {}
+    for scenario in scenarios:
+        results[scenario.key] = run_scenario(scenario, repeat=args.repeat, min_time=args.min_time)
+        print(f"{scenario.key:<45s} {results[scenario.key]['median'] * 1e3:12.3f} ms")
+
+    args.output.write_text(json.dumps({"metadata": get_metadata(), "benchmarks": results}, indent=2))
+    print(f"Results written to {args.output}")
+    if args.baseline is None:
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())["benchmarks"]
+    comparisons = compare_results(results, baseline, args.tolerance)
+    for comparison in comparisons:
+        ratio = "-" if comparison["ratio"] is None else f"{comparison['ratio']:.2f}x"
+        print(f"{comparison['key']:<45s} {ratio:>8s}  {comparison['status']}")
+    regressions = [comparison["key"] for comparison in comparisons if comparison["status"] == "regression"]
+    if regressions:
+        print(f"Performance regressions (> {args.tolerance:.0%} slower than baseline): {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,9 +7,12 @@ The datastruct models contains the data structures
 __author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
 
 from cf_data_struct.datastruct import (CFVariable, GridCFStruct,
-                                       TrajectoryCFStruct)
+                                       TrajectoryCFStruct,
+                                       TrajectoryCollectionCFStruct)
 
-__all__ = ["datamodels", "datastruct", "TrajectoryCFStruct", "GridCFStruct", "CFVariable"]
+__all__ = [
+    "datamodels", "datastruct", "TrajectoryCFStruct", "TrajectoryCollectionCFStruct", "GridCFStruct", "CFVariable"
+]
 
 
 # class BaseDataStruct(object):
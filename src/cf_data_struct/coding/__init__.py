@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+"""
+The coding module contains the vectorized conversion between the in-memory
+representation of variable data and its CF encoded representation on disk.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from cf_data_struct.coding.flags import (get_flag_dtype, get_flag_mask,
+                                         get_flag_masks, pack_flag_masks)
+from cf_data_struct.coding.packing import (PackingParameters,
+                                           get_packing_parameters, pack_array,
+                                           unpack_array)
+from cf_data_struct.coding.quantization import (bitround_array,
+                                                significant_digits_to_bits)
+from cf_data_struct.coding.times import (TimeEncoding, decode_times,
+                                         encode_times, get_time_encoding)
+
+__all__ = [
+    "flags", "packing", "quantization", "times", "PackingParameters", "TimeEncoding", "bitround_array",
+    "decode_times", "encode_times", "get_flag_dtype", "get_flag_mask", "get_flag_masks", "get_packing_parameters",
+    "get_time_encoding", "pack_array", "pack_flag_masks", "significant_digits_to_bits", "unpack_array"
+]
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact storage and vectorized decoding of CF flag variables.
+
+CF flag variables describe their values with `flag_meanings` and either
+`flag_values` (mutually exclusive states), `flag_masks` (independent boolean
+flags packed into the bits of an integer) or both (bit fields with several
+states). See CF conventions section 3.5:
+https://cfconventions.org/cf-conventions/cf-conventions.html#flags
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Candidate integer types of flag variables (smallest first)
+SIGNED_FLAG_DTYPES = ["int8", "int16", "int32", "int64"]
+UNSIGNED_FLAG_DTYPES = ["uint8", "uint16", "uint32", "uint64"]
+
+
+def is_flag_variable(attributes: Any) -> bool:
+    """
+    Check if variable attributes describe a flag variable (`flag_values` or `flag_masks`)
+
+    :param attributes: The variable attributes
+
+    :return: Flag variable flag
+    """
+    return any(getattr(attributes, name, None) is not None for name in ("flag_values", "flag_masks"))
+
+
+def get_flag_dtype(values: Iterable[int], allow_unsigned: bool = True) -> np.dtype:
+    """
+    The smallest integer type that can represent all values (e.g. flag values, flag
+    masks, missing value and the range of the data).
+
+    :param values: Integer values
+    :param allow_unsigned: Use unsigned integer types for non-negative values
+        (not supported by netCDF3/netCDF4 classic files)
+
+    :return: Integer data type
+    """
+    values = [int(value) for value in values]
+    vmin, vmax = (min(values), max(values)) if values else (0, 0)
+    candidates = UNSIGNED_FLAG_DTYPES if allow_unsigned and vmin >= 0 else SIGNED_FLAG_DTYPES
+    for dtype in map(np.dtype, candidates):
+        info = np.iinfo(dtype)
+        if info.min <= vmin and vmax <= info.max:
+            return dtype
+    raise ValueError(f"Flag values out of integer range: [{vmin}, {vmax}]")
+
+
+def get_flag_mask(value: np.ndarray, attributes: Any, flag_meaning: str) -> np.ndarray:
+    """
+    Boolean mask of the elements of a flag variable that have a flag meaning
+
+    :param value: The flag variable data
+    :param attributes: The flag variable attributes (`flag_meanings`, `flag_values` and/or `flag_masks`)
+    :param flag_meaning: One of the flag meanings
+
+    :raises ValueError: Unknown flag meaning
+
+    :return: Boolean array with the shape of `value`
+    """
+    meanings = _get_flag_meanings(attributes)
+    if flag_meaning not in meanings:
+        raise ValueError(f"{flag_meaning=} not in {meanings=}")
+    index = meanings.index(flag_meaning)
+    flag_values, flag_masks = _get_flag_definitions(attributes)
+    value = np.asarray(value)
+    if flag_masks is None:
+        return value == flag_values[index]
+    masked = np.bitwise_and(value, np.asarray(flag_masks[index]).astype(value.dtype))
+    if flag_values is None:
+        return masked != 0
+    return masked == flag_values[index]
+
+
+def get_flag_masks(value: np.ndarray, attributes: Any) -> Dict[str, np.ndarray]:
+    """
+    Boolean masks of all flag meanings of a flag variable
+
+    :param value: The flag variable data
+    :param attributes: The flag variable attributes
+
+    :return: Dictionary {flag meaning: boolean array}
+    """
+    return {meaning: get_flag_mask(value, attributes, meaning) for meaning in _get_flag_meanings(attributes)}
+
+
+def pack_flag_masks(flags: Mapping[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Pack boolean flags into the bits of an unsigned integer array (one bit per flag).
+
+    :param flags: Dictionary {flag meaning: boolean array}. All arrays must have the same shape.
+
+    :return: The packed flag array and the attributes `flag_masks` and `flag_meanings`
+    """
+    if not flags:
+        raise ValueError("No flags to pack")
+    flag_masks = [1 << bit for bit in range(len(flags))]
+    dtype = get_flag_dtype([sum(flag_masks)])
+    shapes = {np.shape(flag) for flag in flags.values()}
+    if len(shapes) != 1:
+        raise ValueError(f"Flags have different shapes: {shapes}")
+    packed = np.zeros(shapes.pop(), dtype=dtype)
+    for bit, flag in enumerate(flags.values()):
+        packed |= np.asarray(flag, dtype=bool).astype(dtype) << dtype.type(bit)
+    attributes = {"flag_masks": flag_masks, "flag_meanings": " ".join(flags)}
+    return packed, attributes
+
+
+def get_flag_attribute_values(attributes: Any) -> List[int]:
+    """
+    All integer values defined by the flag attributes (flag values, flag masks,
+    missing value) that the data type of a flag variable must be able to represent.
+
+    :param attributes: The flag variable attributes
+
+    :return: List of integer values
+    """
+    flag_values, flag_masks = _get_flag_definitions(attributes)
+    values = list(flag_values or []) + list(flag_masks or [])
+    missing_value = getattr(attributes, "missing_value", None)
+    if missing_value is not None:
+        values.append(missing_value)
+    return [int(value) for value in values]
+
+
+def _get_flag_meanings(attributes: Any) -> List[str]:
+    flag_meanings = getattr(attributes, "flag_meanings", None)
+    if flag_meanings is None:
+        raise ValueError("Flag variable has no flag_meanings attribute")
+    return flag_meanings.split()
+
+
+def _get_flag_definitions(attributes: Any) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+    flag_values = getattr(attributes, "flag_values", None)
+    flag_masks = getattr(attributes, "flag_masks", None)
+    if flag_values is None and flag_masks is None:
+        raise ValueError("Flag variable has neither flag_values nor flag_masks attribute")
+    return _to_int_list(flag_values), _to_int_list(flag_masks)
+
+
+def _to_int_list(items: Optional[Iterable[Any]]) -> Optional[List[int]]:
+    """
+    Convert flag values (int or bytes) to a list of integers
+    """
+    if items is None:
+        return None
+    return [int.from_bytes(item, "little") if isinstance(item, bytes) else int(item) for item in items]
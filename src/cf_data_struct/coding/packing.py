@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+Packing of floating point data into integers with the CF attributes
+`scale_factor` and `add_offset`:
+
+    unpacked_value = packed_value * scale_factor + add_offset
+
+The netCDF default fill value of the integer type (smallest value + 1) is used as
+`missing_value`, and `valid_min`/`valid_max` define the range of valid packed values
+above it. The smallest value of the integer type is not used.
+
+Arrays are processed in blocks of bounded size, thus the only temporary arrays
+are of block size, independent of the size of the variable.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, field_validator
+
+from cf_data_struct.utils import DEFAULT_BLOCK_BYTES, iter_blocks
+
+VALID_PACKED_DTYPES = ["int8", "int16", "int32"]
+
+
+class PackingParameters(BaseModel):
+    """
+    CF packing attributes of a variable
+    """
+    dtype: str
+    scale_factor: float
+    add_offset: float
+    missing_value: int
+    valid_min: int
+    valid_max: int
+
+    # noinspection PyNestedDecorators
+    @field_validator("dtype")
+    @classmethod
+    def valid_dtype(cls, dtype: str) -> str:
+        if dtype not in VALID_PACKED_DTYPES:
+            raise ValueError(f"{dtype=} not in {VALID_PACKED_DTYPES=}")
+        return dtype
+
+    @property
+    def attributes(self) -> Dict[str, Any]:
+        """
+        CF variable attributes of the packed variable
+        """
+        return self.model_dump(exclude={"dtype"})
+
+
+def get_packing_parameters(
+        value_range: Optional[Tuple[float, float]],
+        dtype: str = "int16"
+) -> PackingParameters:
+    """
+    Compute the scale factor and offset that map the value range on the range
+    of valid packed values, i.e. the integer type range except for the smallest value
+    and the netCDF default fill value, which is reserved for missing values.
+
+    :param value_range: (minimum, maximum) of the unpacked data or None if there is no valid data
+    :param dtype: The packed integer data type
+
+    :return: The packing parameters
+    """
+    dtype = np.dtype(dtype).name
+    if dtype not in VALID_PACKED_DTYPES:
+        raise ValueError(f"{dtype=} not in {VALID_PACKED_DTYPES=}")
+
+    info = np.iinfo(dtype)
+    vmin, vmax = (0.0, 0.0) if value_range is None else (float(value_range[0]), float(value_range[1]))
+    valid_min, valid_max = int(info.min) + 2, int(info.max)
+    scale_factor = (vmax - vmin) / (valid_max - valid_min) if vmax > vmin else 1.0
+    return PackingParameters(
+        dtype=dtype,
+        scale_factor=scale_factor,
+        add_offset=vmin - valid_min * scale_factor,
+        missing_value=int(info.min) + 1,
+        valid_min=valid_min,
+        valid_max=valid_max,
+    )
+
+
+def pack_block(data: np.ndarray, params: PackingParameters) -> np.ndarray:
+    """
+    Pack a block of floating point data. NaN values are set to `missing_value`.
+
+    :param data: Unpacked data
+    :param params: The packing parameters
+
+    :return: Packed data
+    """
+    data = np.asarray(data)
+    work = np.subtract(data, params.add_offset, dtype=np.float64)
+    work /= params.scale_factor
+    np.rint(work, out=work)
+    invalid = np.isnan(work)
+    np.clip(work, params.valid_min, params.valid_max, out=work)
+    work[invalid] = params.missing_value
+    return work.astype(params.dtype)
+
+
+def pack_array(
+        value: np.ndarray,
+        params: PackingParameters,
+        out: np.ndarray = None,
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES
+) -> np.ndarray:
+    """
+    Pack floating point data into integers in blocks of bounded size.
+
+    :param value: Array(-like) with unpacked data
+    :param params: The packing parameters (see `get_packing_parameters`)
+    :param out: Output array for the packed data (created if omitted)
+    :param max_block_bytes: Maximum size of the temporary (float64) block arrays
+
+    :return: The packed array
+    """
+    if out is None:
+        out = np.empty(value.shape, dtype=params.dtype)
+    for block in iter_blocks(value.shape, np.dtype(np.float64).itemsize, max_bytes=max_block_bytes):
+        out[block] = pack_block(value[block], params)
+    return out
+
+
+def unpack_array(
+        value: np.ndarray,
+        scale_factor: float = None,
+        add_offset: float = None,
+        missing_value: int = None,
+        valid_min: int = None,
+        valid_max: int = None,
+        dtype: str = None,
+        out: np.ndarray = None,
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> np.ndarray:
+    """
+    Unpack integer data into floating point values in blocks of bounded size.
+    Missing values and values outside the valid range are set to NaN.
+
+    :param value: Array(-like) with packed data
+    :param scale_factor: CF scale factor (default 1)
+    :param add_offset: CF offset (default 0)
+    :param missing_value: Packed value of missing data
+    :param valid_min: Minimum valid packed value
+    :param valid_max: Maximum valid packed value
+    :param dtype: Unpacked data type (default: float32 for 8/16 bit data, float64 otherwise)
+    :param out: Output array for the unpacked data (created if omitted)
+    :param max_block_bytes: Maximum size of the unpacked blocks
+
+    :return: The unpacked array
+    """
+    if dtype is None:
+        dtype = "float32" if value.dtype.itemsize <= 2 else "float64"
+    if out is None:
+        out = np.empty(value.shape, dtype=dtype)
+    scale_factor = 1.0 if scale_factor is None else scale_factor
+    add_offset = 0.0 if add_offset is None else add_offset
+
+    for block in iter_blocks(value.shape, out.dtype.itemsize, max_bytes=max_block_bytes):
+        packed = np.asarray(value[block])
+        unpacked = out[block]
+        np.multiply(packed, scale_factor, out=unpacked, casting="unsafe")
+        unpacked += add_offset
+        if missing_value is not None:
+            unpacked[packed == missing_value] = np.nan
+        if valid_min is not None:
+            unpacked[packed < valid_min] = np.nan
+        if valid_max is not None:
+            unpacked[packed > valid_max] = np.nan
+    return out
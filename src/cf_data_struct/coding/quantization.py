@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lossy quantization of floating point data by bit rounding (Klöwer et al., 2021).
+
+The trailing mantissa bits that are not needed to represent the given number
+of significant bits are rounded (to nearest, ties to even) and set to zero. The
+data type does not change, but the zeroed bits are compressed very efficiently
+by the shuffle and zlib filters. The quantization is documented with the CF
+quantization attributes (CF-1.11, section 8.4):
+
+    variable:quantization = "quantization_info" ;
+    variable:quantization_nsb = <number of significant bits> ;
+    quantization_info:algorithm = "bitround" ;
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import math
+from typing import Dict
+
+import numpy as np
+
+from cf_data_struct.utils import DEFAULT_BLOCK_BYTES, iter_blocks
+
+# Name of the quantization container variable and algorithm
+QUANTIZATION_VARIABLE = "quantization_info"
+QUANTIZATION_ALGORITHM = "bitround"
+
+# Number of explicitly stored mantissa bits and unsigned integer view per float type
+MANTISSA_BITS: Dict[str, int] = {"float16": 10, "float32": 23, "float64": 52}
+_UINT_TYPES = {"float16": np.uint16, "float32": np.uint32, "float64": np.uint64}
+
+
+def significant_digits_to_bits(significant_digits: int) -> int:
+    """
+    Number of significant (mantissa) bits that preserve a number of significant decimal digits
+
+    :param significant_digits: Number of significant decimal digits
+
+    :return: Number of significant bits
+    """
+    if significant_digits < 1:
+        raise ValueError(f"{significant_digits=} must be positive")
+    return int(math.ceil(significant_digits * math.log2(10)))
+
+
+def bitround_block(data: np.ndarray, nsb: int) -> np.ndarray:
+    """
+    Bit rounding of a floating point array in place. NaN and infinite values are
+    not changed.
+
+    :param data: Writeable floating point array (modified in place)
+    :param nsb: Number of significant mantissa bits to keep
+
+    :return: The input array
+    """
+    dtype_name = data.dtype.name
+    if dtype_name not in MANTISSA_BITS:
+        raise ValueError(f"Bit rounding requires float16/32/64 data: {data.dtype}")
+    if nsb < 1:
+        raise ValueError(f"{nsb=} must be positive")
+    drop_bits = MANTISSA_BITS[dtype_name] - nsb
+    if drop_bits <= 0 or data.size == 0:
+        return data
+
+    uint = _UINT_TYPES[dtype_name]
+    bits = data.view(uint)
+    non_finite = ~np.isfinite(data)
+    saved = data[non_finite] if non_finite.any() else None
+
+    # Round to nearest, ties to even: add half an ulp (minus one) plus the last kept bit
+    shift, one = uint(drop_bits), uint(1)
+    half_minus_one = uint((1 << (drop_bits - 1)) - 1)
+    mask = ~uint((1 << drop_bits) - 1)
+    bits += half_minus_one + ((bits >> shift) & one)
+    bits &= mask
+
+    if saved is not None:
+        data[non_finite] = saved
+    return data
+
+
+def bitround_array(
+        value: np.ndarray,
+        nsb: int,
+        out: np.ndarray = None,
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> np.ndarray:
+    """
+    Bit rounding of an array(-like) block by block. The input is not modified
+    unless it is passed as `out`.
+
+    :param value: Floating point array(-like) data
+    :param nsb: Number of significant mantissa bits to keep
+    :param out: Output array (default: new array)
+    :param max_block_bytes: Maximum number of bytes per block
+
+    :return: The quantized array
+    """
+    out = np.empty(value.shape, dtype=value.dtype) if out is None else out
+    for block in iter_blocks(value.shape, value.dtype.itemsize, max_bytes=max_block_bytes):
+        if out is not value:
+            out[block] = value[block]
+        bitround_block(out[block], nsb)
+    return out
+
+
+def quantize_block(data: np.ndarray, nsb: int) -> np.ndarray:
+    """
+    Return a bit-rounded copy of a data block (e.g. the transform of a block-wise writer,
+    which must not modify the block of the variable data)
+
+    :param data: Floating point data block
+    :param nsb: Number of significant mantissa bits to keep
+
+    :return: Quantized copy of the block
+    """
+    return bitround_block(np.array(data, copy=True), nsb)
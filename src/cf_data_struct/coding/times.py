@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+
+"""
+Vectorized conversion between `numpy.datetime64` arrays and CF encoded time
+values ("<unit> since <epoch>") for the calendars in `VALID_CALENDARS`.
+
+`datetime64` values are interpreted as date/time labels in the target calendar,
+e.g. 2000-02-29 in the `noleap` calendar cannot be encoded and 2000-02-30 in the
+`360_day` calendar cannot be decoded. Dates before 1582-10-15 are labels in the
+Julian calendar for the `standard` (`gregorian`) calendar.
+
+The proleptic Gregorian calendar of numpy (and `standard` dates after the Gregorian
+reform) is converted with datetime64 arithmetic only. All other calendars are converted
+via (vectorized) calendar day numbers.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import functools
+import re
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+from pydantic import BaseModel, field_validator
+
+from cf_data_struct.datamodels import VALID_CALENDARS
+from cf_data_struct.utils import DEFAULT_BLOCK_BYTES, iter_blocks
+
+# CF (udunits) time unit names and the corresponding datetime64 units,
+# ordered from the coarsest to the finest unit
+TIME_UNITS = {
+    "days": "D",
+    "hours": "h",
+    "minutes": "m",
+    "seconds": "s",
+    "milliseconds": "ms",
+    "microseconds": "us",
+    "nanoseconds": "ns"
+}
+
+TIME_UNIT_ALIASES = {
+    "day": "days", "d": "days",
+    "hour": "hours", "hr": "hours", "h": "hours",
+    "minute": "minutes", "min": "minutes",
+    "second": "seconds", "sec": "seconds", "s": "seconds",
+    "millisecond": "milliseconds", "msec": "milliseconds", "ms": "milliseconds",
+    "microsecond": "microseconds", "usec": "microseconds", "us": "microseconds",
+    "nanosecond": "nanoseconds", "nsec": "nanoseconds", "ns": "nanoseconds"
+}
+
+VALID_TIME_DTYPES = ["int32", "int64", "float64"]
+
+DEFAULT_EPOCH = "1970-01-01 00:00:00"
+
+# First day of the Gregorian calendar in the `standard` calendar (Julian day number)
+GREGORIAN_REFORM_JDN = 2299161
+GREGORIAN_REFORM = np.datetime64("1582-10-15", "D")
+UNIX_EPOCH_JDN = 2440588
+
+# Integer representation of NaT
+NAT = np.iinfo(np.int64).min
+
+_CUMULATIVE_DAYS = {
+    "noleap": np.array([0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]),
+    "all_leap": np.array([0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335])
+}
+
+_CALENDAR_ALIASES = {"gregorian": "standard", "365_day": "noleap", "366_day": "all_leap"}
+
+_UNITS_PATTERN = re.compile(r"^\s*(\w+)\s+since\s+(.+?)\s*$")
+_EPOCH_PATTERN = re.compile(
+    r"^(-?\d+)-(\d{1,2})-(\d{1,2})"
+    r"(?:[T ]+(\d{1,2}):(\d{1,2})(?::(\d{1,2})(?:\.(\d*))?)?)?"
+    r"\s*(?:Z|UTC|[+-]00(?::?00)?)?$"
+)
+
+
+class TimeEncoding(BaseModel):
+    """
+    CF encoding of a time variable
+    """
+    units: str
+    calendar: str = "standard"
+    dtype: str = "int64"
+    missing_value: Optional[Union[int, float]] = None
+
+    # noinspection PyNestedDecorators
+    @field_validator("calendar")
+    @classmethod
+    def valid_calendar(cls, calendar: str) -> str:
+        if calendar not in VALID_CALENDARS or calendar == "none":
+            raise ValueError(f"{calendar=} not in {VALID_CALENDARS=} or not supported")
+        return calendar
+
+    # noinspection PyNestedDecorators
+    @field_validator("dtype")
+    @classmethod
+    def valid_dtype(cls, dtype: str) -> str:
+        if dtype not in VALID_TIME_DTYPES:
+            raise ValueError(f"{dtype=} not in {VALID_TIME_DTYPES=}")
+        return dtype
+
+    # noinspection PyNestedDecorators
+    @field_validator("units")
+    @classmethod
+    def valid_units(cls, units: str) -> str:
+        parse_time_units(units)
+        return units
+
+    @property
+    def attributes(self) -> Dict[str, Any]:
+        """
+        CF variable attributes of the encoded variable (`missing_value` in the encoded data type)
+        """
+        attributes = {"units": self.units, "calendar": self.calendar}
+        if self.missing_value is not None:
+            attributes["missing_value"] = np.asarray(self.missing_value, dtype=self.dtype)
+        return attributes
+
+
+def parse_time_units(units: str) -> Tuple[str, Tuple[int, int, int], np.timedelta64]:
+    """
+    Parse CF time units ("<unit> since <epoch>"), e.g. "seconds since 1970-01-01 00:00:00"
+
+    :param units: CF time units
+
+    :raises ValueError: Invalid time units
+
+    :return: (datetime64 unit, (year, month, day) of the epoch, time of day of the epoch)
+    """
+    match = _UNITS_PATTERN.match(units or "")
+    if match is None:
+        raise ValueError(f"Invalid CF time units: {units=}")
+    unit, epoch = match.group(1).lower(), match.group(2)
+    unit = TIME_UNIT_ALIASES.get(unit, unit)
+    if unit not in TIME_UNITS:
+        raise ValueError(f"Invalid time unit in {units=} [{list(TIME_UNITS)}]")
+    match = _EPOCH_PATTERN.match(epoch)
+    if match is None:
+        raise ValueError(f"Invalid epoch in {units=}")
+    year, month, day, hour, minute, second, fraction = match.groups()
+    if not 1 <= int(month) <= 12 or not 1 <= int(day) <= 31:
+        raise ValueError(f"Invalid epoch in {units=}")
+    fraction = (fraction or "").rstrip("0")
+    if len(fraction) > 9:
+        raise ValueError(f"Epoch of {units=} exceeds nanosecond resolution")
+    tod_unit = "s" if not fraction else ["ms", "us", "ns"][(len(fraction) - 1) // 3]
+    tod = np.timedelta64(int(hour or 0) * 3600 + int(minute or 0) * 60 + int(second or 0), "s").astype(
+        f"m8[{tod_unit}]"
+    )
+    if fraction:
+        tod += np.timedelta64(int(fraction.ljust(3 * ((len(fraction) + 2) // 3), "0")), tod_unit)
+    return TIME_UNITS[unit], (int(year), int(month), int(day)), tod
+
+
+def get_time_encoding(
+        value: np.ndarray,
+        units: str = None,
+        calendar: str = None,
+        dtype: str = None,
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES
+) -> TimeEncoding:
+    """
+    Find the CF encoding of datetime64 data that round-trips without loss. Without
+    `units`, the coarsest time unit (since 1970-01-01) that represents all values exactly
+    is used. The smallest integer type that holds all encoded values is selected, with
+    a fallback to float64 if the given units cannot represent all values exactly.
+
+    The data is processed in blocks, which requires a single pass over the data.
+
+    :param value: Array(-like) datetime64 data
+    :param units: CF time units (default: automatic)
+    :param calendar: CF calendar (default: standard)
+    :param dtype: The encoded data type (default: automatic)
+    :param max_block_bytes: Maximum number of bytes per data block
+
+    :raises ValueError: Values cannot be encoded in the calendar or with the given data type
+
+    :return: The time encoding
+    """
+    calendar = "standard" if calendar is None else calendar
+    epoch_units = f"days since {DEFAULT_EPOCH}" if units is None else units
+    # Validates units and calendar
+    TimeEncoding(units=epoch_units, calendar=calendar)
+
+    # Greatest common divisor and range of all offsets to the epoch in the resolution of the data
+    divisor, vmin, vmax, has_nat, work_unit = 0, None, None, False, None
+    for block in iter_blocks(value.shape, value.dtype.itemsize, max_bytes=max_block_bytes):
+        offsets, work_unit, invalid = _get_offsets(np.asarray(value[block]), epoch_units, calendar)
+        if invalid is not None:
+            has_nat = True
+            offsets = offsets[~invalid]
+        if offsets.size == 0:
+            continue
+        divisor = int(np.gcd(divisor, np.gcd.reduce(offsets)))
+        block_min, block_max = int(offsets.min()), int(offsets.max())
+        vmin = block_min if vmin is None else min(vmin, block_min)
+        vmax = block_max if vmax is None else max(vmax, block_max)
+
+    if units is None:
+        unit = "seconds"
+        if work_unit is not None:
+            for name, code in TIME_UNITS.items():
+                factor = _get_unit_factor(code, work_unit)
+                if factor is not None and divisor % factor == 0:
+                    unit = name
+                    break
+        units = f"{unit} since {DEFAULT_EPOCH}"
+
+    factor = 1 if work_unit is None else _get_unit_factor(parse_time_units(units)[0], work_unit)
+    is_exact = divisor % factor == 0
+    if dtype is None:
+        dtype = "float64"
+        if is_exact:
+            dtype = "int64"
+            if vmin is None or _fits_dtype(vmin // factor, vmax // factor, "int32", has_nat):
+                dtype = "int32"
+    dtype = np.dtype(dtype).name
+    if dtype != "float64":
+        if not is_exact:
+            raise ValueError(f"{units=} cannot represent all time values exactly with {dtype=}")
+        if vmin is not None and not _fits_dtype(vmin // factor, vmax // factor, dtype, has_nat):
+            raise ValueError(f"Encoded time values exceed the range of {dtype=} [{units=}]")
+    missing_value = None
+    if has_nat and dtype != "float64":
+        missing_value = int(np.iinfo(dtype).min) + 1
+    return TimeEncoding(units=units, calendar=calendar, dtype=dtype, missing_value=missing_value)
+
+
+def encode_times(value: np.ndarray, encoding: TimeEncoding) -> np.ndarray:
+    """
+    Encode datetime64 data as numerical time values. NaT values are set to
+    `missing_value` (integer types) or NaN (float64).
+
+    :param value: datetime64 data
+    :param encoding: The time encoding (see `get_time_encoding`)
+
+    :raises ValueError: The values cannot be represented exactly with an integer data type
+
+    :return: Encoded time values
+    """
+    offsets, work_unit, invalid = _get_offsets(np.asarray(value), encoding.units, encoding.calendar)
+    factor = _get_unit_factor(parse_time_units(encoding.units)[0], work_unit)
+    if encoding.dtype == "float64":
+        encoded = offsets / factor if factor > 1 else offsets.astype(np.float64)
+        if invalid is not None:
+            encoded[invalid] = np.nan
+        return encoded
+    if invalid is not None:
+        offsets[invalid] = 0
+    encoded = offsets
+    if factor > 1:
+        encoded = offsets // factor
+        if np.any(offsets - encoded * factor):
+            raise ValueError(f"{encoding.units=} cannot represent all time values exactly with {encoding.dtype=}")
+    if invalid is not None:
+        encoded[invalid] = 0 if encoding.missing_value is None else encoding.missing_value
+    return encoded.astype(encoding.dtype)
+
+
+def decode_times(
+        value: np.ndarray,
+        units: str,
+        calendar: str = "standard",
+        missing_value: Union[int, float] = None
+) -> np.ndarray:
+    """
+    Decode numerical CF time values into datetime64 data. The resolution of the result
+    is the time unit (or the resolution of the epoch, if finer) for integer values
+    and at least microseconds for floating point values. Missing values and NaN
+    are decoded as NaT.
+
+    :param value: Encoded time values
+    :param units: CF time units
+    :param calendar: CF calendar
+    :param missing_value: Value that marks missing data
+
+    :raises ValueError: The dates cannot be represented as datetime64 (e.g. 2000-02-30)
+
+    :return: datetime64 data
+    """
+    calendar = TimeEncoding(units=units, calendar=calendar or "standard").calendar
+    calendar = _CALENDAR_ALIASES.get(calendar, calendar)
+    unit, epoch_date, epoch_tod = parse_time_units(units)
+    value = np.asarray(value)
+    if value.dtype.kind not in "iuf":
+        raise ValueError(f"Time values must be numeric [{value.dtype}]")
+    invalid = np.isnan(value) if value.dtype.kind == "f" else None
+    if missing_value is not None:
+        invalid = (value == missing_value) if invalid is None else invalid | (value == missing_value)
+    invalid = invalid if invalid is not None and invalid.any() else None
+
+    # Offsets to the epoch in integer ticks of the finest resolution of the unit and the epoch
+    work_unit = _get_finest_unit(unit, np.datetime_data(epoch_tod.dtype)[0])
+    if value.dtype.kind == "f":
+        work_unit = _get_finest_unit(work_unit, "us")
+        scaled = np.multiply(value, _get_unit_factor(unit, work_unit), dtype=np.float64)
+        if invalid is not None:
+            scaled[invalid] = 0.0
+        offsets = np.rint(scaled).astype(np.int64)
+    else:
+        offsets = value.astype(np.int64)
+        if invalid is not None:
+            offsets[invalid] = 0
+        offsets *= _get_unit_factor(unit, work_unit)
+
+    ticks_per_day = _get_unit_factor("D", work_unit)
+    epoch_tod = int(epoch_tod / np.timedelta64(1, work_unit))
+    epoch_days, _ = _get_day_numbers(*(np.array([item]) for item in epoch_date), calendar)
+    epoch_days = int(epoch_days[0])
+    ticks = None
+    if calendar == "proleptic_gregorian" or (calendar == "standard" and epoch_days >= GREGORIAN_REFORM_JDN):
+        epoch, _ = _get_gregorian_days(*(np.array([item]) for item in epoch_date))
+        offsets += int(epoch[0]) * ticks_per_day + epoch_tod
+        # Dates before the Gregorian reform are Julian calendar dates
+        reform_ticks = int(GREGORIAN_REFORM.astype(np.int64)) * ticks_per_day
+        if calendar == "proleptic_gregorian" or offsets.min() >= reform_ticks:
+            ticks = offsets
+        else:
+            offsets -= int(epoch[0]) * ticks_per_day + epoch_tod
+    if ticks is None:
+        offsets += epoch_tod
+        days = offsets // ticks_per_day
+        days += epoch_days
+        shift = _map_days(days, functools.partial(_to_gregorian_days, calendar=calendar))
+        shift -= days
+        shift += epoch_days
+        shift *= ticks_per_day
+        ticks = offsets
+        ticks += shift
+    if invalid is not None:
+        ticks[invalid] = NAT
+    return ticks.view(f"M8[{work_unit}]")
+
+
+def _get_offsets(value: np.ndarray, units: str, calendar: str) -> Tuple[np.ndarray, str, Optional[np.ndarray]]:
+    """
+    Time offsets of datetime64 values to the epoch of the units in the calendar, as integer ticks
+    in the finest resolution of the data, the time unit and the epoch. NaT values have an offset of 0.
+
+    :return: (int64 offsets, datetime64 unit of the offsets, NaT mask or None if there are no NaT values)
+    """
+    if value.dtype.kind != "M":
+        raise ValueError(f"Only datetime64 data can be encoded as time values [{value.dtype}]")
+    unit, epoch_date, epoch_tod = parse_time_units(units)
+    calendar = _CALENDAR_ALIASES.get(calendar, calendar)
+    work_unit = _get_finest_unit(np.datetime_data(value.dtype)[0], unit, np.datetime_data(epoch_tod.dtype)[0])
+    ticks = value.astype(f"M8[{work_unit}]").view(np.int64)
+    invalid = ticks == NAT
+    invalid = invalid if invalid.any() else None
+    if invalid is not None:
+        ticks[invalid] = 0
+
+    ticks_per_day = _get_unit_factor("D", work_unit)
+    epoch_tod = int(epoch_tod / np.timedelta64(1, work_unit))
+    epoch_days, is_invalid = _get_day_numbers(*(np.array([item]) for item in epoch_date), calendar)
+    if is_invalid[0]:
+        raise ValueError(f"Epoch of {units=} does not exist in the {calendar} calendar")
+    use_ticks = calendar == "proleptic_gregorian"
+    if calendar == "standard" and epoch_days[0] >= GREGORIAN_REFORM_JDN:
+        # Dates before the Gregorian reform are Julian calendar dates
+        use_ticks = ticks.min() >= int(GREGORIAN_REFORM.astype(np.int64)) * ticks_per_day
+    if use_ticks:
+        epoch, _ = _get_gregorian_days(*(np.array([item]) for item in epoch_date))
+        ticks -= int(epoch[0]) * ticks_per_day + epoch_tod
+        return ticks, work_unit, invalid
+
+    # Shift of the ticks by the difference of the calendar and Gregorian day numbers
+    days = ticks // ticks_per_day
+    shift = _map_days(days, functools.partial(_to_calendar_days, calendar=calendar))
+    shift -= days
+    shift -= int(epoch_days[0])
+    shift *= ticks_per_day
+    ticks += shift
+    ticks -= epoch_tod
+    if invalid is not None:
+        ticks[invalid] = 0
+    return ticks, work_unit, invalid
+
+
+def _map_days(days: np.ndarray, func: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    """
+    Apply a day number conversion to an array of day numbers. Time series typically
+    cover few distinct days, therefore the conversion is computed once per day of the
+    range of day numbers and applied with a lookup table, if the range is smaller than the array.
+
+    :param days: Day numbers
+    :param func: Conversion function that returns the converted day numbers and a mask of invalid dates
+
+    :raises ValueError: Any of the day numbers is invalid
+
+    :return: Converted day numbers
+    """
+    if days.size == 0:
+        return days.copy()
+    first_day, last_day = int(days.min()), int(days.max())
+    if last_day - first_day + 1 <= days.size:
+        table, invalid = func(np.arange(first_day, last_day + 1))
+        index = days - first_day
+        converted = table.take(index)
+        if invalid.any():
+            invalid = invalid[index]
+    else:
+        converted, invalid = func(days)
+    if invalid.any():
+        day = days.flat[np.flatnonzero(invalid)[0]]
+        func(np.array([day]), raise_error=True)
+    return converted
+
+
+def _to_calendar_days(
+        days: np.ndarray,
+        calendar: str,
+        raise_error: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calendar day numbers of Gregorian dates (days since 1970-01-01)
+
+    :return: (calendar day numbers, mask of dates that do not exist in the calendar)
+    """
+    calendar_days, invalid = _get_day_numbers(*_get_labels(days), calendar)
+    if raise_error and invalid.any():
+        raise ValueError(f"Date {days.astype('M8[D]')[invalid][0]} does not exist in the {calendar} calendar")
+    return calendar_days, invalid
+
+
+def _to_gregorian_days(
+        days: np.ndarray,
+        calendar: str,
+        raise_error: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gregorian dates (days since 1970-01-01) of calendar day numbers
+
+    :return: (Gregorian day numbers, mask of dates that cannot be represented as datetime64)
+    """
+    year, month, day = _get_dates(days, calendar)
+    gregorian_days, invalid = _get_gregorian_days(year, month, day)
+    if raise_error and invalid.any():
+        index = np.flatnonzero(invalid)[0]
+        label = f"{year[index]}-{month[index]:02d}-{day[index]:02d}"
+        raise ValueError(f"Date {label} ({calendar}) cannot be represented as datetime64")
+    return gregorian_days, invalid
+
+
+def _get_labels(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (year, month, day) labels of Gregorian dates (days since 1970-01-01)
+    """
+    dates = days.astype("M8[D]")
+    months = dates.astype("M8[M]")
+    year = months.astype("M8[Y]").astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (dates - months.astype("M8[D]")).astype(np.int64) + 1
+    return year, month, day
+
+
+def _get_gregorian_days(year: np.ndarray, month: np.ndarray, day: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Days since 1970-01-01 of (year, month, day) labels in the proleptic Gregorian calendar
+
+    :return: (day numbers, mask of invalid dates, e.g. 2001-02-29)
+    """
+    months = (year - 1970) * 12 + (month - 1)
+    days = months.astype("M8[M]").astype("M8[D]").astype(np.int64) + (day - 1)
+    invalid = days.astype("M8[D]").astype("M8[M]").astype(np.int64) != months
+    return days, invalid
+
+
+def _get_day_numbers(
+        year: np.ndarray,
+        month: np.ndarray,
+        day: np.ndarray,
+        calendar: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Day numbers of (year, month, day) labels in a calendar
+
+    :return: (day numbers, mask of dates that do not exist in the calendar)
+    """
+    if calendar == "proleptic_gregorian":
+        return _get_gregorian_days(year, month, day)
+    if calendar == "julian":
+        return _get_julian_day_numbers(year, month, day), (month == 2) & (day > 28 + (year % 4 == 0))
+    if calendar == "standard":
+        label = year * 10000 + month * 100 + day
+        is_julian = label < 15821015
+        gregorian_days, invalid = _get_gregorian_days(year, month, day)
+        invalid = np.where(is_julian, (label > 15821004) | ((month == 2) & (day > 28 + (year % 4 == 0))), invalid)
+        return np.where(is_julian, _get_julian_day_numbers(year, month, day), gregorian_days + UNIX_EPOCH_JDN), invalid
+    if calendar == "360_day":
+        return year * 360 + (month - 1) * 30 + (day - 1), day > 30
+    if calendar == "noleap":
+        invalid = (month == 2) & (day == 29)
+    else:
+        invalid = np.zeros(np.shape(day), dtype=bool)
+    days_per_year = 365 if calendar == "noleap" else 366
+    return year * days_per_year + _CUMULATIVE_DAYS[calendar][month - 1] + (day - 1), invalid
+
+
+def _get_dates(days: np.ndarray, calendar: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (year, month, day) labels from day numbers in a calendar (inverse of `_get_day_numbers`)
+    """
+    if calendar == "proleptic_gregorian":
+        return _get_labels(days)
+    if calendar == "julian":
+        return _get_julian_dates(days)
+    if calendar == "standard":
+        year, month, day = _get_labels(days - UNIX_EPOCH_JDN)
+        is_julian = days < GREGORIAN_REFORM_JDN
+        if np.any(is_julian):
+            julian_year, julian_month, julian_day = _get_julian_dates(days)
+            year = np.where(is_julian, julian_year, year)
+            month = np.where(is_julian, julian_month, month)
+            day = np.where(is_julian, julian_day, day)
+        return year, month, day
+    if calendar == "360_day":
+        year, day_of_year = np.divmod(days, 360)
+        return year, day_of_year // 30 + 1, day_of_year % 30 + 1
+    days_per_year = 365 if calendar == "noleap" else 366
+    year, day_of_year = np.divmod(days, days_per_year)
+    month = np.searchsorted(_CUMULATIVE_DAYS[calendar], day_of_year, side="right")
+    return year, month, day_of_year - _CUMULATIVE_DAYS[calendar][month - 1] + 1
+
+
+def _get_julian_day_numbers(year: np.ndarray, month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """
+    Julian day numbers of (year, month, day) labels in the Julian calendar
+    """
+    a = (14 - month) // 12
+    y = year + 4800 - a
+    m = month + 12 * a - 3
+    return day + (153 * m + 2) // 5 + 365 * y + y // 4 - 32083
+
+
+def _get_julian_dates(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (year, month, day) labels in the Julian calendar from Julian day numbers
+    """
+    c = days + 32082
+    d = (4 * c + 3) // 1461
+    e = c - 1461 * d // 4
+    m = (5 * e + 2) // 153
+    day = e - (153 * m + 2) // 5 + 1
+    month = m + 3 - 12 * (m // 10)
+    year = d - 4800 + m // 10
+    return year, month, day
+
+
+def _get_unit_factor(unit: str, work_unit: str) -> Optional[int]:
+    """
+    Number of `work_unit` in `unit` or None if `unit` is finer than `work_unit`
+    """
+    factor = np.timedelta64(1, unit) / np.timedelta64(1, work_unit)
+    return int(factor) if factor >= 1 else None
+
+
+def _get_finest_unit(*units: str) -> str:
+    """
+    The finest of datetime64 units
+    """
+    return np.datetime_data((sum(np.timedelta64(0, unit) for unit in units)).dtype)[0]
+
+
+def _fits_dtype(vmin: int, vmax: int, dtype: str, has_missing: bool) -> bool:
+    """
+    Check if an integer range fits in a data type (the fill value is reserved for missing values)
+    """
+    info = np.iinfo(dtype)
+    lower = int(info.min) + 2 if has_missing else int(info.min)
+    return lower <= vmin and vmax <= int(info.max)
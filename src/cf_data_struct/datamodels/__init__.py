@@ -11,7 +11,7 @@ with (limited) validation and templates for different data types.
 
 __author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
 
-from typing import List, Optional, Tuple, TypeVar, Union
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
 
 from pydantic import BaseModel, Extra, Field, field_validator, model_validator
 from typing_extensions import Annotated
@@ -45,9 +45,10 @@ numeric = Union[int, float]
 flag_dtypes = Union[int, bytes]
 
 
-class BasicCFGlobalAttributes(BaseModel):
+class BasicCFGlobalAttributes(BaseModel, extra=Extra.allow):
     """
-    Minimum global attributes according to CF-Conventions
+    Minimum global attributes according to CF-Conventions. Extra attributes
+    (e.g. ACDD attributes) are allowed.
     """
     title: str = None
     institution: str = None
@@ -82,6 +83,16 @@ class BasicVarAttrs(BaseModel, extra=Extra.allow):
     coverage_content_type: Annotated[Optional[str], Field(validate_default=False)] = None
     valid_min: Optional[numeric] = None
     valid_max: Optional[numeric] = None
+    quantization: Optional[str] = None
+    quantization_nsb: Optional[int] = None
+
+    # noinspection PyNestedDecorators
+    @field_validator("quantization_nsb")
+    @classmethod
+    def valid_quantization_nsb(cls, quantization_nsb: int) -> int:
+        if quantization_nsb is not None and quantization_nsb < 1:
+            raise ValueError(f"{quantization_nsb=} must be positive")
+        return quantization_nsb
 
     # noinspection PyNestedDecorators
     @field_validator("coverage_content_type")
@@ -93,25 +104,32 @@ class BasicVarAttrs(BaseModel, extra=Extra.allow):
 
 
 class FlagVarAttrs(BasicVarAttrs):
+    """
+    Flag variables with `flag_values` (exclusive states), `flag_masks` (bit fields)
+    or both. The number of flag values/masks must match the number of flag meanings.
+    """
     flag_meanings: str
-    flag_values: List[flag_dtypes]
+    flag_values: Optional[List[flag_dtypes]] = None
+    flag_masks: Optional[List[int]] = None
     unit: str = "1"
 
     @model_validator(mode="after")
-    @classmethod
-    def has_flag_attributes(cls, values):
-        if len(values.flag_values) != len(values.flag_meanings.split()):
-            raise ValueError(f"{values.flag_values=} and {values.flag_meanings} does not match")
+    def has_flag_attributes(self) -> "FlagVarAttrs":
+        if self.flag_values is None and self.flag_masks is None:
+            raise ValueError("Either flag_values or flag_masks must be given")
+        n_meanings = len(self.flag_meanings.split())
+        for flag_definition in (self.flag_values, self.flag_masks):
+            if flag_definition is not None and len(flag_definition) != n_meanings:
+                raise ValueError(f"{flag_definition=} and {self.flag_meanings=} does not match")
+        return self
 
 
-class TimeVarAttrs(BaseModel):
+class TimeVarAttrs(BasicVarAttrs):
     """
     Variable attribute model for time attributes, e.g.
     - time
     - time_bnds
     """
-    long_name: str
-    units: Optional[str] = None
     calendar: Annotated[Optional[str], Field(validate_default=False)] = None
 
     @field_validator("calendar")
@@ -137,6 +155,32 @@ class GridFlagVarAttrs(FlagVarAttrs, GridVarAttrs):
     pass
 
 
+def get_variable_attribute_model(attributes: Dict[str, Any]) -> Type[BasicVarAttrs]:
+    """
+    Select the most specific variable attribute model for an attribute dictionary
+    (e.g. attributes read from a file):
+
+    - flag attributes and `grid_mapping`: GridFlagVarAttrs
+    - flag attributes (`flag_values` or `flag_masks`): FlagVarAttrs
+    - `grid_mapping`: GridVarAttrs
+    - `units` of the form "<unit> since <epoch>" or `calendar`: TimeVarAttrs
+    - all other: BasicVarAttrs
+
+    :param attributes: Variable attributes dictionary
+
+    :return: Variable attribute model class
+    """
+    is_flag = attributes.get("flag_values") is not None or attributes.get("flag_masks") is not None
+    has_grid_mapping = attributes.get("grid_mapping") is not None
+    if is_flag:
+        return GridFlagVarAttrs if has_grid_mapping else FlagVarAttrs
+    if has_grid_mapping:
+        return GridVarAttrs
+    if " since " in str(attributes.get("units", "")) or attributes.get("calendar") is not None:
+        return TimeVarAttrs
+    return BasicVarAttrs
+
+
 # Helper variable for typing
 GlobalAttributeType = Union[BasicCFGlobalAttributes]
 VariableAttributeType = TypeVar("VariableAttributeType", bound=BasicVarAttrs)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+pydantic data models for yaml output templates. An output template defines
+the global attributes, dimensions and variables (dimensions, attributes and
+netCDF encoding) of a product, e.g.:
+
+    datatype: Grid
+    global_attributes:
+      title: Sea ice thickness
+    dimensions:
+      time:
+        attributes:
+          long_name: reference time of product
+          units: seconds since 1970-01-01
+    variables:
+      sea_ice_thickness:
+        var_id: sit
+        dims: [time, yc, xc]
+        attribute_type: GridVarAttrs
+        attributes:
+          long_name: sea ice thickness
+          grid_mapping: Lambert_Azimuthal_Grid
+        encoding:
+          packed_dtype: int16
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pydantic import (BaseModel, SerializeAsAny, field_validator,
+                      model_validator)
+
+from cf_data_struct.datamodels import (BasicCFGlobalAttributes, BasicVarAttrs,
+                                       FlagVarAttrs, GridFlagVarAttrs,
+                                       GridVarAttrs, TimeVarAttrs)
+from cf_data_struct.utils import VALID_ENCODING_KEYS
+
+VARIABLE_ATTRIBUTE_MODELS = {
+    "BasicVarAttrs": BasicVarAttrs,
+    "FlagVarAttrs": FlagVarAttrs,
+    "GridVarAttrs": GridVarAttrs,
+    "GridFlagVarAttrs": GridFlagVarAttrs,
+    "TimeVarAttrs": TimeVarAttrs,
+}
+
+
+class VariableTemplate(BaseModel):
+    """
+    Template of a single variable (or dimension). `attributes` is validated with
+    the variable attribute model given by `attribute_type`, `encoding` against the
+    encoding keys and data types accepted by `cf_data_struct.io.netcdf.write_netcdf`
+    (`cf_data_struct.utils.VALID_ENCODING_KEYS`).
+    """
+    dims: List[str] = None
+    var_id: Optional[str] = None
+    attribute_type: str = "BasicVarAttrs"
+    attributes: SerializeAsAny[BasicVarAttrs]
+    encoding: Dict[str, Any] = {}
+
+    # noinspection PyNestedDecorators
+    @field_validator("attribute_type")
+    @classmethod
+    def valid_attribute_type(cls, attribute_type: str) -> str:
+        if attribute_type not in VARIABLE_ATTRIBUTE_MODELS:
+            raise ValueError(f"{attribute_type=} not in {list(VARIABLE_ATTRIBUTE_MODELS)}")
+        return attribute_type
+
+    # noinspection PyNestedDecorators
+    @field_validator("encoding")
+    @classmethod
+    def valid_encoding(cls, encoding: Dict[str, Any]) -> Dict[str, Any]:
+        invalid_keys = set(encoding).difference(VALID_ENCODING_KEYS)
+        if invalid_keys:
+            raise ValueError(f"Invalid encoding keys: {invalid_keys} [{VALID_ENCODING_KEYS=}]")
+        for key in ["dtype", "packed_dtype"]:
+            if key in encoding:
+                try:
+                    np.dtype(encoding[key])
+                except TypeError as exc:
+                    raise ValueError(f"Invalid {key} encoding: {encoding[key]!r}") from exc
+        return encoding
+
+    # noinspection PyNestedDecorators
+    @model_validator(mode="before")
+    @classmethod
+    def validate_attribute_model(cls, data: Any) -> Any:
+        if isinstance(data, dict) and isinstance(data.get("attributes"), dict):
+            model = VARIABLE_ATTRIBUTE_MODELS.get(data.get("attribute_type", "BasicVarAttrs"))
+            if model is not None:
+                data = {**data, "attributes": model(**data["attributes"])}
+        return data
+
+
+class OutputTemplate(BaseModel):
+    """
+    Output template with global attributes, dimensions and variables
+    """
+    datatype: Optional[str] = None
+    global_attributes: BasicCFGlobalAttributes = BasicCFGlobalAttributes()
+    dimensions: Dict[str, VariableTemplate] = {}
+    variables: Dict[str, VariableTemplate] = {}
+
+    @model_validator(mode="after")
+    def has_valid_dimensions(self) -> "OutputTemplate":
+        for name, dimension in self.dimensions.items():
+            if dimension.dims is None:
+                dimension.dims = [name]
+        for name, variable in self.variables.items():
+            if variable.dims is None:
+                raise ValueError(f"No dimensions for variable {name}")
+            if not set(variable.dims).issubset(self.dimensions):
+                raise ValueError(f"Unknown dimensions of variable {name}: {variable.dims} [{list(self.dimensions)}]")
+        return self
+
+    @property
+    def encoding(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Encoding dictionary for `cf_data_struct.io.netcdf.write_netcdf`
+        """
+        templates = {**self.dimensions, **self.variables}
+        return {name: dict(template.encoding) for name, template in templates.items() if template.encoding}
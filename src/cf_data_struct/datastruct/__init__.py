@@ -7,18 +7,42 @@
 __author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
 
 import collections
+import functools
 import re
-from typing import Any, Dict, List, Tuple, Union
+from pathlib import Path
+from typing import (Any, Dict, Iterable, Iterator, List, Mapping, Optional,
+                    Tuple, Type, Union)
 
 import numpy as np
 import pydantic
 import xarray as xr
 
+from cf_data_struct.coding.flags import (get_flag_attribute_values,
+                                         get_flag_dtype, get_flag_mask,
+                                         get_flag_masks, is_flag_variable,
+                                         pack_flag_masks)
+from cf_data_struct.coding.packing import (get_packing_parameters, pack_array,
+                                           unpack_array)
+from cf_data_struct.coding.quantization import (QUANTIZATION_VARIABLE,
+                                                bitround_array,
+                                                significant_digits_to_bits)
 from cf_data_struct.datamodels import (BasicCFGlobalAttributes, BasicVarAttrs,
-                                       GlobalAttributeType,
+                                       FlagVarAttrs, GlobalAttributeType,
                                        VariableAttributeType)
-
-VALID_DATATYPES = ["Grid", "Trajectory"]
+from cf_data_struct.datastruct.binning import bin_trajectories
+from cf_data_struct.datastruct.combine import (_rename_dims,
+                                               collect_trajectories,
+                                               concat_trajectories)
+from cf_data_struct.datastruct.lazy import is_lazy_array
+from cf_data_struct.datastruct.shared import SharedStruct
+from cf_data_struct.datastruct.statistics import (VariableStatistics,
+                                                  compute_statistics)
+from cf_data_struct.datastruct.storage import (in_memory_bytes, is_spillable,
+                                               make_scratch_dir, to_memmap)
+from cf_data_struct.instrumentation import instrumented, record_bytes
+from cf_data_struct.utils import DEFAULT_BLOCK_BYTES
+
+VALID_DATATYPES = ["Grid", "Trajectory", "TrajectoryCollection"]
 VALID_VARIABLE_TYPES = ["Standard", "Flag", "Uncertainty"]
 
 
@@ -35,12 +59,16 @@ class CFVariable(object):
         dims (Union[str, Tuple[str]]): The dimensions of the variable.
         var_id (str, optional): The ID of the variable. Defaults to None.
         attributes (Union[VariableAttributeType, Dict], optional): The attributes of the variable. Defaults to None.
+        copy (bool, optional): Copy behaviour for `value`. None (default) copies only if needed,
+            True always copies and False raises if a copy cannot be avoided.
+        read_only (bool, optional): Mark the variable data as read-only. Defaults to False.
 
     Methods:
         to_xarray_var: Converts the CFVariable to a xarray Variable.
 
     """
 
+    @instrumented("variable_validation", label=lambda self, name, *args, **kwargs: name)
     def __init__(
             self,
             name: str,
@@ -48,6 +76,8 @@ class CFVariable(object):
             dims: Union[str, Tuple[str]],
             var_id: str = None,
             attributes: Union[VariableAttributeType, Dict] = None,
+            copy: Optional[bool] = None,
+            read_only: bool = False,
     ) -> None:
         """
         Initialize an instance of the class, which contains the name and id of the variable,
@@ -56,16 +86,26 @@ class CFVariable(object):
         The contents of this class can be cast to a xarray.Variable.
 
         :param name: The variable name. Must be a string that can be used as object attribute
-        :param value: numpy array with the data
+        :param value: numpy array with the data or lazy array (e.g. dask array or DeferredArray)
         :param dims: A tuple of the dimension names. Must match the data dimensions of value
         :param var_id: A short alias of the variable name. Will be autogenerated if omittted.
         :param attributes: The Climate & Forecast variable attributes.
+        :param copy: Copy `value` only if needed (None, default), always (True) or never (False).
+            Existing numpy arrays, memory maps and buffers are kept as views unless `copy=True`.
+        :param read_only: If True, the variable data is exposed as a read-only array
+            (the input array itself is not modified).
         """
 
         # Save attributes
         self._name = self._validate_name(name)
-        self.value = self._validate_value(value)
-        self._dims = self._validate_dims(dims, value)
+        self._stats = None
+        self.value = self._validate_value(value, copy=copy)
+        self._owns_data = not _shares_memory(self.value, value)
+        if self._owns_data and isinstance(self.value, np.ndarray):
+            record_bytes(copied=self.value.nbytes)
+        if read_only:
+            self._set_read_only()
+        self._dims = self._validate_dims(dims, self.value)
         self._attrs = self._validate_attrs(attributes, self._name)
         self._var_id = self._validate_var_id(var_id, name)
 
@@ -78,10 +118,30 @@ class CFVariable(object):
         return name
 
     @staticmethod
-    def _validate_value(value: Any) -> np.ndarray:
+    def _validate_value(value: Any, copy: Optional[bool] = None) -> np.ndarray:
+        # Lazy arrays (e.g. dask arrays) are kept as is unless a copy is requested
+        if is_lazy_array(value):
+            return np.array(value, copy=True) if copy else value
         if not isinstance(value, collections.abc.Iterable):
             raise ValueError(f"`name` must be of type Iterable: {value} [{type(value)}]")
-        return np.array(value)
+        if copy:
+            return np.array(value, copy=True)
+        # np.asanyarray keeps ndarray subclasses (e.g. np.memmap) and wraps buffers without a copy
+        array = np.asanyarray(value)
+        if copy is not None and not _shares_memory(array, value):
+            raise ValueError(f"`value` of type {type(value)} cannot be used without a copy (copy=False)")
+        return array
+
+    def _set_read_only(self) -> None:
+        """
+        Flag the variable data as read-only. A new view is created if the data is
+        the input array, so that the writeable flag of the caller's array is not changed.
+        """
+        if self.is_lazy or not self.value.flags.writeable:
+            return
+        if not self._owns_data:
+            self.value = self.value.view()
+        self.value.flags.writeable = False
 
     @staticmethod
     def _validate_dims(dims: Any, value: np.ndarray) -> Tuple:
@@ -94,19 +154,67 @@ class CFVariable(object):
 
     @staticmethod
     def _validate_attrs(attributes: Any, name: str) -> VariableAttributeType:
+        """
+        Validate the variable attributes and return them as read-only (frozen) model.
+        Validation of attribute dictionaries is memoized, i.e. identical attribute
+        sets are only validated once.
+        """
         if isinstance(attributes, dict):
-            try:
-                attributes = BasicVarAttrs(**attributes)
-            except pydantic.ValidationError as error:
-                raise ValueError(f"Invalid CF variable attributes: {attributes}") from error
+            attributes = _validate_attrs_dict(attributes)
         elif attributes is None:
-            attributes = BasicVarAttrs(long_name=name)
+            attributes = _validate_attrs_dict({"long_name": name})
         elif not issubclass(type(attributes), BasicVarAttrs):
             raise ValueError(
                 f"attribute type is neither dict nor known variable attribute object: "
                 f"{attributes} [{type(attributes)}]"
             )
-        return attributes
+        return _freeze_attrs(attributes)
+
+    @classmethod
+    def from_trusted(
+            cls,
+            name: str,
+            value: np.ndarray,
+            dims: Union[str, Tuple[str, ...]],
+            var_id: str = None,
+            attributes: Union[VariableAttributeType, Dict] = None,
+    ) -> "CFVariable":
+        """
+        Fast path for pre-validated input (e.g. from an output template or another CFVariable).
+        Name, data and dimensions are not validated and the data is never copied. Attribute
+        dictionaries are still validated (memoized).
+
+        :param name: The variable name
+        :param value: numpy array with the data
+        :param dims: A tuple of the dimension names
+        :param var_id: A short alias of the variable name. Will be autogenerated if omittted.
+        :param attributes: The Climate & Forecast variable attributes.
+
+        :return: CFVariable instance
+        """
+        var = cls.__new__(cls)
+        var._name = name
+        var._stats = None
+        var._value = value if isinstance(value, np.ndarray) or is_lazy_array(value) else np.asanyarray(value)
+        var._owns_data = False
+        var._dims = (dims, ) if isinstance(dims, str) else tuple(dims)
+        var._attrs = cls._validate_attrs(attributes, name)
+        var._var_id = cls._validate_var_id(var_id, name) if var_id is None else var_id.lower()
+        return var
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], trusted: bool = False) -> List["CFVariable"]:
+        """
+        Create a list of variables from records, i.e. dictionaries with the keywords of
+        `CFVariable` (name, value, dims, var_id, attributes, ...).
+
+        :param records: Iterable of keyword dictionaries
+        :param trusted: Use the fast path for pre-validated input (see `CFVariable.from_trusted`)
+
+        :return: List of CFVariable instances
+        """
+        constructor = cls.from_trusted if trusted else cls
+        return [constructor(**record) for record in records]
 
     @staticmethod
     def _validate_var_id(var_id: Any, name: str) -> str:
@@ -126,11 +234,247 @@ class CFVariable(object):
             ignore_attribute_list: Union[List[str], Tuple[str, ...]] = None
     ) -> xr.Variable:
         """
-        Convert to xarray.Variable
+        Convert to xarray.Variable. The variable data is not copied.
 
-        :return:
+        :param ignore_attribute_list: Names of attributes that should not be added to the xarray.Variable
+
+        :return: xarray.Variable
+        """
+        ignore_attribute_list = [] if ignore_attribute_list is None else ignore_attribute_list
+        attrs = {
+            name: value for name, value in self._attrs.model_dump(exclude_none=True).items()
+            if name not in ignore_attribute_list
+        }
+        return xr.Variable(self._dims, self.value, attrs=attrs)
+
+    def pack(self, dtype: str = "int16", max_block_bytes: int = DEFAULT_BLOCK_BYTES) -> "CFVariable":
+        """
+        Pack floating point data into an integer variable. Scale factor and offset
+        are derived from the data range and stored with `missing_value`, `valid_min`
+        and `valid_max` in the attributes of the packed variable. NaN values are
+        set to `missing_value`.
+
+        :param dtype: The packed integer data type (int8, int16, int32)
+        :param max_block_bytes: Maximum size of temporary block arrays
+
+        :return: The packed variable
+        """
+        if self.datatype.kind != "f":
+            raise ValueError(f"Only floating point data can be packed: {self._name} [{self.datatype}]")
+        params = get_packing_parameters(self.stats.value_range, dtype=dtype)
+        packed = pack_array(self.value, params, max_block_bytes=max_block_bytes)
+        attributes = self._attrs.model_copy(update=params.attributes)
+        return CFVariable(self._name, packed, self._dims, var_id=self._var_id, attributes=attributes)
+
+    def unpack(self, dtype: str = None, max_block_bytes: int = DEFAULT_BLOCK_BYTES) -> "CFVariable":
         """
-        pass
+        Unpack an integer variable with `scale_factor` and/or `add_offset` attributes
+        into floating point data. Missing values and values outside the valid range are
+        set to NaN.
+
+        :param dtype: The unpacked data type (default: float32 for 8/16 bit data, float64 otherwise)
+        :param max_block_bytes: Maximum size of temporary block arrays
+
+        :return: The unpacked variable
+        """
+        attrs = self._attrs
+        if attrs.scale_factor is None and attrs.add_offset is None:
+            raise ValueError(f"{self._name} is not packed (no scale_factor or add_offset)")
+        unpacked = unpack_array(
+            self.value,
+            scale_factor=attrs.scale_factor,
+            add_offset=attrs.add_offset,
+            missing_value=attrs.missing_value,
+            valid_min=attrs.valid_min,
+            valid_max=attrs.valid_max,
+            dtype=dtype,
+            max_block_bytes=max_block_bytes,
+        )
+        packing_attributes = ["scale_factor", "add_offset", "missing_value", "valid_min", "valid_max"]
+        attributes = self._attrs.model_copy(update=dict.fromkeys(packing_attributes))
+        return CFVariable(self._name, unpacked, self._dims, var_id=self._var_id, attributes=attributes)
+
+    def quantize(
+            self,
+            nsb: int = None,
+            significant_digits: int = None,
+            max_block_bytes: int = DEFAULT_BLOCK_BYTES
+    ) -> "CFVariable":
+        """
+        Lossy quantization of floating point data by bit rounding to a number of significant
+        mantissa bits. The quantized data compresses much better and the quantization
+        is recorded with the CF attributes `quantization` and `quantization_nsb`.
+
+        :param nsb: Number of significant bits to keep
+        :param significant_digits: Number of significant decimal digits to keep (alternative to `nsb`)
+        :param max_block_bytes: Maximum size of temporary block arrays
+
+        :return: The quantized variable
+        """
+        if self.datatype.kind != "f":
+            raise ValueError(f"Only floating point data can be quantized: {self._name} [{self.datatype}]")
+        if (nsb is None) == (significant_digits is None):
+            raise ValueError("Either nsb or significant_digits must be given")
+        nsb = significant_digits_to_bits(significant_digits) if nsb is None else int(nsb)
+        quantized = bitround_array(self.value, nsb, max_block_bytes=max_block_bytes)
+        attributes = self._attrs.model_copy(update={"quantization": QUANTIZATION_VARIABLE, "quantization_nsb": nsb})
+        return CFVariable(self._name, quantized, self._dims, var_id=self._var_id, attributes=attributes)
+
+    @classmethod
+    def from_flags(
+            cls,
+            name: str,
+            flags: Mapping[str, np.ndarray],
+            dims: Union[str, Tuple[str, ...]],
+            var_id: str = None,
+            attributes: Dict = None,
+    ) -> "CFVariable":
+        """
+        Create a flag variable from boolean flags, which are packed into the bits of the
+        smallest sufficient unsigned integer type (one bit per flag, `flag_masks` attribute).
+
+        :param name: The variable name
+        :param flags: Dictionary {flag meaning: boolean array}
+        :param dims: The dimension names of the flag arrays
+        :param var_id: A short alias of the variable name. Will be autogenerated if omittted.
+        :param attributes: Additional variable attributes
+
+        :return: The flag variable
+        """
+        packed, flag_attributes = pack_flag_masks(flags)
+        attributes = {"long_name": name, **(attributes or {}), **flag_attributes}
+        return cls(name, packed, dims, var_id=var_id, attributes=FlagVarAttrs(**attributes))
+
+    def get_flag_dtype(self, allow_unsigned: bool = True) -> Optional[np.dtype]:
+        """
+        The smallest integer type that represents the flag attributes (flag values,
+        flag masks, missing value) and the data range of a flag variable.
+
+        :param allow_unsigned: Use unsigned integer types for non-negative values
+
+        :return: Integer data type or None if the variable is not an integer flag variable
+        """
+        if not is_flag_variable(self._attrs) or self.datatype.kind not in "iu":
+            return None
+        values = get_flag_attribute_values(self._attrs)
+        value_range = self.stats.value_range
+        if value_range is not None:
+            values.extend(value_range)
+        return get_flag_dtype(values, allow_unsigned=allow_unsigned)
+
+    def compact_flags(self, allow_unsigned: bool = True) -> "CFVariable":
+        """
+        Cast a flag variable to the smallest sufficient integer type (see `get_flag_dtype`).
+
+        :param allow_unsigned: Use unsigned integer types for non-negative values
+
+        :return: The flag variable with compact data type
+        """
+        dtype = self.get_flag_dtype(allow_unsigned=allow_unsigned)
+        if dtype is None:
+            raise ValueError(f"{self._name} is not an integer flag variable")
+        var = CFVariable(
+            self._name, self.value.astype(dtype), self._dims, var_id=self._var_id, attributes=self._attrs
+        )
+        var._stats = self._stats
+        return var
+
+    def get_flag_mask(self, flag_meaning: str) -> np.ndarray:
+        """
+        Boolean mask of the elements of a flag variable with a flag meaning. Works with
+        `flag_values`, `flag_masks` or both.
+
+        :param flag_meaning: One of the space-separated `flag_meanings`
+
+        :return: Boolean array with the shape of the variable
+        """
+        return get_flag_mask(self.value, self._attrs, flag_meaning)
+
+    def get_flag_masks(self) -> Dict[str, np.ndarray]:
+        """
+        Boolean masks of all flag meanings of a flag variable
+
+        :return: Dictionary {flag meaning: boolean array}
+        """
+        return get_flag_masks(self.value, self._attrs)
+
+    def spill(self, scratch_dir: Union[str, Path], max_block_bytes: int = DEFAULT_BLOCK_BYTES) -> bool:
+        """
+        Move the variable data from memory to a memory-mapped scratch file. The data
+        is paged in on demand afterwards. Cached statistics and the read-only flag are kept.
+
+        :param scratch_dir: Directory for the scratch file
+        :param max_block_bytes: Maximum number of bytes per copied block
+
+        :return: True if the data has been moved, False if the data cannot be spilled
+            (memory map, lazy or non-numerical data)
+        """
+        if not is_spillable(self._value):
+            return False
+        read_only = self.read_only
+        self._value = to_memmap(self._value, scratch_dir, prefix=f"{self._name}_", max_block_bytes=max_block_bytes)
+        self._owns_data = True
+        if read_only:
+            self._value.flags.writeable = False
+        return True
+
+    def isel(self, indexers: Mapping[str, Union[slice, np.ndarray]]) -> "CFVariable":
+        """
+        Subset the variable by integer indices along its dimensions. Slices return
+        a view on the variable data (no copy), index arrays a copy. The `actual_range`
+        attribute is removed, since it is recomputed from the subset statistics on export.
+
+        :param indexers: Dictionary {dimension name: slice or integer index array}.
+            Dimensions that are not variable dimensions are ignored.
+
+        :return: The subset variable
+        """
+        index = tuple(indexers.get(dim_name, slice(None)) for dim_name in self._dims)
+        if all(isinstance(item, slice) and item == slice(None) for item in index):
+            var = CFVariable.from_trusted(
+                self._name, self._value, self._dims, var_id=self._var_id, attributes=self._attrs
+            )
+            var._stats = self._stats
+            return var
+        # Index arrays are applied one dimension at a time (orthogonal indexing)
+        value = self._value
+        for axis, item in enumerate(index):
+            if not isinstance(item, slice):
+                value = value[(slice(None), ) * axis + (item, )]
+        value = value[tuple(item if isinstance(item, slice) else slice(None) for item in index)]
+        if isinstance(value, np.ndarray) and self.read_only:
+            value.flags.writeable = False
+        attributes = self._attrs
+        if attributes.actual_range is not None:
+            attributes = attributes.model_copy(update={"actual_range": None})
+        return CFVariable.from_trusted(self._name, value, self._dims, var_id=self._var_id, attributes=attributes)
+
+    def reset_stats(self) -> None:
+        """
+        Invalidate the cached statistics. Only required if the variable data has been
+        modified in place, replacing `value` invalidates the cache automatically.
+        """
+        self._stats = None
+
+    @property
+    def value(self) -> np.ndarray:
+        return self._value
+
+    @value.setter
+    def value(self, value: np.ndarray) -> None:
+        self._value = value
+        self._stats = None
+
+    @property
+    def stats(self) -> VariableStatistics:
+        """
+        Summary statistics (min, max, NaN count, fill value count) of the variable data.
+        Computed in a single pass over the data on first access and cached until `value`
+        is replaced.
+        """
+        if self._stats is None:
+            self._stats = compute_statistics(self._value, fill_value=self._attrs.missing_value)
+        return self._stats
 
     @property
     def dim_dict(self) -> Dict:
@@ -150,12 +494,35 @@ class CFVariable(object):
 
     @property
     def attrs(self) -> VariableAttributeType:
-        return self._attrs.model_copy()
+        """
+        Read-only view of the variable attributes. Use `attrs.model_copy(update=...)`
+        to create modified attributes.
+        """
+        return self._attrs
 
     @property
     def datatype(self):
         return self.value.dtype
 
+    @property
+    def owns_data(self) -> bool:
+        """
+        True if the variable data has been copied from the input at initialization,
+        False if the variable holds a view on the caller's array or buffer.
+        """
+        return bool(self._owns_data)
+
+    @property
+    def read_only(self) -> bool:
+        return self.is_lazy or not self.value.flags.writeable
+
+    @property
+    def is_lazy(self) -> bool:
+        """
+        True if the variable data is a lazy array (e.g. dask array) that is loaded on access
+        """
+        return is_lazy_array(self._value)
+
     def __str__(self) -> str:
         """"""
         return (
@@ -168,12 +535,18 @@ class CFVariable(object):
 
 class CFStructBaseClass(object):
 
+    # Type specific metadata that is copied to new data structures of the same type
+    # (see `_new_like`). Index-dependent state is rebuilt by the subclass (e.g. in `isel`).
+    _metadata_attributes: Tuple[str, ...] = ()
+
     def __init__(
             self,
             datatype: str = None,
             attributes: GlobalAttributeType = None,
             dims: Union[Tuple[CFVariable], CFVariable] = None,
-            variables: Union[Tuple[CFVariable], CFVariable] = None
+            variables: Union[Tuple[CFVariable], CFVariable] = None,
+            memory_budget: int = None,
+            scratch_dir: Union[str, Path] = None,
     ) -> None:
         """
 
@@ -181,6 +554,9 @@ class CFStructBaseClass(object):
         :param attributes:
         :param dims:
         :param variables:
+        :param memory_budget: Maximum number of bytes of variable data in memory. Variables are
+            moved to memory-mapped scratch files once the budget is exceeded (default: no limit)
+        :param scratch_dir: Directory for scratch files (default: temporary directory)
         """
 
         # Validate input
@@ -197,13 +573,16 @@ class CFStructBaseClass(object):
         self._dim_shape = {}
         self._vars = {}
         self._var_id_dict = {}
+        self._memory_budget = None
+        self._scratch_dir = None
+        self.set_memory_budget(memory_budget, scratch_dir=scratch_dir)
 
         # Add dimensions and variables (if any)
         for dimension in dims:
             self.add_dimension(dimension)
 
         for variable in variables:
-            self.add_dimension(variable)
+            self.add_variable(variable)
 
     def add_dimension(self, dimension: CFVariable) -> None:
         """
@@ -216,7 +595,9 @@ class CFStructBaseClass(object):
             raise ValueError(f"{dimension=} [type={type(dimension)}] is not of type CFVariable")
         self._dims[dimension.name] = dimension
         self._dim_shape[dimension.name] = dimension.value.shape[0]
+        self._enforce_memory_budget()
 
+    @instrumented("add_variable", label=lambda self, var, *args, **kwargs: getattr(var, "name", None))
     def add_variable(
             self,
             var: CFVariable,
@@ -239,7 +620,7 @@ class CFStructBaseClass(object):
             raise ValueError(f"{var=} [type={type(var)}] is not of type CFVariable")
 
         # Check if dimensions are known
-        if not set(var.dims).issubset(self._dims):
+        if not set(var.dims).issubset(self._dim_shape):
             raise ValueError(f"Not all variable dimensions {var.dims=} present in {self.dims=}")
 
         # Check if dimensions are correct
@@ -248,26 +629,279 @@ class CFStructBaseClass(object):
             raise ValueError(f"Dimension of {var.name} not correct: {var.value.shape} != {expected_dims}")
 
         # Check if variable already exists
-        if variable_exists := var.name in self._vars and not overwrite:
+        variable_exists = var.name in self._vars
+        if variable_exists and not overwrite:
             raise ValueError(f"{var.name} already in dataset [{self.variable_names}]")
-        overwrite_ok = variable_exists and overwrite
 
-        # Check if variable id exists
-        if var.id in self.variable_ids and not overwrite_ok:
+        # Check if variable id exists (for another variable)
+        if self._var_id_dict.get(var.id, var.name) != var.name:
             raise ValueError(f"{var.id=} already exists in dataset [{self.variable_ids}]")
 
+        if variable_exists:
+            self._var_id_dict.pop(self._vars[var.name].id)
         self._vars[var.name] = var
         self._var_id_dict[var.id] = var.name
+        self._enforce_memory_budget()
+
+    def add_variables(
+            self,
+            variables: Union[Mapping[str, Union[Dict, CFVariable]], Iterable[CFVariable]],
+            overwrite: bool = False,
+            trusted: bool = False,
+    ) -> None:
+        """
+        Add many variables to the data structure. Variables can be given as
+        CFVariable instances or as mapping {name: CFVariable keywords (value, dims, var_id, attributes)}.
+        Attribute dictionaries are validated once per distinct attribute set.
+
+        :param variables: Iterable of CFVariable or mapping {name: CFVariable or CFVariable keywords}
+        :param overwrite: Overwrite existing variables checked by variable name (default=False)
+        :param trusted: Use the fast path for pre-validated input (see `CFVariable.from_trusted`)
+
+        :raises: ValueError:
+
+        :return: None
+        """
+        if isinstance(variables, collections.abc.Mapping):
+            constructor = CFVariable.from_trusted if trusted else CFVariable
+            variables = [
+                var if isinstance(var, CFVariable) else constructor(name=name, **var)
+                for name, var in variables.items()
+            ]
+        for var in variables:
+            self.add_variable(var, overwrite=overwrite)
+
+    def set_memory_budget(self, memory_budget: Optional[int], scratch_dir: Union[str, Path] = None) -> None:
+        """
+        Set the maximum number of bytes of variable data held in memory. If the budget
+        is exceeded, the largest in-memory variables are moved to memory-mapped scratch files.
+
+        :param memory_budget: Memory budget in bytes (None: no limit)
+        :param scratch_dir: Directory for scratch files (default: temporary directory
+            that is removed with the data structure)
+
+        :return: None
+        """
+        if memory_budget is not None and memory_budget < 0:
+            raise ValueError(f"{memory_budget=} must be positive")
+        self._memory_budget = memory_budget
+        if scratch_dir is not None:
+            self._scratch_dir = make_scratch_dir(self, scratch_dir)
+        self._enforce_memory_budget()
+
+    def _enforce_memory_budget(self) -> None:
+        """
+        Spill the largest in-memory variables to scratch files until the memory usage
+        is within the memory budget.
+        """
+        if self._memory_budget is None:
+            return
+        memory_usage = self.memory_usage
+        if memory_usage <= self._memory_budget:
+            return
+        candidates = [var for var in list(self._vars.values()) + list(self._dims.values()) if is_spillable(var.value)]
+        for var in sorted(candidates, key=lambda v: v.value.nbytes, reverse=True):
+            if self._scratch_dir is None:
+                self._scratch_dir = make_scratch_dir(self)
+            memory_usage -= var.value.nbytes
+            var.spill(self._scratch_dir)
+            if memory_usage <= self._memory_budget:
+                break
 
-    def get_dimensions(self, dim_names: List[str]) -> List[int]:
+    @property
+    def memory_usage(self) -> int:
         """
-        Return the dimenions as shape list
+        Number of bytes of variable data held in memory (memory-mapped and lazy
+        variables are not counted).
+        """
+        return sum(in_memory_bytes(var.value) for var in list(self._dims.values()) + list(self._vars.values()))
+
+    def get_dimensions(self, dim_names: Union[List[str], Tuple[str, ...]]) -> Tuple[int, ...]:
+        """
+        Return the dimenions as shape tuple
 
         :param dim_names: A list of dim names
 
-        :return:
+        :return: The shape defined by the dimensions
         """
-        return []
+        return tuple(self._dim_shape[dim_name] for dim_name in dim_names)
+
+    def isel(self, indexers: Mapping[str, Any] = None, **indexers_kwargs) -> "CFStructBaseClass":
+        """
+        Subset the data structure by integer indices along one or more dimensions, e.g.
+        a time window of a trajectory `struct.isel(time=slice(100, 200))`. Slices and
+        integers return numpy views on the variable data (no copy), index arrays and
+        boolean masks a copy. Integer indices keep the dimension with size 1.
+
+        Coordinate-derived attributes (`actual_range`, coverage attributes) are recomputed
+        from the statistics of the subset on access/export.
+
+        :param indexers: Dictionary {dimension name: integer, slice, integer array or boolean mask}
+        :param indexers_kwargs: Indexers as keywords
+
+        :raises ValueError: Unknown dimension or invalid indexer
+
+        :return: New data structure of the same type with the subset
+        """
+        indexers = {**(indexers or {}), **indexers_kwargs}
+        dim_indexers = {
+            dim_name: self._get_dim_indexer(dim_name, indexer) for dim_name, indexer in indexers.items()
+        }
+        subset = self._new_like()
+        for dim_name, dimension in self._dims.items():
+            subset.add_dimension(dimension.isel(dim_indexers))
+        subset.add_variables([var.isel(dim_indexers) for var in self._vars.values()])
+        return subset
+
+    def sel(self, indexers: Mapping[str, Any] = None, **indexers_kwargs) -> "CFStructBaseClass":
+        """
+        Subset the data structure by coordinate values of the dimension variables, e.g.
+        a bounding box of a grid `struct.sel(xc=slice(-500, 500), yc=slice(0, 1000))`.
+        Slice bounds are inclusive and may be given in any order. Monotonic coordinates
+        are searched with binary search and yield views (see `isel`).
+
+        :param indexers: Dictionary {dimension name: coordinate value, slice or array of values}
+        :param indexers_kwargs: Indexers as keywords
+
+        :raises ValueError: Unknown dimension or coordinate value not found
+
+        :return: New data structure of the same type with the subset
+        """
+        indexers = {**(indexers or {}), **indexers_kwargs}
+        return self.isel({
+            dim_name: self._get_label_indexer(dim_name, label) for dim_name, label in indexers.items()
+        })
+
+    def _get_dim_indexer(self, dim_name: str, indexer: Any) -> Union[slice, np.ndarray]:
+        """
+        Normalize an indexer of a dimension to a slice or an integer index array
+        """
+        if dim_name not in self._dims:
+            raise ValueError(f"{dim_name=} not in {self.dims=}")
+        size = self._dim_shape[dim_name]
+        if isinstance(indexer, slice):
+            return indexer
+        if isinstance(indexer, (int, np.integer)):
+            if not -size <= indexer < size:
+                raise ValueError(f"Index {indexer} out of bounds for {dim_name} [{size=}]")
+            indexer = int(indexer) % size
+            return slice(indexer, indexer + 1)
+        indexer = np.asarray(indexer)
+        if indexer.dtype.kind == "b":
+            if indexer.shape != (size, ):
+                raise ValueError(f"Boolean mask for {dim_name} must have shape ({size}, ): {indexer.shape}")
+            indexer = np.flatnonzero(indexer)
+        if indexer.ndim != 1 or indexer.dtype.kind not in "iu":
+            raise ValueError(f"Invalid indexer for {dim_name}: {indexer.dtype=} {indexer.ndim=}")
+        indexer = indexer.astype(np.intp)
+        if np.any((indexer < -size) | (indexer >= size)):
+            raise ValueError(f"Index array out of bounds for {dim_name} [{size=}]")
+        return _array_to_slice(np.where(indexer < 0, indexer + size, indexer))
+
+    def _get_label_indexer(self, dim_name: str, label: Any) -> Union[slice, np.ndarray]:
+        """
+        Convert coordinate values of a dimension variable into a slice or an integer index array
+        """
+        if dim_name not in self._dims:
+            raise ValueError(f"{dim_name=} not in {self.dims=}")
+        coordinate = np.asarray(self._dims[dim_name].value)
+        ascending = coordinate.size < 2 or bool(np.all(coordinate[1:] >= coordinate[:-1]))
+        descending = not ascending and bool(np.all(coordinate[1:] <= coordinate[:-1]))
+        if isinstance(label, slice):
+            if label.step is not None:
+                raise ValueError(f"Label slices with step are not supported: {label}")
+            bounds = [bound for bound in (label.start, label.stop) if bound is not None]
+            lower = min(bounds) if label.start is not None and label.stop is not None else label.start
+            upper = max(bounds) if label.start is not None and label.stop is not None else label.stop
+            if ascending:
+                start = 0 if lower is None else int(np.searchsorted(coordinate, lower, side="left"))
+                stop = coordinate.size if upper is None else int(np.searchsorted(coordinate, upper, side="right"))
+                return slice(start, max(start, stop))
+            if descending:
+                reverse, size = coordinate[::-1], coordinate.size
+                start = 0 if upper is None else size - int(np.searchsorted(reverse, upper, side="right"))
+                stop = size if lower is None else size - int(np.searchsorted(reverse, lower, side="left"))
+                return slice(start, max(start, stop))
+            in_range = np.ones(coordinate.size, dtype=bool)
+            if lower is not None:
+                in_range &= coordinate >= lower
+            if upper is not None:
+                in_range &= coordinate <= upper
+            return _array_to_slice(np.flatnonzero(in_range))
+        labels = np.atleast_1d(np.asarray(label, dtype=coordinate.dtype))
+        if ascending:
+            index = np.minimum(np.searchsorted(coordinate, labels), coordinate.size - 1)
+        else:
+            sorter = np.argsort(coordinate, kind="stable")
+            index = sorter[np.minimum(np.searchsorted(coordinate, labels, sorter=sorter), coordinate.size - 1)]
+        if coordinate.size == 0 or not np.array_equal(coordinate[index], labels):
+            raise ValueError(f"Not all values of {label} found in coordinate {dim_name}")
+        return _array_to_slice(index)
+
+    def _new_like(self) -> "CFStructBaseClass":
+        """
+        Return an empty data structure of the same type with a copy of the global attributes
+        and the type specific metadata (`_metadata_attributes`, e.g. grid_mapping of GridCFStruct).
+        The memory budget is not inherited.
+        """
+        struct = self.__class__.__new__(self.__class__)
+        CFStructBaseClass.__init__(struct, datatype=self._datatype, attributes=self.gattrs.model_copy())
+        for name in self._metadata_attributes:
+            setattr(struct, name, getattr(self, name))
+        return struct
+
+    @classmethod
+    def from_netcdf(cls, path: Union[str, Path], lazy: bool = True) -> "CFStructBaseClass":
+        """
+        Open a CF netCDF file as data structure. Dimensions and attributes are read
+        eagerly, variable data is read per slice on access if `lazy` is True
+        (see `cf_data_struct.io.netcdf.read_netcdf`). Called on `CFStructBaseClass`,
+        the data structure type is inferred from the file attributes.
+
+        :param path: The netCDF file path
+        :param lazy: Keep variable data on disk until accessed
+
+        :return: The CF data structure
+        """
+        from cf_data_struct.io.netcdf import read_netcdf
+        return read_netcdf(path, struct_class=None if cls is CFStructBaseClass else cls, lazy=lazy)
+
+    def to_netcdf(self, path: Union[str, Path], **kwargs) -> Path:
+        """
+        Write the data structure to a netCDF file. Data is streamed to disk in blocks
+        of bounded size (see `cf_data_struct.io.netcdf.write_netcdf` for keywords).
+
+        :param path: The target file path
+        :param kwargs: Keyword arguments for `cf_data_struct.io.netcdf.write_netcdf`
+
+        :return: The file path
+        """
+        from cf_data_struct.io.netcdf import write_netcdf
+        return write_netcdf(self, path, **kwargs)
+
+    def to_zarr(self, path: Union[str, Path], **kwargs) -> Path:
+        """
+        Write the data structure to a Zarr directory store. Chunks are compressed and
+        written in parallel (see `cf_data_struct.io.zarr.write_zarr` for keywords).
+        Requires the optional dependency `zarr`.
+
+        :param path: The target directory
+        :param kwargs: Keyword arguments for `cf_data_struct.io.zarr.write_zarr`
+
+        :return: The store path
+        """
+        from cf_data_struct.io.zarr import write_zarr
+        return write_zarr(self, path, **kwargs)
+
+    def to_shared_memory(self) -> SharedStruct:
+        """
+        Copy all variable data into a single shared memory block. The descriptor of the
+        returned handle can be sent to another process and passed to `attach_struct`.
+        The caller must close and unlink the handle once all consumers are done.
+
+        :return: Handle of the shared memory block (see `cf_data_struct.datastruct.shared`)
+        """
+        return SharedStruct.create(self)
 
     @property
     def datatype(self) -> str:
@@ -275,7 +909,11 @@ class CFStructBaseClass(object):
 
     @property
     def dims(self) -> List[str]:
-        return list(self._dims.keys())
+        """
+        Names of all dimensions, including dimensions without dimension variable
+        (e.g. the sample dimension of ragged arrays)
+        """
+        return list(self._dim_shape.keys())
 
     @property
     def variable_names(self) -> List[str]:
@@ -295,13 +933,465 @@ class TrajectoryCFStruct(CFStructBaseClass):
     def __init__(self, **kwargs):
         super(TrajectoryCFStruct, self).__init__(datatype="Trajectory", **kwargs)
 
+    @classmethod
+    def concat(
+            cls,
+            structs: Iterable["TrajectoryCFStruct"],
+            dim: str = "time",
+            max_workers: int = None,
+            sort: bool = False,
+    ) -> "TrajectoryCFStruct":
+        """
+        Concatenate trajectory segments along the record dimension. Each output variable
+        is allocated once and filled in place (see `cf_data_struct.datastruct.combine`).
+
+        :param structs: The trajectory segments with compatible dimensions, variables and attributes
+        :param dim: The record dimension
+        :param max_workers: Number of threads that copy variables in parallel (default: serial copy)
+        :param sort: Order the segments by the first value of the record dimension
+
+        :raises ValueError: Incompatible segments
+
+        :return: The concatenated trajectory
+        """
+        return concat_trajectories(structs, dim=dim, max_workers=max_workers, sort=sort)
+
+    def append_to_netcdf(self, path: Union[str, Path], record_dim: str = "time", **kwargs) -> Path:
+        """
+        Append the records of the trajectory to a netCDF file along the unlimited
+        dimension `record_dim`. The file is created if it does not exist. The `actual_range`
+        and time coverage attributes are updated incrementally with the new records.
+
+        :param path: The target file path
+        :param record_dim: Name of the (unlimited) record dimension
+        :param kwargs: Keyword arguments for `cf_data_struct.io.netcdf.append_netcdf`
+
+        :return: The file path
+        """
+        from cf_data_struct.io.netcdf import append_netcdf
+        return append_netcdf(self, path, record_dim=record_dim, **kwargs)
+
+
+class TrajectoryCollectionCFStruct(CFStructBaseClass):
+    """
+    Collection of trajectories with different numbers of observations in the CF contiguous
+    ragged array representation: the observations of all trajectories are stored back to back
+    along the sample dimension and the `row_size` variable along the instance dimension holds
+    the number of observations per trajectory.
+
+    https://cfconventions.org/cf-conventions/cf-conventions.html#_contiguous_ragged_array_representation
+    """
+
+    def __init__(
+            self,
+            trajectory_ids: Union[CFVariable, Iterable],
+            row_size: Union[CFVariable, Iterable[int]],
+            instance_dim: str = "trajectory",
+            sample_dim: str = "obs",
+            variables: Union[Tuple[CFVariable], CFVariable] = None,
+            **kwargs
+    ) -> None:
+        """
+        :param trajectory_ids: Identifier of each trajectory. Becomes the instance dimension
+            variable (`cf_role=trajectory_id`) if not given as CFVariable.
+        :param row_size: Number of observations of each trajectory
+        :param instance_dim: Name of the instance (trajectory) dimension
+        :param sample_dim: Name of the sample (observation) dimension
+        :param variables: Variables along the instance and/or sample dimension
+        :param kwargs: Keyword arguments of `CFStructBaseClass` (attributes, dims, ...)
+        """
+        super(TrajectoryCollectionCFStruct, self).__init__(datatype="TrajectoryCollection", **kwargs)
+        if getattr(self.gattrs, "featureType", None) is None:
+            self.gattrs = self.gattrs.model_copy(update={"featureType": "trajectory"})
+        self.instance_dim = instance_dim
+        self.sample_dim = sample_dim
+
+        if not isinstance(trajectory_ids, CFVariable):
+            trajectory_ids = CFVariable(
+                instance_dim,
+                trajectory_ids,
+                instance_dim,
+                attributes={"long_name": "trajectory identifier", "cf_role": "trajectory_id"}
+            )
+        self.add_dimension(trajectory_ids)
+
+        if not isinstance(row_size, CFVariable):
+            row_size = CFVariable(
+                "row_size",
+                row_size,
+                instance_dim,
+                attributes={"long_name": "number of observations per trajectory", "sample_dimension": sample_dim}
+            )
+        if row_size.is_lazy or row_size.value.ndim != 1 or row_size.datatype.kind not in "iu":
+            raise ValueError(f"row_size must be a one-dimensional integer array: {row_size.datatype}")
+        if np.any(row_size.value < 0):
+            raise ValueError("row_size must not be negative")
+
+        # Offset index: observations of trajectory i are offsets[i]:offsets[i+1]
+        self._offsets = np.zeros(row_size.value.size + 1, dtype=np.int64)
+        np.cumsum(row_size.value, out=self._offsets[1:])
+        self._offsets.flags.writeable = False
+        self._dim_shape[sample_dim] = int(self._offsets[-1])
+        self._row_size_name = row_size.name
+        self.add_variable(row_size)
+        self.add_variables(_is_iterable(variables))
+
+    @classmethod
+    def from_trajectories(
+            cls,
+            trajectories: Iterable[TrajectoryCFStruct],
+            trajectory_ids: Iterable = None,
+            record_dim: str = "time",
+            instance_dim: str = "trajectory",
+            sample_dim: str = "obs",
+            max_workers: int = None,
+    ) -> "TrajectoryCollectionCFStruct":
+        """
+        Create a trajectory collection from trajectories with compatible variables
+        (see `cf_data_struct.datastruct.combine.collect_trajectories`).
+
+        :param trajectories: The trajectories
+        :param trajectory_ids: Identifier of each trajectory (default: 0, 1, ..., n-1)
+        :param record_dim: The record dimension of the trajectories
+        :param instance_dim: The instance dimension of the collection
+        :param sample_dim: The sample dimension of the collection
+        :param max_workers: Number of threads that copy variables in parallel (default: serial copy)
+
+        :return: The trajectory collection
+        """
+        return collect_trajectories(
+            trajectories,
+            trajectory_ids=trajectory_ids,
+            record_dim=record_dim,
+            instance_dim=instance_dim,
+            sample_dim=sample_dim,
+            max_workers=max_workers
+        )
+
+    def get_trajectory_slice(self, index: int) -> slice:
+        """
+        Position of the observations of a trajectory along the sample dimension
+
+        :param index: The trajectory index
+
+        :return: slice along the sample dimension
+        """
+        n_trajectories = self.n_trajectories
+        if not -n_trajectories <= index < n_trajectories:
+            raise ValueError(f"Trajectory {index=} out of bounds [{n_trajectories=}]")
+        index = int(index) % n_trajectories
+        return slice(int(self._offsets[index]), int(self._offsets[index + 1]))
+
+    def get_trajectory(self, index: int, record_dim: str = "time") -> TrajectoryCFStruct:
+        """
+        Return a single trajectory of the collection. The variable data are views
+        on the collection data (no copy). The variable `record_dim` along the sample
+        dimension becomes the record dimension of the trajectory. Variables along the
+        instance dimension are not part of the trajectory.
+
+        :param index: The trajectory index
+        :param record_dim: Name of the variable that becomes the record dimension
+
+        :return: The trajectory
+        """
+        record_var = self._vars.get(record_dim)
+        if record_var is None or record_var.dims != (self.sample_dim, ):
+            raise ValueError(f"{record_dim=} is not a variable along {self.sample_dim}")
+        indexers = {self.sample_dim: self.get_trajectory_slice(index)}
+        dims_mapping = {self.sample_dim: record_dim}
+        dims = [_rename_dims(record_var.isel(indexers), dims_mapping)]
+        dims += [var.isel({}) for name, var in self._dims.items() if name != self.instance_dim]
+        variables = [
+            _rename_dims(var.isel(indexers), dims_mapping) for name, var in self._vars.items()
+            if name != record_dim and self.instance_dim not in var.dims
+        ]
+        return TrajectoryCFStruct(attributes=self.gattrs.model_copy(), dims=dims, variables=variables)
+
+    def iter_trajectories(self, record_dim: str = "time") -> Iterator[TrajectoryCFStruct]:
+        """
+        Iterate over all trajectories of the collection (see `get_trajectory`)
+
+        :param record_dim: Name of the variable that becomes the record dimension
+
+        :return: Iterator of trajectories
+        """
+        for index in range(self.n_trajectories):
+            yield self.get_trajectory(index, record_dim=record_dim)
+
+    def isel(self, indexers: Mapping[str, Any] = None, **indexers_kwargs) -> "TrajectoryCollectionCFStruct":
+        """
+        Subset the collection by trajectory indices along the instance dimension, e.g.
+        `collection.isel(trajectory=[0, 2])`. The observations of the selected trajectories
+        are gathered along the sample dimension with the offset index and `row_size` is
+        rebuilt. A slice with step 1 returns views on the variable data (no copy), all other
+        indexers a copy. Use `sel` to select trajectories by their identifiers.
+
+        :param indexers: Dictionary {dimension name: integer, slice, integer array or boolean mask}
+        :param indexers_kwargs: Indexers as keywords
+
+        :raises ValueError: Indexer for the sample dimension (observations are selected by
+            trajectory), unknown dimension or invalid indexer
+
+        :return: New trajectory collection with the selected trajectories
+        """
+        indexers = {**(indexers or {}), **indexers_kwargs}
+        if self.sample_dim in indexers:
+            raise ValueError(f"{self.sample_dim} cannot be subset directly, select trajectories by {self.instance_dim}")
+        dim_indexers = {
+            dim_name: self._get_dim_indexer(dim_name, indexer) for dim_name, indexer in indexers.items()
+        }
+        dim_indexers[self.sample_dim] = self._get_sample_indexer(dim_indexers.get(self.instance_dim, slice(None)))
+        row_size = self._vars[self._row_size_name]
+        return TrajectoryCollectionCFStruct(
+            trajectory_ids=self._dims[self.instance_dim].isel(dim_indexers),
+            row_size=row_size.isel(dim_indexers),
+            instance_dim=self.instance_dim,
+            sample_dim=self.sample_dim,
+            attributes=self.gattrs.model_copy(),
+            dims=[var.isel(dim_indexers) for name, var in self._dims.items() if name != self.instance_dim],
+            variables=[var.isel(dim_indexers) for name, var in self._vars.items() if name != row_size.name],
+        )
+
+    def _get_sample_indexer(self, instance_indexer: Union[slice, np.ndarray]) -> Union[slice, np.ndarray]:
+        """
+        Indexer of the sample dimension with the observations of the selected trajectories
+        (in the order of the selection)
+        """
+        if isinstance(instance_indexer, slice):
+            start, stop, step = instance_indexer.indices(self.n_trajectories)
+            if step == 1:
+                stop = max(start, stop)
+                return slice(int(self._offsets[start]), int(self._offsets[stop]))
+            instance_indexer = np.arange(start, stop, step)
+        starts = self._offsets[:-1][instance_indexer]
+        sizes = np.diff(self._offsets)[instance_indexer]
+        # Offset of each selected trajectory in the subset
+        subset_offsets = np.cumsum(sizes) - sizes
+        return _array_to_slice(np.arange(int(sizes.sum())) + np.repeat(starts - subset_offsets, sizes))
+
+    @property
+    def n_trajectories(self) -> int:
+        return self._offsets.size - 1
+
+    @property
+    def row_size(self) -> np.ndarray:
+        return self._vars[self._row_size_name].value
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """
+        Read-only offset index with n_trajectories + 1 entries. The observations of
+        trajectory i are `offsets[i]:offsets[i+1]` along the sample dimension.
+        """
+        return self._offsets
+
 
 class GridCFStruct(CFStructBaseClass):
 
+    _metadata_attributes = ("grid_mapping", )
+
     def __init__(self, **kwargs):
         super(GridCFStruct, self).__init__(datatype="Grid", **kwargs)
         self.grid_mapping = None
 
+    def plan_chunks(self, access_pattern: str = "map", **kwargs) -> Dict:
+        """
+        Compute chunk shape, compression and reader chunk cache settings for all variables
+        based on the dimension sizes, the data types and the dominant read access pattern
+        (see `cf_data_struct.io.chunking.set_chunk_caches` for the chunk cache).
+
+        :param access_pattern: "map" (horizontal fields) or "timeseries" (all time steps of few grid cells)
+        :param kwargs: Keyword arguments for `cf_data_struct.io.chunking.plan_chunks`
+
+        :return: Dictionary {variable name: cf_data_struct.io.chunking.ChunkPlan}
+        """
+        from cf_data_struct.io.chunking import plan_chunks
+        return plan_chunks(self, access_pattern=access_pattern, **kwargs)
+
+    def bin_trajectories(
+            self,
+            trajectories: Union[TrajectoryCFStruct, Iterable[TrajectoryCFStruct]],
+            variables: Union[str, List[str]],
+            statistics: Iterable[str] = ("mean", "count", "std", "min", "max"),
+            **kwargs
+    ) -> "GridCFStruct":
+        """
+        Bin the observations of trajectories into the cells of this grid. The observation
+        coordinates must be given in grid coordinates (e.g. projected x/y) by trajectory
+        variables with the names of the grid dimensions (see `cf_data_struct.datastruct.binning`).
+
+        :param trajectories: A trajectory or an iterable of trajectories (consumed one at a time)
+        :param variables: Names of the trajectory variables to be binned
+        :param statistics: Gridded statistics (mean, count, std, min, max)
+        :param kwargs: Keyword arguments for `cf_data_struct.datastruct.binning.bin_trajectories`
+
+        :return: New grid with the variables `<variable>_<statistic>`
+        """
+        return bin_trajectories(self, trajectories, variables, statistics=statistics, **kwargs)
+
+    def to_netcdf(self, path: Union[str, Path], access_pattern: str = None, **kwargs) -> Path:
+        """
+        Write the grid to a netCDF file. If `access_pattern` is given, the variable
+        encoding is taken from the chunk plan (see `plan_chunks`). Explicit entries
+        in the `encoding` keyword take precedence over the chunk plan.
+
+        :param path: The target file path
+        :param access_pattern: "map", "timeseries" or None (netCDF4 default chunking)
+        :param kwargs: Keyword arguments for `cf_data_struct.io.netcdf.write_netcdf`
+
+        :return: The file path
+        """
+        if access_pattern is not None:
+            encoding = {name: plan.encoding for name, plan in self.plan_chunks(access_pattern).items()}
+            for name, var_encoding in kwargs.pop("encoding", {}).items():
+                encoding[name] = {**encoding.get(name, {}), **var_encoding}
+            kwargs["encoding"] = encoding
+        return super(GridCFStruct, self).to_netcdf(path, **kwargs)
+
+    def to_zarr(self, path: Union[str, Path], access_pattern: str = None, **kwargs) -> Path:
+        """
+        Write the grid to a Zarr directory store. If `access_pattern` is given, the chunk
+        shapes are taken from the chunk plan (see `plan_chunks`). Explicit entries
+        in the `encoding` keyword take precedence over the chunk plan.
+
+        :param path: The target directory
+        :param access_pattern: "map", "timeseries" or None (default chunking of the zarr library)
+        :param kwargs: Keyword arguments for `cf_data_struct.io.zarr.write_zarr`
+
+        :return: The store path
+        """
+        if access_pattern is not None:
+            variables = {**self._dims, **self._vars}
+            encoding = {
+                name: {"chunks": plan.chunksizes or self.get_dimensions(variables[name].dims)}
+                for name, plan in self.plan_chunks(access_pattern).items()
+            }
+            for name, var_encoding in kwargs.pop("encoding", {}).items():
+                encoding[name] = {**encoding.get(name, {}), **var_encoding}
+            kwargs["encoding"] = encoding
+        return super(GridCFStruct, self).to_zarr(path, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_frozen_model(model: Type[BasicVarAttrs]) -> Type[BasicVarAttrs]:
+    """
+    Return a frozen (read-only) subclass of a variable attribute model.
+
+    :param model: The variable attribute model class
+
+    :return: Frozen variable attribute model class
+    """
+    def __reduce__(self):
+        return _restore_frozen_attrs, (model, dict(self), self.model_fields_set)
+
+    namespace = {
+        "model_config": pydantic.ConfigDict(**{**model.model_config, "frozen": True}),
+        "__reduce__": __reduce__,
+        "__module__": model.__module__,
+        "__doc__": model.__doc__
+    }
+    return type(model.__name__, (model, ), namespace)
+
+
+def _restore_frozen_attrs(model: Type[BasicVarAttrs], fields: Dict, fields_set: set) -> BasicVarAttrs:
+    """
+    Restore frozen variable attributes from pickle without validation.
+    """
+    return _get_frozen_model(model).model_construct(_fields_set=fields_set, **fields)
+
+
+def _freeze_attrs(attributes: BasicVarAttrs) -> BasicVarAttrs:
+    """
+    Return a read-only copy of validated variable attributes (without re-validation).
+
+    :param attributes: The validated variable attributes
+
+    :return: Frozen variable attributes
+    """
+    if attributes.model_config.get("frozen", False):
+        return attributes
+    frozen_model = _get_frozen_model(type(attributes))
+    return frozen_model.model_construct(_fields_set=attributes.model_fields_set, **dict(attributes))
+
+
+def _validate_attrs_dict(attributes: Dict) -> BasicVarAttrs:
+    """
+    Validate a dictionary of variable attributes with memoization on the
+    attribute content. Unhashable attribute values disable the memoization.
+
+    :param attributes: Variable attributes dictionary
+
+    :raises ValueError: Invalid attributes
+
+    :return: Frozen variable attributes
+    """
+    try:
+        # The value type is part of the key, since e.g. 1 and 1.0 have the same hash
+        key = tuple(sorted((name, type(value), _hashable(value)) for name, value in attributes.items()))
+        hash(key)
+    except TypeError:
+        return _validate_attrs_items.__wrapped__(tuple((name, None, value) for name, value in attributes.items()))
+    return _validate_attrs_items(key)
+
+
+@functools.lru_cache(maxsize=4096)
+@instrumented("attribute_validation", label=lambda items: dict(item[::2] for item in items).get("long_name"))
+def _validate_attrs_items(items: Tuple[Tuple[str, Any, Any], ...]) -> BasicVarAttrs:
+    attributes = {name: value for name, _, value in items}
+    try:
+        return _freeze_attrs(BasicVarAttrs(**attributes))
+    except pydantic.ValidationError as error:
+        raise ValueError(f"Invalid CF variable attributes: {attributes}") from error
+
+
+def _hashable(value: Any) -> Any:
+    """
+    Convert list attribute values (e.g. flag_values) to tuples
+    """
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _shares_memory(array: np.ndarray, value: Any) -> bool:
+    """
+    Check if `array` is a view on the memory of the input `value`. Only numpy arrays
+    and objects that support the buffer protocol can share memory.
+
+    :param array: The numpy array
+    :param value: The original input
+
+    :return: Flag if array and input share memory
+    """
+    if array is value:
+        return True
+    if not isinstance(value, np.ndarray):
+        try:
+            value = np.asarray(memoryview(value))
+        except TypeError:
+            return False
+    return bool(np.may_share_memory(array, value))
+
+
+def _array_to_slice(index: np.ndarray) -> Union[slice, np.ndarray]:
+    """
+    Convert an integer index array with constant positive step into an equivalent
+    slice, so that the subset is a view instead of a copy.
+
+    :param index: One-dimensional array of non-negative indices
+
+    :return: slice or the input index array
+    """
+    if index.size == 0:
+        return slice(0, 0)
+    if index.size == 1:
+        return slice(int(index[0]), int(index[0]) + 1)
+    steps = np.diff(index)
+    if steps[0] > 0 and np.all(steps == steps[0]):
+        step = int(steps[0])
+        return slice(int(index[0]), int(index[-1]) + 1, None if step == 1 else step)
+    return index
+
 
 def _is_iterable(value: Union[List, Tuple, Any, None]) -> List[Any]:
     """
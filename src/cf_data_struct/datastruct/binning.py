@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+
+"""
+Binning of along-track observations of trajectories into the cells of a grid.
+
+The grid cell of each observation is computed with a vectorized search over the
+cell edges and the per-cell statistics are accumulated with `np.bincount` and
+`np.minimum.at`/`np.maximum.at`. Trajectories are processed in blocks of bounded
+size, so that the memory footprint is independent of the number of observations.
+Mean and standard deviation of successive blocks are merged with the parallel
+algorithm of Chan et al. (1979), which avoids the cancellation errors of sums of squares.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from typing import TYPE_CHECKING, Iterable, List, Union
+
+import numpy as np
+
+from cf_data_struct.datamodels import GridVarAttrs
+from cf_data_struct.utils import DEFAULT_BLOCK_BYTES, iter_blocks
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import GridCFStruct, TrajectoryCFStruct
+
+# Statistics and the corresponding CF cell methods
+VALID_BIN_STATISTICS = {
+    "mean": "area: mean",
+    "count": "area: sum",
+    "std": "area: standard_deviation",
+    "min": "area: minimum",
+    "max": "area: maximum",
+}
+
+
+class BinAccumulator(object):
+    """
+    Per-cell statistics (count, mean, sum of squared deviations, min, max)
+    of a single variable.
+    """
+
+    def __init__(self, n_cells: int) -> None:
+        """
+        :param n_cells: Number of grid cells
+        """
+        self.count = np.zeros(n_cells, dtype=np.int64)
+        self.mean = np.zeros(n_cells, dtype=np.float64)
+        self.m2 = np.zeros(n_cells, dtype=np.float64)
+        self.vmin = np.full(n_cells, np.inf, dtype=np.float64)
+        self.vmax = np.full(n_cells, -np.inf, dtype=np.float64)
+
+    def update(self, cell_index: np.ndarray, data: np.ndarray) -> None:
+        """
+        Add a block of observations
+
+        :param cell_index: Flat grid cell index of each observation
+        :param data: The observations (floating point, NaN values are ignored)
+        """
+        n_cells = self.count.size
+        block_count = np.bincount(cell_index, minlength=n_cells)
+        block_mean = np.bincount(cell_index, weights=data, minlength=n_cells)
+        cells = np.flatnonzero(block_count)
+        block_count, block_mean = block_count[cells], block_mean[cells] / block_count[cells]
+        mean_of_obs = np.zeros(n_cells, dtype=np.float64)
+        mean_of_obs[cells] = block_mean
+        block_m2 = np.bincount(cell_index, weights=(data - mean_of_obs[cell_index]) ** 2, minlength=n_cells)[cells]
+
+        count = self.count[cells]
+        total = count + block_count
+        delta = block_mean - self.mean[cells]
+        self.mean[cells] += delta * block_count / total
+        self.m2[cells] += block_m2 + delta ** 2 * count * block_count / total
+        self.count[cells] = total
+        np.minimum.at(self.vmin, cell_index, data)
+        np.maximum.at(self.vmax, cell_index, data)
+
+    def result(self, statistic: str) -> np.ndarray:
+        """
+        :param statistic: One of `VALID_BIN_STATISTICS`
+
+        :return: Flat array of the statistic per cell (NaN for empty cells)
+        """
+        if statistic == "count":
+            return self.count
+        empty = self.count == 0
+        if statistic == "mean":
+            value = self.mean.copy()
+        elif statistic == "std":
+            value = np.sqrt(self.m2 / np.maximum(self.count, 1))
+        elif statistic == "min":
+            value = self.vmin.copy()
+        elif statistic == "max":
+            value = self.vmax.copy()
+        else:
+            raise ValueError(f"{statistic=} not in {list(VALID_BIN_STATISTICS)}")
+        value[empty] = np.nan
+        return value
+
+
+class TrajectoryBinner(object):
+    """
+    Accumulates observations of trajectories in the cells of a grid. Trajectories
+    are added one at a time (`add`), the gridded statistics are returned as new
+    grid data structure (`result`).
+    """
+
+    def __init__(
+            self,
+            grid: "GridCFStruct",
+            variables: Union[str, List[str]],
+            x: str = "xc",
+            y: str = "yc",
+            x_dim: str = None,
+            y_dim: str = None,
+            record_dim: str = "time",
+            max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+    ) -> None:
+        """
+        :param grid: The target grid with one-dimensional, monotonic dimension
+            variables (cell center coordinates)
+        :param variables: Names of the trajectory variables to be binned
+        :param x: Name of the trajectory variable with the x coordinate in grid coordinates
+        :param y: Name of the trajectory variable with the y coordinate in grid coordinates
+        :param x_dim: Name of the x dimension of the grid (default: `x`)
+        :param y_dim: Name of the y dimension of the grid (default: `y`)
+        :param record_dim: The record dimension of the trajectories
+        :param max_block_bytes: Maximum number of bytes of each processed block of observations
+        """
+        self.grid = grid
+        self.variables = [variables] if isinstance(variables, str) else list(variables)
+        self.x, self.y = x, y
+        self.x_dim = x if x_dim is None else x_dim
+        self.y_dim = y if y_dim is None else y_dim
+        self.record_dim = record_dim
+        self.max_block_bytes = max_block_bytes
+        for dim_name in (self.x_dim, self.y_dim):
+            if dim_name not in grid._dims:
+                raise ValueError(f"{dim_name=} is not a dimension variable of the grid [{grid.dims}]")
+        self._x_edges = _get_cell_edges(np.asarray(grid._dims[self.x_dim].value))
+        self._y_edges = _get_cell_edges(np.asarray(grid._dims[self.y_dim].value))
+        self.shape = grid.get_dimensions((self.y_dim, self.x_dim))
+        n_cells = int(np.prod(self.shape))
+        self._accumulators = {name: BinAccumulator(n_cells) for name in self.variables}
+        self._attributes = {}
+        self._dtypes = {}
+        self._var_ids = {}
+        self.n_observations = 0
+
+    def add(self, trajectory: "TrajectoryCFStruct") -> None:
+        """
+        Add the observations of a trajectory. The trajectory data is processed in blocks,
+        i.e. memory-mapped or lazy trajectory data is not loaded at once.
+
+        :param trajectory: The trajectory
+        """
+        names = [self.x, self.y] + self.variables
+        variables = {}
+        for name in names:
+            var = trajectory._vars.get(name, trajectory._dims.get(name))
+            if var is None:
+                raise ValueError(f"Variable {name} not in trajectory [{trajectory.variable_names}]")
+            if var.dims != (self.record_dim, ):
+                raise ValueError(f"Only variables along {self.record_dim} can be binned: {name} {var.dims}")
+            variables[name] = var
+        for name in self.variables:
+            self._attributes.setdefault(name, variables[name].attrs)
+            self._dtypes.setdefault(name, variables[name].datatype)
+            self._var_ids.setdefault(name, variables[name].id)
+
+        size = trajectory._dim_shape[self.record_dim]
+        itemsize = sum(var.datatype.itemsize for var in variables.values())
+        for block in iter_blocks((size, ), itemsize, max_bytes=self.max_block_bytes):
+            x_index = _get_cell_index(np.asarray(variables[self.x].value[block]), self._x_edges)
+            y_index = _get_cell_index(np.asarray(variables[self.y].value[block]), self._y_edges)
+            in_grid = (x_index >= 0) & (y_index >= 0)
+            cell_index = y_index * self.shape[1] + x_index
+            for name in self.variables:
+                data = np.asarray(variables[name].value[block], dtype=np.float64)
+                valid = in_grid & _is_valid(data, variables[name].attrs.missing_value)
+                self._accumulators[name].update(cell_index[valid], data[valid])
+            self.n_observations += int(np.count_nonzero(in_grid))
+
+    def result(
+            self,
+            statistics: Iterable[str] = ("mean", "count", "std", "min", "max"),
+            grid_mapping: str = None,
+    ) -> "GridCFStruct":
+        """
+        Return the gridded statistics as new grid data structure with the dimensions and
+        global attributes of the target grid. The grid variables are named
+        `<variable>_<statistic>` and carry grid variable attributes (`grid_mapping`,
+        `cell_methods`).
+
+        :param statistics: The statistics (see `VALID_BIN_STATISTICS`)
+        :param grid_mapping: Name of the grid mapping variable (default: `grid.grid_mapping`)
+
+        :return: The grid data structure
+        """
+        from cf_data_struct.datastruct import CFVariable
+
+        statistics = list(statistics)
+        invalid = set(statistics).difference(VALID_BIN_STATISTICS)
+        if invalid:
+            raise ValueError(f"Invalid statistics {invalid} [{list(VALID_BIN_STATISTICS)}]")
+        grid_mapping = self.grid.grid_mapping if grid_mapping is None else grid_mapping
+        if grid_mapping is None:
+            raise ValueError("grid_mapping must be given if not defined in the grid")
+
+        grid = self.grid._new_like()
+        for dimension in self.grid._dims.values():
+            grid.add_dimension(dimension.isel({}))
+        grid.grid_mapping = grid_mapping
+        for name in self.variables:
+            accumulator = self._accumulators[name]
+            for statistic in statistics:
+                value = accumulator.result(statistic)
+                if statistic != "count":
+                    value = value.astype(self._get_dtype(name))
+                grid.add_variable(CFVariable.from_trusted(
+                    f"{name}_{statistic}",
+                    value.reshape(self.shape),
+                    (self.y_dim, self.x_dim),
+                    var_id=f"{self._var_ids.get(name, name)}_{statistic}",
+                    attributes=self._get_attributes(name, statistic, grid_mapping)
+                ))
+        return grid
+
+    def _get_dtype(self, name: str) -> np.dtype:
+        """
+        Data type of the gridded statistics: float32 for single precision input, float64 otherwise
+        """
+        dtype = self._dtypes.get(name)
+        is_single_precision = dtype is not None and dtype.kind == "f" and dtype.itemsize <= 4
+        return np.dtype("float32") if is_single_precision else np.dtype("float64")
+
+    def _get_attributes(self, name: str, statistic: str, grid_mapping: str) -> GridVarAttrs:
+        source = self._attributes.get(name)
+        long_name = name if source is None else source.long_name
+        attributes = {"grid_mapping": grid_mapping, "cell_methods": VALID_BIN_STATISTICS[statistic]}
+        if statistic == "count":
+            attributes.update(long_name=f"number of observations of {long_name}", units="1")
+        else:
+            attributes.update(long_name=f"{long_name} ({statistic})", units=None if source is None else source.units)
+            if statistic != "std" and source is not None:
+                attributes["standard_name"] = source.standard_name
+        return GridVarAttrs(**attributes)
+
+
+def bin_trajectories(
+        grid: "GridCFStruct",
+        trajectories: Union["TrajectoryCFStruct", Iterable["TrajectoryCFStruct"]],
+        variables: Union[str, List[str]],
+        statistics: Iterable[str] = ("mean", "count", "std", "min", "max"),
+        grid_mapping: str = None,
+        **kwargs
+) -> "GridCFStruct":
+    """
+    Bin the observations of one or more trajectories into the cells of a grid. The
+    trajectories are consumed one at a time, e.g. from a generator that reads files.
+
+    :param grid: The target grid
+    :param trajectories: A trajectory or an iterable of trajectories
+    :param variables: Names of the trajectory variables to be binned
+    :param statistics: The statistics (see `VALID_BIN_STATISTICS`)
+    :param grid_mapping: Name of the grid mapping variable (default: `grid.grid_mapping`)
+    :param kwargs: Keyword arguments for `TrajectoryBinner` (x, y, x_dim, y_dim, ...)
+
+    :return: Grid data structure with the gridded statistics
+    """
+    from cf_data_struct.datastruct import TrajectoryCFStruct
+
+    binner = TrajectoryBinner(grid, variables, **kwargs)
+    trajectories = [trajectories] if isinstance(trajectories, TrajectoryCFStruct) else trajectories
+    for trajectory in trajectories:
+        binner.add(trajectory)
+    return binner.result(statistics=statistics, grid_mapping=grid_mapping)
+
+
+def _get_cell_edges(centers: np.ndarray) -> np.ndarray:
+    """
+    Cell edges from monotonic cell center coordinates (edges halfway between centers)
+
+    :param centers: One-dimensional cell center coordinates
+
+    :return: Cell edges (size + 1), ascending
+    """
+    if centers.ndim != 1 or centers.size < 2:
+        raise ValueError(f"Grid coordinates must be one-dimensional with at least two cells: {centers.shape}")
+    centers = centers.astype(np.float64)
+    steps = np.diff(centers)
+    if not (np.all(steps > 0) or np.all(steps < 0)):
+        raise ValueError("Grid coordinates must be strictly monotonic")
+    edges = np.empty(centers.size + 1, dtype=np.float64)
+    edges[1:-1] = centers[:-1] + 0.5 * steps
+    edges[0] = centers[0] - 0.5 * steps[0]
+    edges[-1] = centers[-1] + 0.5 * steps[-1]
+    return edges
+
+
+def _get_cell_index(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Index of the grid cell of each coordinate value (-1 outside the grid)
+
+    :param values: Coordinate values
+    :param edges: Cell edges (ascending or descending)
+
+    :return: Cell index array
+    """
+    descending = edges[0] > edges[-1]
+    search_edges = edges[::-1] if descending else edges
+    index = np.searchsorted(search_edges, values, side="right") - 1
+    outside = (index < 0) | (index >= edges.size - 1) | ~np.isfinite(values)
+    if descending:
+        index = edges.size - 2 - index
+    index[outside] = -1
+    return index
+
+
+def _is_valid(data: np.ndarray, missing_value: float = None) -> np.ndarray:
+    valid = np.isfinite(data)
+    if missing_value is not None:
+        valid &= data != missing_value
+    return valid
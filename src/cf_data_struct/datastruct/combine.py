@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+Combination of several CF data structures into one, e.g. the concatenation
+of trajectory segments into a daily product.
+
+Each output variable is allocated once with the final size and the segments
+are copied into it in place, i.e. the cost is a single copy of the data
+regardless of the number of segments.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import concurrent.futures
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from cf_data_struct.coding.flags import is_flag_variable
+from cf_data_struct.datastruct.statistics import merge_statistics
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import (CFVariable, TrajectoryCFStruct,
+                                           TrajectoryCollectionCFStruct)
+
+# Attributes that depend on the data of a segment and are not compared
+SEGMENT_ATTRIBUTES = ["actual_range"]
+
+
+def concat_trajectories(
+        structs: Iterable["TrajectoryCFStruct"],
+        dim: str = "time",
+        max_workers: int = None,
+        sort: bool = False,
+) -> "TrajectoryCFStruct":
+    """
+    Concatenate trajectory segments along the record dimension. All segments must have
+    the same dimensions, variables (names and ids) and variable attributes. Variables
+    without the record dimension (and other dimensions) must be identical in all segments
+    and are taken from the first segment.
+
+    Data types are promoted to a common type (e.g. `datetime64[s]` and `datetime64[ns]`),
+    but flag variables must keep an integer type and time variables a datetime type.
+
+    :param structs: The trajectory segments
+    :param dim: The record dimension
+    :param max_workers: Number of threads that copy variables in parallel (default: serial copy)
+    :param sort: Order the segments by the first value of the record dimension
+
+    :raises ValueError: Incompatible segments
+
+    :return: The concatenated trajectory
+    """
+    from cf_data_struct.datastruct import CFVariable, TrajectoryCFStruct
+
+    structs = list(structs)
+    if not structs:
+        raise ValueError("No trajectory segments to concatenate")
+    for struct in structs:
+        if not isinstance(struct, TrajectoryCFStruct):
+            raise ValueError(f"{struct=} [type={type(struct)}] is not of type TrajectoryCFStruct")
+        if dim not in struct._dims:
+            raise ValueError(f"Record dimension {dim} not in {struct.dims=}")
+    if sort:
+        structs = sorted(
+            (struct for struct in structs if struct._dim_shape[dim] > 0),
+            key=lambda struct: np.asarray(struct._dims[dim].value[:1])[0]
+        ) + [struct for struct in structs if struct._dim_shape[dim] == 0]
+
+    reference = structs[0]
+    _check_compatibility(reference, structs[1:], dim)
+
+    # Dimensions first, variables after
+    names = [(True, name) for name in reference._dims] + [(False, name) for name in reference._vars]
+
+    def concat_variable(is_dim: bool, name: str) -> "CFVariable":
+        segments = [(struct._dims if is_dim else struct._vars)[name] for struct in structs]
+        var = segments[0]
+        if dim not in var.dims:
+            return var.isel({})
+        value = _concat_values([segment.value for segment in segments], var.dims.index(dim), _get_dtype(segments))
+        attributes = var.attrs
+        if any(getattr(attributes, attribute) is not None for attribute in SEGMENT_ATTRIBUTES):
+            attributes = attributes.model_copy(update=dict.fromkeys(SEGMENT_ATTRIBUTES))
+        result = CFVariable.from_trusted(var.name, value, var.dims, var_id=var.id, attributes=attributes)
+        if all(segment._stats is not None for segment in segments):
+            result._stats = merge_statistics(segment._stats for segment in segments)
+        return result
+
+    if max_workers:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            variables = list(executor.map(lambda item: concat_variable(*item), names))
+    else:
+        variables = [concat_variable(*item) for item in names]
+
+    n_dims = len(reference._dims)
+    trajectory = TrajectoryCFStruct(attributes=reference.gattrs.model_copy(), dims=variables[:n_dims])
+    trajectory.add_variables(variables[n_dims:])
+    return trajectory
+
+
+def _check_compatibility(reference: "TrajectoryCFStruct", structs: List["TrajectoryCFStruct"], dim: str) -> None:
+    """
+    Check that trajectory segments can be concatenated with the reference segment.
+
+    :raises ValueError: Incompatible segments
+    """
+    for struct in structs:
+        if struct.dims != reference.dims:
+            raise ValueError(f"Dimensions of segments differ: {struct.dims} != {reference.dims}")
+        if struct.variable_id_dict != reference.variable_id_dict:
+            raise ValueError(
+                f"Variables of segments differ: {struct.variable_id_dict} != {reference.variable_id_dict}"
+            )
+        for name, size in reference._dim_shape.items():
+            if name != dim and struct._dim_shape[name] != size:
+                raise ValueError(f"Size of dimension {name} differs: {struct._dim_shape[name]} != {size}")
+        pairs = [(var, struct._dims[name]) for name, var in reference._dims.items()]
+        pairs += [(var, struct._vars[name]) for name, var in reference._vars.items()]
+        for var, other in pairs:
+            if other.dims != var.dims:
+                raise ValueError(f"Dimensions of {var.name} differ: {other.dims} != {var.dims}")
+            if _get_attribute_key(other) != _get_attribute_key(var):
+                raise ValueError(f"Attributes of {var.name} differ: {other.attrs} != {var.attrs}")
+            if dim not in var.dims and not np.array_equal(np.asarray(other.value), np.asarray(var.value)):
+                raise ValueError(f"{var.name} has no dimension {dim} and must be identical in all segments")
+
+
+def _get_attribute_key(var: "CFVariable") -> Tuple:
+    return type(var.attrs), var.attrs.model_dump(exclude=set(SEGMENT_ATTRIBUTES))
+
+
+def _get_dtype(segments: List["CFVariable"]) -> np.dtype:
+    """
+    Common data type of all segments of a variable
+
+    :raises ValueError: Data types cannot be combined
+    """
+    var = segments[0]
+    try:
+        dtype = np.result_type(*[segment.datatype for segment in segments])
+    except TypeError as error:
+        raise ValueError(f"Data types of {var.name} cannot be combined") from error
+    kinds = {segment.datatype.kind for segment in segments}
+    if is_flag_variable(var.attrs) and dtype.kind not in "biu":
+        raise ValueError(f"Flag variable {var.name} must have integer type in all segments: {kinds=}")
+    if "M" in kinds and dtype.kind != "M":
+        raise ValueError(f"Time variable {var.name} must have datetime64 type in all segments: {kinds=}")
+    return dtype
+
+
+def _concat_values(values: List[np.ndarray], axis: int, dtype: np.dtype) -> np.ndarray:
+    """
+    Concatenate arrays along an axis into a single preallocated array
+
+    :param values: The arrays (numpy or lazy arrays)
+    :param axis: The concatenation axis
+    :param dtype: The data type of the output array
+
+    :return: The concatenated array
+    """
+    shape = list(values[0].shape)
+    shape[axis] = sum(value.shape[axis] for value in values)
+    out = np.empty(shape, dtype=dtype)
+    offset = 0
+    for value in values:
+        size = value.shape[axis]
+        index = (slice(None), ) * axis + (slice(offset, offset + size), )
+        out[index] = value if isinstance(value, np.ndarray) else np.asarray(value[...])
+        offset += size
+    return out
+
+
+def collect_trajectories(
+        trajectories: Iterable["TrajectoryCFStruct"],
+        trajectory_ids: Iterable = None,
+        record_dim: str = "time",
+        instance_dim: str = "trajectory",
+        sample_dim: str = "obs",
+        max_workers: int = None,
+) -> "TrajectoryCollectionCFStruct":
+    """
+    Combine trajectories with different numbers of records into a trajectory collection
+    in contiguous ragged array representation. The records of all trajectories are
+    concatenated along the sample dimension in a single allocation per variable
+    (see `concat_trajectories`) and the record dimension variable (e.g. time)
+    becomes a variable along the sample dimension.
+
+    :param trajectories: The trajectories with compatible dimensions, variables and attributes
+    :param trajectory_ids: Identifier of each trajectory (default: 0, 1, ..., n-1)
+    :param record_dim: The record dimension of the trajectories
+    :param instance_dim: The instance dimension of the collection
+    :param sample_dim: The sample dimension of the collection
+    :param max_workers: Number of threads that copy variables in parallel (default: serial copy)
+
+    :raises ValueError: Incompatible trajectories
+
+    :return: The trajectory collection
+    """
+    from cf_data_struct.datastruct import TrajectoryCollectionCFStruct
+
+    trajectories = list(trajectories)
+    combined = concat_trajectories(trajectories, dim=record_dim, max_workers=max_workers)
+    row_size = np.array([trajectory._dim_shape[record_dim] for trajectory in trajectories])
+    row_size = row_size.astype(np.int32 if row_size.max() <= np.iinfo(np.int32).max else np.int64)
+    trajectory_ids = np.arange(len(trajectories), dtype=np.int32) if trajectory_ids is None else trajectory_ids
+
+    dims_mapping = {record_dim: sample_dim}
+    variables = [_rename_dims(var, dims_mapping) for var in combined._dims.values() if var.name == record_dim]
+    variables += [_rename_dims(var, dims_mapping) for var in combined._vars.values()]
+    return TrajectoryCollectionCFStruct(
+        trajectory_ids=trajectory_ids,
+        row_size=row_size,
+        instance_dim=instance_dim,
+        sample_dim=sample_dim,
+        attributes=combined.gattrs,
+        dims=[var for var in combined._dims.values() if var.name != record_dim],
+        variables=variables,
+    )
+
+
+def _rename_dims(var: "CFVariable", dims_mapping: Dict[str, str]) -> "CFVariable":
+    """
+    Return a variable with renamed dimensions. The data is not copied and cached
+    statistics are kept.
+
+    :param var: The variable
+    :param dims_mapping: Dictionary {old dimension name: new dimension name}
+
+    :return: New variable
+    """
+    from cf_data_struct.datastruct import CFVariable
+
+    dims = tuple(dims_mapping.get(dim_name, dim_name) for dim_name in var.dims)
+    result = CFVariable.from_trusted(var.name, var.value, dims, var_id=var.id, attributes=var.attrs)
+    result._stats = var._stats
+    return result
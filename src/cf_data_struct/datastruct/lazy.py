@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""
+Support for lazy (deferred) variable data.
+
+A lazy array is any array-like object that provides `shape`, `dtype` and
+`__getitem__` without being a numpy array, e.g. dask arrays, netCDF4/h5py
+variables or the lightweight `DeferredArray` of this module. Lazy data is
+only loaded block-wise when it is accessed (e.g. during a chunked export).
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from typing import Any, Callable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+
+class DeferredArray(object):
+    """
+    Minimal lazy array: shape and data type are known, the data is provided
+    by a loader function that is called with a tuple of slices (one per dimension)
+    and returns the corresponding numpy array.
+    """
+
+    def __init__(
+            self,
+            shape: Tuple[int, ...],
+            dtype: Union[np.dtype, str],
+            loader: Callable[[Tuple[slice, ...]], np.ndarray]
+    ) -> None:
+        """
+        :param shape: The shape of the array
+        :param dtype: The data type of the array
+        :param loader: Function that returns the data of a hyperslab (tuple of slices)
+        """
+        self.shape = tuple(int(size) for size in shape)
+        self.dtype = np.dtype(dtype)
+        self.loader = loader
+
+    def __getitem__(self, index: Any) -> np.ndarray:
+        """
+        Load a subset of the data. Basic indexing with integers and slices is passed
+        to the loader as hyperslab, all other index types are applied to the loaded data.
+        """
+        index = index if isinstance(index, tuple) else (index, )
+        if any(item is Ellipsis for item in index):
+            position = [item is Ellipsis for item in index].index(True)
+            index = index[:position] + (slice(None), ) * (self.ndim - len(index) + 1) + index[position + 1:]
+        if len(index) > self.ndim:
+            raise IndexError(f"Too many indices for {self.ndim}-dimensional array: {len(index)}")
+        index = index + (slice(None), ) * (self.ndim - len(index))
+        is_integer = [isinstance(item, (int, np.integer)) for item in index]
+        if not all(integer or (isinstance(item, slice) and item.step in (None, 1))
+                   for item, integer in zip(index, is_integer)):
+            return self[...][index]
+        hyperslab = tuple(
+            _get_integer_slice(item, size, axis) if integer else slice(*item.indices(size)[:2])
+            for axis, (item, integer, size) in enumerate(zip(index, is_integer, self.shape))
+        )
+        data = np.asarray(self.loader(hyperslab), dtype=self.dtype)
+        squeeze_axes = tuple(axis for axis, integer in enumerate(is_integer) if integer)
+        return data.squeeze(axis=squeeze_axes) if squeeze_axes else data
+
+    def __array__(self, dtype: np.dtype = None, copy: bool = None) -> np.ndarray:
+        data = self[...]
+        return data if dtype is None else data.astype(dtype)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        if self.ndim == 0:
+            raise TypeError("Iteration over a 0-d array")
+        for i in range(self.shape[0]):
+            yield self[i]
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(shape={self.shape}, dtype={self.dtype})"
+
+
+def _get_integer_slice(item: int, size: int, axis: int) -> slice:
+    """
+    The hyperslab of an integer index (negative indices count from the end of the axis)
+
+    :param item: The integer index
+    :param size: The size of the axis
+    :param axis: The axis number (for the error message)
+
+    :return: Slice of length 1
+    """
+    item = int(item)
+    if not -size <= item < size:
+        raise IndexError(f"Index {item} is out of bounds for axis {axis} with size {size}")
+    item = item + size if item < 0 else item
+    return slice(item, item + 1)
+
+
+def is_lazy_array(value: Any) -> bool:
+    """
+    Check if a value is a lazy array, i.e. an array-like with `shape`, `dtype` and
+    `__getitem__` that is not a numpy array.
+
+    :param value: The value to check
+
+    :return: Flag if value is a lazy array
+    """
+    if isinstance(value, (np.ndarray, np.generic)):
+        return False
+    return all(hasattr(value, name) for name in ("shape", "dtype", "__getitem__"))
+
+
+def get_storage_chunks(value: Any) -> Optional[Tuple[int, ...]]:
+    """
+    The storage chunk shape of a lazy array: the (largest) chunk size of dask arrays,
+    the chunks of Zarr/h5py arrays or the HDF5 chunks of netCDF4 variables.
+
+    :param value: The lazy array
+
+    :return: Chunk shape or None (not chunked or unknown)
+    """
+    chunks = getattr(value, "chunksize", None)
+    if chunks is None:
+        chunks = getattr(value, "chunks", None)
+    if chunks is None and callable(getattr(value, "chunking", None)):
+        chunks = value.chunking()
+    if not isinstance(chunks, (tuple, list)) or len(chunks) != len(value.shape):
+        return None
+    if not all(isinstance(chunk, (int, np.integer)) and chunk > 0 for chunk in chunks):
+        return None
+    return tuple(int(chunk) for chunk in chunks)
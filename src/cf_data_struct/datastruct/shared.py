@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+"""
+Transfer of CF data structures between processes via shared memory.
+
+All variable buffers of a data structure are copied once into a single
+contiguous shared memory arena. Only a small descriptor (dimensions, attributes
+and buffer offsets) has to be sent to the other process, where the variables
+are re-created as numpy views on the arena without re-validation.
+
+Usage:
+
+    # Producer process
+    shared = SharedStruct.create(struct)
+    queue.put(shared.descriptor)
+    ...                       # wait until the consumer is done
+    shared.close()
+    shared.unlink()
+
+    # Consumer process
+    struct = attach_struct(queue.get())
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import ctypes
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from cf_data_struct.utils import iter_blocks
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import CFStructBaseClass
+
+# Alignment of the variable buffers in the shared memory arena
+BUFFER_ALIGNMENT = 64
+
+# Python < 3.13 registers every attached shared memory block with the resource tracker of
+# the attaching process (no `track` argument), which unlinks the block when that process exits
+UNTRACKED_ATTACH = sys.version_info >= (3, 13)
+
+
+class SharedVariableDescriptor(BaseModel, arbitrary_types_allowed=True):
+    """
+    Metadata of a variable and the location of its data in the shared memory arena
+    """
+    name: str
+    var_id: str
+    dims: Tuple[str, ...]
+    attributes: Any
+    dtype: str
+    shape: Tuple[int, ...]
+    offset: int
+    read_only: bool = False
+
+
+class SharedStructDescriptor(BaseModel, arbitrary_types_allowed=True):
+    """
+    Metadata of a data structure in shared memory. Small enough to be sent over a pipe.
+    """
+    shm_name: str
+    datatype: str
+    attributes: Any
+    dimensions: List[SharedVariableDescriptor]
+    variables: List[SharedVariableDescriptor]
+    # Sizes of all dimensions, including dimensions without dimension variable
+    dim_shape: Dict[str, int] = {}
+    # Grid mapping (CRS) of GridCFStruct
+    grid_mapping: Any = None
+    # Ragged array layout of TrajectoryCollectionCFStruct (the offset index is rebuilt from row_size)
+    instance_dim: Optional[str] = None
+    sample_dim: Optional[str] = None
+    row_size_name: Optional[str] = None
+
+
+class SharedStruct(object):
+    """
+    Handle of the producer side of a data structure in shared memory. The
+    producer is responsible for closing and unlinking the shared memory block.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, descriptor: SharedStructDescriptor) -> None:
+        self.shm = shm
+        self.descriptor = descriptor
+
+    @classmethod
+    def create(cls, struct: "CFStructBaseClass") -> "SharedStruct":
+        """
+        Copy all variable buffers of a data structure into a new shared memory arena.
+
+        :param struct: The CF data structure
+
+        :return: Handle with the shared memory block and the descriptor
+        """
+        variables = list(struct._dims.values()) + list(struct._vars.values())
+        offsets, offset = [], 0
+        for var in variables:
+            if var.datatype.kind not in "biufcMm":
+                raise ValueError(f"Variable {var.name} with {var.datatype=} cannot be placed in shared memory")
+            offsets.append(offset)
+            nbytes = int(np.prod(var.value.shape, dtype=np.int64)) * var.datatype.itemsize
+            offset += -(-nbytes // BUFFER_ALIGNMENT) * BUFFER_ALIGNMENT
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        descriptors = []
+        for var, var_offset in zip(variables, offsets):
+            target = np.ndarray(var.value.shape, dtype=var.datatype, buffer=shm.buf, offset=var_offset)
+            for block in iter_blocks(var.value.shape, var.datatype.itemsize):
+                target[block] = np.asarray(var.value[block])
+            del target
+            descriptors.append(SharedVariableDescriptor(
+                name=var.name,
+                var_id=var.id,
+                dims=var.dims,
+                attributes=var.attrs,
+                dtype=var.datatype.str,
+                shape=var.value.shape,
+                offset=var_offset,
+                read_only=var.read_only,
+            ))
+
+        n_dims = len(struct._dims)
+        descriptor = SharedStructDescriptor(
+            shm_name=shm.name,
+            datatype=struct.datatype,
+            attributes=struct.gattrs,
+            dimensions=descriptors[:n_dims],
+            variables=descriptors[n_dims:],
+            dim_shape=dict(struct._dim_shape),
+            grid_mapping=getattr(struct, "grid_mapping", None),
+            instance_dim=getattr(struct, "instance_dim", None),
+            sample_dim=getattr(struct, "sample_dim", None),
+            row_size_name=getattr(struct, "_row_size_name", None),
+        )
+        return cls(shm, descriptor)
+
+    def close(self) -> None:
+        self.shm.close()
+
+    def unlink(self) -> None:
+        if not UNTRACKED_ATTACH and os.name == "posix":
+            # A consumer that shares the resource tracker of the producer (e.g. a child process)
+            # has removed the registration in `attach_struct`, which `unlink` expects to exist
+            resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
+
+
+class _SharedArena(object):
+    """
+    numpy-compatible view of a shared memory block. Arrays created from the arena keep
+    a reference to it, so the memory block is only closed when the last array is deleted.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory) -> None:
+        self.shm = shm
+        # Holds a buffer export of the block, i.e. it cannot be closed while in use
+        self._buffer = (ctypes.c_char * shm.size).from_buffer(shm.buf)
+        self.__array_interface__ = {
+            "shape": (shm.size, ),
+            "typestr": "|u1",
+            "data": (ctypes.addressof(self._buffer), False),
+            "version": 3
+        }
+
+    def get_array(self, shape: Tuple[int, ...], dtype: np.dtype, offset: int) -> np.ndarray:
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        return np.asarray(self)[offset:offset + nbytes].view(dtype).reshape(shape)
+
+    def __del__(self) -> None:
+        del self._buffer
+        self.shm.close()
+
+
+def attach_struct(descriptor: SharedStructDescriptor) -> "CFStructBaseClass":
+    """
+    Re-create a data structure from its shared memory descriptor. Variable data are
+    numpy views on the shared memory arena (no copy) and attributes are not re-validated.
+    The shared memory block is kept open as long as any of the variable arrays exists.
+
+    :param descriptor: The shared memory descriptor
+
+    :return: The CF data structure
+    """
+    from cf_data_struct.datastruct import (CFVariable, GridCFStruct,
+                                           TrajectoryCFStruct,
+                                           TrajectoryCollectionCFStruct)
+
+    # The consumer must not unlink the block when it exits
+    kwargs = {"track": False} if UNTRACKED_ATTACH else {}
+    shm = shared_memory.SharedMemory(name=descriptor.shm_name, **kwargs)
+    if not UNTRACKED_ATTACH and os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+    arena = _SharedArena(shm)
+
+    def get_variable(var_descriptor: SharedVariableDescriptor) -> CFVariable:
+        value = arena.get_array(var_descriptor.shape, np.dtype(var_descriptor.dtype), var_descriptor.offset)
+        value.flags.writeable = not var_descriptor.read_only
+        return CFVariable.from_trusted(
+            var_descriptor.name,
+            value,
+            var_descriptor.dims,
+            var_id=var_descriptor.var_id,
+            attributes=var_descriptor.attributes
+        )
+
+    dims = [get_variable(var_descriptor) for var_descriptor in descriptor.dimensions]
+    variables = [get_variable(var_descriptor) for var_descriptor in descriptor.variables]
+    if descriptor.datatype == "TrajectoryCollection":
+        struct = TrajectoryCollectionCFStruct(
+            trajectory_ids=next(var for var in dims if var.name == descriptor.instance_dim),
+            row_size=next(var for var in variables if var.name == descriptor.row_size_name),
+            instance_dim=descriptor.instance_dim,
+            sample_dim=descriptor.sample_dim,
+            attributes=descriptor.attributes,
+            dims=[var for var in dims if var.name != descriptor.instance_dim],
+            variables=[var for var in variables if var.name != descriptor.row_size_name],
+        )
+    else:
+        struct_class = {"Grid": GridCFStruct, "Trajectory": TrajectoryCFStruct}[descriptor.datatype]
+        struct = struct_class(attributes=descriptor.attributes, dims=dims)
+        for name, size in descriptor.dim_shape.items():
+            struct._dim_shape.setdefault(name, size)
+        struct.add_variables(variables)
+    if isinstance(struct, GridCFStruct):
+        struct.grid_mapping = descriptor.grid_mapping
+    return struct
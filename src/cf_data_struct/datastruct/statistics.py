@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""
+Summary statistics of variable data that are computed in a single pass
+over the data. The data is processed in small blocks, so that all statistics
+of a block are computed while it resides in the CPU cache. Lazy arrays are loaded
+in large blocks aligned with their storage chunks (one read or compute per block)
+that are then processed in cache-sized blocks.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from typing import Any, Iterable, Optional, Tuple, Union
+
+import numpy as np
+from pydantic import BaseModel
+
+from cf_data_struct.datastruct.lazy import get_storage_chunks, is_lazy_array
+from cf_data_struct.utils import DEFAULT_BLOCK_BYTES, iter_blocks
+
+# Block size that fits in typical L2 caches
+STATISTICS_BLOCK_BYTES = 256 * 1024
+
+numeric = Union[int, float]
+
+
+class VariableStatistics(BaseModel):
+    """
+    Summary statistics of a variable. `vmin` and `vmax` exclude NaN/NaT and fill values
+    and are None if the variable has no valid values or is not numeric.
+    """
+    vmin: Any = None
+    vmax: Any = None
+    nan_count: int = 0
+    fill_count: int = 0
+    size: int = 0
+
+    @property
+    def valid_count(self) -> int:
+        return self.size - self.nan_count - self.fill_count
+
+    @property
+    def value_range(self) -> Optional[Tuple[Any, Any]]:
+        return None if self.vmin is None else (self.vmin, self.vmax)
+
+
+class StatisticsAccumulator(object):
+    """
+    Accumulates the variable statistics block by block, e.g. while the data
+    is written to disk, so that no separate pass over the data is required.
+    """
+
+    def __init__(self, dtype: np.dtype, size: int, fill_value: Optional[numeric] = None) -> None:
+        """
+        :param dtype: The data type of the variable
+        :param size: The number of elements of the variable
+        :param fill_value: Value that marks missing data (e.g. `missing_value` attribute)
+        """
+        self.kind = np.dtype(dtype).kind
+        self.size = int(size)
+        self.fill_value = fill_value if self.kind not in "Mm" else None
+        self.vmin = None
+        self.vmax = None
+        self.nan_count = 0
+        self.fill_count = 0
+
+    def update(self, data: np.ndarray) -> None:
+        """
+        Add a block of data to the statistics
+
+        :param data: A block of the variable data
+        """
+        if self.kind not in "biufMm":
+            return
+        data = np.asarray(data).ravel()
+        invalid = None
+        if self.kind == "f":
+            invalid = np.isnan(data)
+        elif self.kind in "Mm":
+            invalid = np.isnat(data)
+        if invalid is not None:
+            block_nan_count = int(np.count_nonzero(invalid))
+            self.nan_count += block_nan_count
+            invalid = invalid if block_nan_count else None
+        if self.fill_value is not None:
+            is_fill = data == self.fill_value
+            block_fill_count = int(np.count_nonzero(is_fill))
+            if block_fill_count:
+                self.fill_count += block_fill_count
+                invalid = is_fill if invalid is None else invalid | is_fill
+        if invalid is not None:
+            data = data[~invalid]
+        if data.size == 0:
+            return
+        block_min, block_max = data.min(), data.max()
+        self.vmin = block_min if self.vmin is None else min(self.vmin, block_min)
+        self.vmax = block_max if self.vmax is None else max(self.vmax, block_max)
+
+    def result(self) -> VariableStatistics:
+        """
+        :return: The statistics of all blocks added so far
+        """
+        vmin, vmax = self.vmin, self.vmax
+        if self.kind not in "Mm" and vmin is not None:
+            vmin, vmax = vmin.item(), vmax.item()
+        return VariableStatistics(
+            vmin=vmin,
+            vmax=vmax,
+            nan_count=self.nan_count,
+            fill_count=self.fill_count,
+            size=self.size
+        )
+
+
+def compute_statistics(
+        value: np.ndarray,
+        fill_value: Optional[numeric] = None,
+        max_block_bytes: int = STATISTICS_BLOCK_BYTES,
+        max_load_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> VariableStatistics:
+    """
+    Compute minimum, maximum, the number of NaN (NaT) and the number of fill values
+    in a single pass over the data.
+
+    :param value: Array(-like) data
+    :param fill_value: Value that marks missing data (e.g. `missing_value` attribute)
+    :param max_block_bytes: Maximum number of bytes per processed block
+    :param max_load_bytes: Maximum number of bytes per loaded block of lazy arrays
+        (blocks cover whole storage chunks, see `get_storage_chunks`)
+
+    :return: The variable statistics
+    """
+    accumulator = StatisticsAccumulator(value.dtype, np.prod(value.shape, dtype=np.int64), fill_value=fill_value)
+    if accumulator.kind not in "biufMm":
+        return accumulator.result()
+    if not is_lazy_array(value):
+        for block in iter_blocks(value.shape, value.dtype.itemsize, max_bytes=max_block_bytes):
+            accumulator.update(value[block])
+        return accumulator.result()
+    chunks = get_storage_chunks(value)
+    for load_block in iter_blocks(value.shape, value.dtype.itemsize, max_bytes=max_load_bytes, chunks=chunks):
+        data = np.asarray(value[load_block])
+        for block in iter_blocks(data.shape, data.dtype.itemsize, max_bytes=max_block_bytes):
+            accumulator.update(data[block])
+    return accumulator.result()
+
+
+def merge_statistics(statistics: Iterable[VariableStatistics]) -> VariableStatistics:
+    """
+    Combine the statistics of several parts of a variable (e.g. trajectory segments)
+    without a pass over the data.
+
+    :param statistics: The statistics of the parts
+
+    :return: The statistics of the combined variable
+    """
+    merged = VariableStatistics()
+    for part in statistics:
+        if part.vmin is not None:
+            merged.vmin = part.vmin if merged.vmin is None else min(merged.vmin, part.vmin)
+            merged.vmax = part.vmax if merged.vmax is None else max(merged.vmax, part.vmax)
+        merged.nan_count += part.nan_count
+        merged.fill_count += part.fill_count
+        merged.size += part.size
+    return merged
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+Memory-mapped storage of variable data in scratch files.
+
+Variable data that is moved ("spilled") to a scratch file is accessed through
+`np.memmap`, i.e. the operating system pages the data in on demand and can
+release the pages under memory pressure. Scratch files are removed when the
+memory map and all views on it are garbage collected.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import os
+import shutil
+import tempfile
+import weakref
+from pathlib import Path
+from typing import Any, Union
+
+import numpy as np
+
+from cf_data_struct.datastruct.lazy import is_lazy_array
+from cf_data_struct.utils import DEFAULT_BLOCK_BYTES, iter_blocks
+
+SCRATCH_PREFIX = "cf_data_struct_"
+
+
+def is_spillable(value: Any) -> bool:
+    """
+    Check if variable data can be moved to a memory-mapped scratch file, i.e. if it is
+    a numerical in-memory numpy array (not already a memory map).
+
+    :param value: The variable data
+
+    :return: Flag if data can be spilled
+    """
+    if not isinstance(value, np.ndarray) or isinstance(value, np.memmap) or is_lazy_array(value):
+        return False
+    return value.dtype.kind in "biufcMm" and value.nbytes > 0
+
+
+def in_memory_bytes(value: Any) -> int:
+    """
+    Number of bytes of variable data held in memory (memory maps and lazy arrays do not count).
+
+    :param value: The variable data
+
+    :return: Size in bytes
+    """
+    if not isinstance(value, np.ndarray) or isinstance(value, np.memmap):
+        return 0
+    return int(value.nbytes)
+
+
+def to_memmap(
+        value: np.ndarray,
+        scratch_dir: Union[str, Path],
+        prefix: str = SCRATCH_PREFIX,
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> np.memmap:
+    """
+    Copy array data into a memory-mapped scratch file. The scratch file is removed
+    when the memory map (and all views on it) is garbage collected.
+
+    :param value: Array(-like) data
+    :param scratch_dir: Directory for the scratch file
+    :param prefix: File name prefix of the scratch file
+    :param max_block_bytes: Maximum number of bytes per copied block
+
+    :return: Memory map with the data
+    """
+    file_descriptor, filepath = tempfile.mkstemp(prefix=prefix, suffix=".dat", dir=scratch_dir)
+    os.close(file_descriptor)
+    memmap = np.memmap(filepath, dtype=value.dtype, mode="w+", shape=value.shape)
+    # The mmap object is the base buffer of the memory map and of all views on it. The file
+    # is only removed after it has been unmapped (required on Windows, where open files
+    # cannot be removed)
+    weakref.finalize(memmap.base, _remove_file, filepath)
+    for block in iter_blocks(value.shape, value.dtype.itemsize, max_bytes=max_block_bytes):
+        memmap[block] = np.asarray(value[block])
+    memmap.flush()
+    return memmap
+
+
+def make_scratch_dir(owner: Any, scratch_dir: Union[str, Path] = None) -> Path:
+    """
+    Return the scratch directory for an object. A temporary directory is created
+    (and removed when `owner` is garbage collected) if `scratch_dir` is None.
+
+    :param owner: The object that uses the scratch directory
+    :param scratch_dir: Existing scratch directory (optional)
+
+    :return: The scratch directory
+    """
+    if scratch_dir is not None:
+        scratch_dir = Path(scratch_dir)
+        scratch_dir.mkdir(parents=True, exist_ok=True)
+        return scratch_dir
+    scratch_dir = Path(tempfile.mkdtemp(prefix=SCRATCH_PREFIX))
+    weakref.finalize(owner, shutil.rmtree, scratch_dir, ignore_errors=True)
+    return scratch_dir
+
+
+def _remove_file(filepath: str) -> None:
+    try:
+        os.remove(filepath)
+    except OSError:
+        pass
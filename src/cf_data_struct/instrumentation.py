@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in instrumentation of the processing stages of cf_data_struct.
+
+The following stages are recorded while an `instrument` context is active:
+
+- `variable_validation`: construction and validation of a `CFVariable`
+- `attribute_validation`: validation of variable attribute dictionaries (memoized, only
+  distinct attribute sets are validated, part of `variable_validation`)
+- `add_variable`: adding a variable to a CF data structure
+- `template_loading`: loading an output template
+- `file_writing`: export of a data structure to a file
+- `variable_writing`: writing the data of a single variable (part of `file_writing`)
+
+Each stage record contains the wall time, the bytes of variable data that have been
+copied and written and, optionally, the net bytes allocated (via `tracemalloc`).
+Timings and byte counts of nested stages are included in the enclosing stage.
+
+Without an active `instrument` context, the overhead is a single check per stage.
+
+Usage:
+
+    with instrument() as report:
+        struct = build_struct(...)
+        struct.to_netcdf(path)
+    print(report.format_table())
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import (Any, Callable, ContextManager, Dict, Iterator, List,
+                    Optional, Tuple)
+
+VALID_STAGES = [
+    "variable_validation",
+    "attribute_validation",
+    "add_variable",
+    "template_loading",
+    "file_writing",
+    "variable_writing"
+]
+
+# Active reports (global, so that stages in worker threads are recorded as well)
+_REPORTS: Tuple["InstrumentationReport", ...] = ()
+_REPORTS_LOCK = threading.Lock()
+
+# Stack of open stages of the current thread/task
+_STAGE_STACK: contextvars.ContextVar[Tuple["StageRecord", ...]] = contextvars.ContextVar("stage_stack", default=())
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+@dataclass
+class StageRecord:
+    """
+    Time and memory metrics of a single stage execution. `bytes_allocated` is the net
+    change of traced memory and None if allocations are not traced.
+    """
+    stage: str
+    label: Optional[str] = None
+    start: float = 0.0
+    duration: float = 0.0
+    bytes_allocated: Optional[int] = None
+    bytes_copied: int = 0
+    bytes_written: int = 0
+    depth: int = 0
+
+
+class InstrumentationReport(object):
+    """
+    Collection of stage records of an `instrument` context
+    """
+
+    def __init__(self, callback: Callable[[StageRecord], None] = None, trace_allocations: bool = False) -> None:
+        """
+        :param callback: Function that is called with each finished stage record
+        :param trace_allocations: Record the net allocated bytes per stage (slow)
+        """
+        self.callback = callback
+        self.trace_allocations = trace_allocations
+        self._records: List[StageRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: StageRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def filter(self, stage: str = None, label: str = None) -> List[StageRecord]:
+        """
+        Stage records of a stage and/or label (e.g. variable name or file path)
+
+        :param stage: The stage name
+        :param label: The stage label
+
+        :return: List of stage records
+        """
+        return [
+            record for record in self.records
+            if (stage is None or record.stage == stage) and (label is None or record.label == label)
+        ]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Metrics aggregated per stage (number of calls, total duration and byte counts)
+
+        :return: Dictionary {stage: {"count": ..., "duration": ..., "bytes_allocated": ..., ...}}
+        """
+        summary = {}
+        for record in self.records:
+            stage_summary = summary.setdefault(record.stage, {
+                "count": 0, "duration": 0.0, "bytes_allocated": None, "bytes_copied": 0, "bytes_written": 0
+            })
+            stage_summary["count"] += 1
+            stage_summary["duration"] += record.duration
+            stage_summary["bytes_copied"] += record.bytes_copied
+            stage_summary["bytes_written"] += record.bytes_written
+            if record.bytes_allocated is not None:
+                stage_summary["bytes_allocated"] = (stage_summary["bytes_allocated"] or 0) + record.bytes_allocated
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The report as JSON serializable dictionary
+
+        :return: Dictionary with stage records and summary
+        """
+        return {"records": [asdict(record) for record in self.records], "summary": self.summary()}
+
+    def format_table(self) -> str:
+        """
+        Summary table of all stages
+
+        :return: Multi-line string
+        """
+        lines = [f"{'stage':<24s}{'count':>8s}{'time [s]':>12s}{'allocated':>14s}{'copied':>14s}{'written':>14s}"]
+        for stage, metrics in self.summary().items():
+            allocated = "-" if metrics["bytes_allocated"] is None else str(metrics["bytes_allocated"])
+            lines.append(
+                f"{stage:<24s}{metrics['count']:>8d}{metrics['duration']:>12.4f}{allocated:>14s}"
+                f"{metrics['bytes_copied']:>14d}{metrics['bytes_written']:>14d}"
+            )
+        return "\n".join(lines)
+
+    @property
+    def records(self) -> List[StageRecord]:
+        with self._lock:
+            return list(self._records)
+
+
+@contextlib.contextmanager
+def instrument(
+        callback: Callable[[StageRecord], None] = None,
+        trace_allocations: bool = False
+) -> Iterator[InstrumentationReport]:
+    """
+    Record all stages (in all threads) while the context is active.
+
+    :param callback: Function that is called with each finished stage record
+    :param trace_allocations: Record the net allocated bytes per stage with `tracemalloc`.
+        This slows down the processing considerably.
+
+    :return: The instrumentation report (filled while the context is active)
+    """
+    global _REPORTS
+    report = InstrumentationReport(callback=callback, trace_allocations=trace_allocations)
+    start_tracing = trace_allocations and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    with _REPORTS_LOCK:
+        _REPORTS = _REPORTS + (report, )
+    try:
+        yield report
+    finally:
+        with _REPORTS_LOCK:
+            _REPORTS = tuple(active for active in _REPORTS if active is not report)
+        if start_tracing:
+            tracemalloc.stop()
+
+
+def is_active() -> bool:
+    """
+    :return: True if an `instrument` context is active
+    """
+    return bool(_REPORTS)
+
+
+class _Stage(object):
+    """
+    Context manager that measures a stage and adds the record to all active reports
+    """
+
+    def __init__(self, name: str, label: Optional[str], reports: Tuple[InstrumentationReport, ...]) -> None:
+        self.reports = reports
+        self.record = StageRecord(stage=name, label=label)
+        self.trace_allocations = any(report.trace_allocations for report in reports) and tracemalloc.is_tracing()
+        self._token = None
+        self._memory_start = 0
+
+    def __enter__(self) -> StageRecord:
+        stack = _STAGE_STACK.get()
+        self.record.depth = len(stack)
+        self._token = _STAGE_STACK.set(stack + (self.record, ))
+        if self.trace_allocations:
+            self._memory_start = tracemalloc.get_traced_memory()[0]
+        self.record.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc_info) -> None:
+        record = self.record
+        record.duration = time.perf_counter() - record.start
+        if self.trace_allocations:
+            record.bytes_allocated = tracemalloc.get_traced_memory()[0] - self._memory_start
+        _STAGE_STACK.reset(self._token)
+        # Byte counts of nested stages are included in the enclosing stage
+        stack = _STAGE_STACK.get()
+        if stack:
+            stack[-1].bytes_copied += record.bytes_copied
+            stack[-1].bytes_written += record.bytes_written
+        for report in self.reports:
+            report.add(record)
+
+
+def stage(name: str, label: str = None) -> ContextManager[Optional[StageRecord]]:
+    """
+    Context manager for an instrumented stage. Returns a no-op context (yielding None)
+    if no `instrument` context is active.
+
+    :param name: The stage name (see `VALID_STAGES`)
+    :param label: Label of the stage execution (e.g. variable name or file path)
+
+    :return: Context manager yielding the stage record
+    """
+    reports = _REPORTS
+    if not reports:
+        return _NULL_STAGE
+    return _Stage(name, label, reports)
+
+
+def instrumented(name: str, label: Callable[..., Any] = None) -> Callable:
+    """
+    Decorator for functions that are recorded as a stage.
+
+    :param name: The stage name (see `VALID_STAGES`)
+    :param label: Function that returns the stage label from the arguments of the decorated function
+
+    :return: Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _REPORTS:
+                return func(*args, **kwargs)
+            with stage(name, None if label is None else str(label(*args, **kwargs))):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_bytes(copied: int = 0, written: int = 0) -> None:
+    """
+    Add copied/written bytes to the innermost open stage (no-op without open stage)
+
+    :param copied: Number of bytes of data copied
+    :param written: Number of bytes of data written to file
+
+    :return: None
+    """
+    stack = _STAGE_STACK.get()
+    if not stack:
+        return
+    stack[-1].bytes_copied += int(copied)
+    stack[-1].bytes_written += int(written)
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+"""
+The io module contains the file export and import of the CF data structures
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from cf_data_struct.io.batch import ExportTask, export_batch
+from cf_data_struct.io.digest import compute_digest, read_digest
+from cf_data_struct.io.netcdf import append_netcdf, read_netcdf, write_netcdf
+from cf_data_struct.io.pipeline import ExportQueue
+from cf_data_struct.io.zarr import write_zarr
+
+__all__ = [
+    "batch", "digest", "encoding", "netcdf", "pipeline", "zarr", "ExportQueue", "ExportTask", "append_netcdf",
+    "compute_digest", "export_batch", "read_digest", "read_netcdf", "write_netcdf", "write_zarr"
+]
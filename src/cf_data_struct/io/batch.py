@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parallel export of many data products with a process pool.
+
+Each export task is a small, picklable descriptor: the output path and a
+factory (a module-level function or `functools.partial`) that creates the
+CF data structure. The structure is built and written inside the worker
+process, so no variable data crosses process boundaries.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from pydantic import BaseModel
+
+VALID_EXPORT_METHODS = ["to_netcdf", "to_zarr"]
+
+
+class ExportTask(BaseModel):
+    """
+    Descriptor of a single product export: `factory(*args, **kwargs)` must return a
+    CF data structure which is written to `path` with `method(**writer_kwargs)`.
+    """
+    path: Path
+    factory: Callable
+    args: Tuple = ()
+    kwargs: Dict[str, Any] = {}
+    method: str = "to_netcdf"
+    writer_kwargs: Dict[str, Any] = {}
+
+
+class ExportResult(BaseModel):
+    """
+    Result of a single product export
+    """
+    path: Path
+    success: bool
+    error: Optional[str] = None
+    build_seconds: float = 0.0
+    write_seconds: float = 0.0
+    file_size: int = 0
+
+
+class BatchReport(BaseModel):
+    """
+    Progress and throughput of a batch export
+    """
+    n_total: Optional[int] = None
+    n_done: int = 0
+    n_failed: int = 0
+    bytes_written: int = 0
+    elapsed_seconds: float = 0.0
+    results: List[ExportResult] = []
+
+    @property
+    def files_per_second(self) -> float:
+        return self.n_done / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes_written / 1024 ** 2 / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def failed(self) -> List[ExportResult]:
+        return [result for result in self.results if not result.success]
+
+    def __str__(self) -> str:
+        total = "?" if self.n_total is None else self.n_total
+        return (
+            f"{self.n_done}/{total} files ({self.n_failed} failed) in {self.elapsed_seconds:.1f}s "
+            f"[{self.files_per_second:.2f} files/s, {self.mb_per_second:.1f} MB/s]"
+        )
+
+
+def export_batch(
+        tasks: Iterable[ExportTask],
+        max_workers: int = None,
+        max_in_flight: int = None,
+        progress: Callable[[ExportResult, BatchReport], None] = None,
+        mp_context: multiprocessing.context.BaseContext = None,
+) -> BatchReport:
+    """
+    Build and write products concurrently in a process pool. Errors are isolated per
+    file: a failing task is reported in the batch report and does not stop the batch.
+    If a worker process dies, the tasks in flight are reported as failed and the
+    remaining tasks are submitted to a new process pool.
+
+    :param tasks: Iterable of export tasks (consumed lazily)
+    :param max_workers: Number of worker processes (default: number of CPUs).
+        0 runs all tasks serially in the calling process.
+    :param max_in_flight: Maximum number of submitted but unfinished tasks
+        (default: 2 x number of workers)
+    :param progress: Function called with the result and the current report after each task
+    :param mp_context: multiprocessing context of the process pool
+
+    :return: The batch report
+    """
+    n_total = len(tasks) if hasattr(tasks, "__len__") else None
+    report = BatchReport(n_total=n_total)
+    t0 = time.perf_counter()
+
+    def add_result(result: ExportResult) -> None:
+        report.results.append(result)
+        report.n_done += 1
+        report.n_failed += 0 if result.success else 1
+        report.bytes_written += result.file_size
+        report.elapsed_seconds = time.perf_counter() - t0
+        if not result.success:
+            logger.error(f"Export of {result.path} failed:\n{result.error}")
+        if progress is not None:
+            progress(result, report)
+
+    if max_workers == 0:
+        for task in tasks:
+            add_result(run_export_task(task))
+        return report
+
+    max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+    max_in_flight = 2 * max_workers if max_in_flight is None else max(1, max_in_flight)
+    pending = {}
+
+    def collect(futures: Iterable[concurrent.futures.Future]) -> bool:
+        """
+        Add the results of finished futures to the report and return True if the process pool is broken
+        """
+        is_broken = False
+        for future in futures:
+            task = pending.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                # A worker process died (e.g. killed by the OOM killer), which fails all tasks in flight
+                is_broken = True
+                result = ExportResult(path=task.path, success=False, error=traceback.format_exc())
+            except Exception:
+                # e.g. the task or its result could not be pickled
+                result = ExportResult(path=task.path, success=False, error=traceback.format_exc())
+            add_result(result)
+        return is_broken
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+    try:
+        task_iterator = iter(tasks)
+        exhausted = False
+        while pending or not exhausted:
+            broken = False
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    task = next(task_iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                try:
+                    pending[executor.submit(run_export_task, task)] = task
+                except BrokenProcessPool:
+                    # The pool broke after the last completed task: the task is submitted to the new pool
+                    task_iterator = itertools.chain([task], task_iterator)
+                    broken = True
+                    break
+            if pending and not broken:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                broken = collect(done)
+            if broken:
+                done, _ = concurrent.futures.wait(pending)
+                collect(done)
+                logger.warning("Process pool broken, restarting worker processes")
+                executor.shutdown()
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+    finally:
+        executor.shutdown()
+
+    report.elapsed_seconds = time.perf_counter() - t0
+    return report
+
+
+def run_export_task(task: ExportTask) -> ExportResult:
+    """
+    Build the data structure of an export task and write it to disk. Exceptions
+    are caught and returned as failed export result.
+
+    :param task: The export task
+
+    :return: The export result
+    """
+    try:
+        if task.method not in VALID_EXPORT_METHODS:
+            raise ValueError(f"{task.method=} not in {VALID_EXPORT_METHODS=}")
+        t0 = time.perf_counter()
+        struct = task.factory(*task.args, **task.kwargs)
+        t1 = time.perf_counter()
+        path = getattr(struct, task.method)(task.path, **task.writer_kwargs)
+        t2 = time.perf_counter()
+        return ExportResult(
+            path=task.path,
+            success=True,
+            build_seconds=t1 - t0,
+            write_seconds=t2 - t1,
+            file_size=_get_size(Path(path))
+        )
+    except Exception:
+        return ExportResult(path=task.path, success=False, error=traceback.format_exc())
+
+
+def _get_size(path: Path) -> int:
+    """
+    Size of a file or of all files in a directory (e.g. a Zarr store) in bytes
+    """
+    if path.is_dir():
+        return sum(filepath.stat().st_size for filepath in path.rglob("*") if filepath.is_file())
+    return path.stat().st_size if path.is_file() else 0
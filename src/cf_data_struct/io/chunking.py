@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+"""
+Chunk shape and compression planning for netCDF/HDF5 export of grid data.
+
+The chunk shape determines how much data has to be read and decompressed for
+a given access pattern:
+
+- "map": reads of complete horizontal fields (e.g. one time step). Chunks cover
+  the horizontal dimensions (the last two dimensions by CF convention) and have
+  length one along all other dimensions.
+- "timeseries": reads of all values of few grid cells. Chunks cover the full
+  length of the non-horizontal dimensions and are filled up with horizontal tiles.
+
+The HDF5 chunk cache is a setting of an open file handle and is not stored in
+the file. The planned cache size is therefore applied by readers with
+`set_chunk_caches` after opening the file.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from typing import (TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple,
+                    Union)
+
+import numpy as np
+from pydantic import BaseModel, field_validator
+
+if TYPE_CHECKING:
+    import netCDF4
+
+    from cf_data_struct.datastruct import CFStructBaseClass
+
+VALID_ACCESS_PATTERNS = ["map", "timeseries"]
+
+# Target size of a single (uncompressed) chunk
+DEFAULT_CHUNK_BYTES = 1024 ** 2
+
+# Variables smaller than this are written contiguous without compression
+MIN_CHUNKED_BYTES = 16 * 1024
+
+# Upper limit for the HDF5 chunk cache per variable
+MAX_CHUNK_CACHE_BYTES = 256 * 1024 ** 2
+
+# Default HDF5 chunk cache size (netCDF-C default)
+DEFAULT_CHUNK_CACHE_BYTES = 16 * 1024 ** 2
+
+
+class ChunkPlan(BaseModel):
+    """
+    Storage layout and compression settings of a single variable and the
+    HDF5 chunk cache size for reading it with the planned access pattern
+    """
+    chunksizes: Optional[Tuple[int, ...]] = None
+    zlib: bool = True
+    complevel: int = 4
+    shuffle: bool = True
+    chunk_cache: int = DEFAULT_CHUNK_CACHE_BYTES
+
+    # noinspection PyNestedDecorators
+    @field_validator("complevel")
+    @classmethod
+    def valid_complevel(cls, complevel: int) -> int:
+        if not 0 <= complevel <= 9:
+            raise ValueError(f"{complevel=} not in range [0, 9]")
+        return complevel
+
+    @property
+    def encoding(self) -> Dict[str, Any]:
+        """
+        Encoding dictionary for `cf_data_struct.io.netcdf.write_netcdf` (without the
+        chunk cache, which is a reader setting, see `set_chunk_caches`)
+        """
+        if self.chunksizes is None:
+            return {"contiguous": True, "zlib": False, "shuffle": False}
+        return {
+            "chunksizes": self.chunksizes,
+            "zlib": self.zlib,
+            "complevel": self.complevel,
+            "shuffle": self.shuffle
+        }
+
+
+def plan_variable_chunks(
+        shape: Sequence[int],
+        dtype: Union[np.dtype, str],
+        access_pattern: str = "map",
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+        complevel: int = 4,
+) -> ChunkPlan:
+    """
+    Compute the chunk shape, compression and chunk cache settings for a variable.
+
+    :param shape: The shape of the variable
+    :param dtype: The data type of the variable
+    :param access_pattern: The dominant read access pattern (one of `VALID_ACCESS_PATTERNS`)
+    :param chunk_bytes: Target size of a single uncompressed chunk in bytes
+    :param complevel: zlib compression level
+
+    :return: The chunk plan of the variable
+    """
+    if access_pattern not in VALID_ACCESS_PATTERNS:
+        raise ValueError(f"{access_pattern=} not in {VALID_ACCESS_PATTERNS=}")
+
+    shape = tuple(int(size) for size in shape)
+    itemsize = np.dtype(dtype).itemsize
+    if len(shape) == 0 or int(np.prod(shape)) * itemsize < MIN_CHUNKED_BYTES:
+        return ChunkPlan(chunksizes=None, zlib=False, shuffle=False, complevel=0)
+
+    # Dimensions that are covered completely by a chunk if possible
+    horizontal_axes = list(range(len(shape)))[-2:]
+    other_axes = [axis for axis in range(len(shape)) if axis not in horizontal_axes]
+    if access_pattern == "map" or not other_axes:
+        priority_axes, fill_axes = horizontal_axes, []
+    else:
+        priority_axes, fill_axes = other_axes, horizontal_axes
+
+    chunks = [1] * len(shape)
+    for axis in priority_axes:
+        chunks[axis] = shape[axis]
+    max_items = max(1, chunk_bytes // itemsize)
+    _shrink_chunks(chunks, priority_axes, max_items)
+    _grow_chunks(chunks, shape, fill_axes, max_items)
+
+    # The chunk cache holds all chunks touched by a single read of the access pattern
+    n_chunks_per_read = int(np.prod([-(-shape[axis] // chunks[axis]) for axis in priority_axes]))
+    chunk_cache = int(np.prod(chunks)) * itemsize * n_chunks_per_read
+    chunk_cache = int(np.clip(chunk_cache, DEFAULT_CHUNK_CACHE_BYTES, MAX_CHUNK_CACHE_BYTES))
+
+    return ChunkPlan(
+        chunksizes=tuple(chunks),
+        zlib=complevel > 0,
+        complevel=complevel,
+        shuffle=itemsize > 1,
+        chunk_cache=chunk_cache
+    )
+
+
+def plan_chunks(
+        struct: "CFStructBaseClass",
+        access_pattern: str = "map",
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+        complevel: int = 4,
+) -> Dict[str, ChunkPlan]:
+    """
+    Compute chunk plans for all dimension variables and variables of a data structure
+    from the dimension sizes and the variable data types.
+
+    :param struct: The CF data structure
+    :param access_pattern: The dominant read access pattern (one of `VALID_ACCESS_PATTERNS`)
+    :param chunk_bytes: Target size of a single uncompressed chunk in bytes
+    :param complevel: zlib compression level
+
+    :return: Dictionary {variable name: chunk plan}
+    """
+    plans = {}
+    for var in list(struct._dims.values()) + list(struct._vars.values()):
+        shape = struct.get_dimensions(var.dims)
+        plans[var.name] = plan_variable_chunks(
+            shape,
+            var.datatype,
+            access_pattern=access_pattern,
+            chunk_bytes=chunk_bytes,
+            complevel=complevel
+        )
+    return plans
+
+
+def set_chunk_caches(dataset: "netCDF4.Dataset", plans: Dict[str, ChunkPlan]) -> None:
+    """
+    Set the HDF5 chunk cache of the variables of an open netCDF file to the planned
+    size. The cache size only applies to the given file handle.
+
+    :param dataset: The open netCDF dataset
+    :param plans: Dictionary {variable name: chunk plan} (variables missing in the file are ignored)
+
+    :return: None
+    """
+    for name, plan in plans.items():
+        if plan.chunksizes is not None and name in dataset.variables:
+            dataset.variables[name].set_var_chunk_cache(size=plan.chunk_cache)
+
+
+def _shrink_chunks(chunks: List[int], axes: List[int], max_items: int) -> None:
+    """
+    Halve the largest chunk dimension of `axes` until the chunk has at most `max_items` elements.
+    """
+    while int(np.prod(chunks)) > max_items:
+        axis = max(axes, key=lambda a: chunks[a])
+        if chunks[axis] == 1:
+            break
+        chunks[axis] = -(-chunks[axis] // 2)
+
+
+def _grow_chunks(chunks: List[int], shape: Tuple[int, ...], axes: List[int], max_items: int) -> None:
+    """
+    Double the smallest chunk dimension of `axes` as long as the chunk has at most `max_items` elements.
+    """
+    while axes:
+        growable = [axis for axis in axes if chunks[axis] < shape[axis]]
+        if not growable:
+            break
+        axis = min(growable, key=lambda a: chunks[a])
+        previous = chunks[axis]
+        chunks[axis] = min(2 * chunks[axis], shape[axis])
+        if int(np.prod(chunks)) > max_items:
+            chunks[axis] = previous
+            break
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""
+Content digest of CF data structures for skip-if-unchanged exports.
+
+The digest covers everything that defines the content of an exported file: the
+dimension sizes, the global attributes, the name, dimensions, data type, attributes
+and data of each variable, and the writer options (e.g. compression settings).
+It is stored as global attribute `content_digest` of the exported file, and an export
+with `skip_unchanged=True` is skipped if the target already carries the same digest.
+The version of cf_data_struct is not part of the digest.
+
+Variable data is hashed as tree: the data buffer is split into blocks of fixed size
+(`DIGEST_BLOCK_BYTES`), the blocks are hashed by a thread pool (hashlib releases the GIL)
+and the variable digest is computed from the ordered block digests. The digest is
+therefore independent of the number of threads. Blocks of lazy variables are loaded
+in the worker threads, so that at most one block per thread resides in memory.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import concurrent.futures
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+import netCDF4
+import numpy as np
+from loguru import logger
+
+from cf_data_struct.utils import iter_blocks
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import CFStructBaseClass, CFVariable
+
+DIGEST_ATTRIBUTE = "content_digest"
+DIGEST_ALGORITHM = "sha256"
+DIGEST_BLOCK_BYTES = 4 * 1024 ** 2
+
+# Changes of the digest layout invalidate all stored digests
+DIGEST_FORMAT_VERSION = 1
+
+
+def compute_digest(
+        struct: "CFStructBaseClass",
+        options: Dict[str, Any] = None,
+        max_workers: int = None,
+) -> str:
+    """
+    Compute the content digest of a CF data structure.
+
+    :param struct: The CF data structure
+    :param options: Writer options that affect the exported file (e.g. encoding, compression)
+    :param max_workers: Number of hashing threads (default: number of CPUs)
+
+    :return: Digest string ("<algorithm>:<hex digest>")
+    """
+    variables = list(struct._dims.values()) + list(struct._vars.values())
+    header = {
+        "version": DIGEST_FORMAT_VERSION,
+        "options": options or {},
+        "dimensions": dict(struct._dim_shape),
+        "attributes": struct.gattrs.model_dump(exclude_none=True, exclude={DIGEST_ATTRIBUTE}),
+    }
+    digest = hashlib.new(DIGEST_ALGORITHM, _to_canonical_json(header))
+
+    max_workers = (os.cpu_count() or 1) if max_workers is None else max(1, max_workers)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="digest") as executor:
+        block_digests = [
+            [executor.submit(_get_block_digest, var.value, block) for block in _iter_digest_blocks(var)]
+            for var in variables
+        ]
+        for var, futures in zip(variables, block_digests):
+            digest.update(_get_variable_digest(var, [future.result() for future in futures]))
+    return f"{DIGEST_ALGORITHM}:{digest.hexdigest()}"
+
+
+def read_digest(path: Union[str, Path]) -> Optional[str]:
+    """
+    The content digest stored in an exported netCDF file or Zarr store
+
+    :param path: The file or store path
+
+    :return: The digest string or None (no target, no digest or unreadable target)
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        if path.is_dir():
+            from cf_data_struct.io.zarr import _import_zarr
+            digest = _import_zarr().open_group(str(path), mode="r").attrs.get(DIGEST_ATTRIBUTE)
+        else:
+            with netCDF4.Dataset(path) as dataset:
+                digest = getattr(dataset, DIGEST_ATTRIBUTE, None)
+    except Exception as error:
+        # A damaged target is treated as changed and overwritten
+        logger.warning(f"Cannot read the content digest of {path}: {error}")
+        return None
+    return digest if isinstance(digest, str) else None
+
+
+def _get_variable_digest(var: "CFVariable", block_digests: List[bytes]) -> bytes:
+    """
+    Variable digest from the header (name, dimensions, data type, shape, attributes)
+    and the ordered block digests of the data
+    """
+    header = {
+        "name": var.name,
+        "dims": list(var.dims),
+        "dtype": var.datatype.str,
+        "shape": list(var.value.shape),
+        "attributes": var._attrs.model_dump(exclude_none=True),
+    }
+    digest = hashlib.new(DIGEST_ALGORITHM, _to_canonical_json(header))
+    for block_digest in block_digests:
+        digest.update(block_digest)
+    return digest.digest()
+
+
+def _iter_digest_blocks(var: "CFVariable") -> List[Tuple[slice, ...]]:
+    value = var.value
+    return list(iter_blocks(value.shape, value.dtype.itemsize, max_bytes=DIGEST_BLOCK_BYTES))
+
+
+def _get_block_digest(value: np.ndarray, block: Tuple[slice, ...]) -> bytes:
+    """
+    Digest of a block of variable data (loaded here for lazy arrays)
+    """
+    data = np.asarray(value[block])
+    if data.dtype.kind == "O":
+        # Variable length strings
+        buffer = "\0".join(str(item) for item in data.ravel()).encode("utf-8")
+    else:
+        buffer = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+    return hashlib.new(DIGEST_ALGORITHM, buffer).digest()
+
+
+def _to_canonical_json(item: Any) -> bytes:
+    """
+    JSON representation with sorted keys and numpy types converted to Python types
+    """
+    return json.dumps(item, sort_keys=True, separators=(",", ":"), default=_to_json_type).encode("utf-8")
+
+
+def _to_json_type(value: Any) -> Any:
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, bytes):
+        return list(value)
+    return str(value)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+Variable encoding helpers shared by the export backends (netCDF, Zarr): the
+`actual_range` attribute in unpacked or encoded units, the CF time encoding of
+datetime64 variables and the attributes of packed variables.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from cf_data_struct.coding.flags import is_flag_variable
+from cf_data_struct.coding.packing import PackingParameters
+from cf_data_struct.coding.times import (TimeEncoding, encode_times,
+                                         get_time_encoding)
+from cf_data_struct.utils import DEFAULT_BLOCK_BYTES
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import CFVariable
+
+
+def get_actual_range(var: "CFVariable", time_encoding: TimeEncoding = None) -> Optional[Tuple[Any, Any]]:
+    """
+    The `actual_range` attribute (in unpacked units) from the cached statistics of
+    a numerical variable. Flag variables have no `actual_range`.
+
+    :param var: The CF variable
+    :param time_encoding: The time encoding of datetime64 variables (range in encoded units)
+
+    :return: (minimum, maximum) or None
+    """
+    if time_encoding is not None and var.datatype.kind == "M":
+        value_range = var.stats.value_range
+        return None if value_range is None else tuple(encode_times(np.array(value_range), time_encoding).tolist())
+    if var.datatype.kind not in "iuf" or is_flag_variable(var._attrs):
+        return None
+    value_range = var.stats.value_range
+    if value_range is None:
+        return None
+    scale_factor, add_offset = var._attrs.scale_factor, var._attrs.add_offset
+    if scale_factor is not None or add_offset is not None:
+        scale_factor = 1.0 if scale_factor is None else scale_factor
+        add_offset = 0.0 if add_offset is None else add_offset
+        value_range = tuple(value * scale_factor + add_offset for value in value_range)
+    return value_range
+
+
+def get_variable_time_encoding(
+        var: "CFVariable",
+        encoding: Dict[str, Any],
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES
+) -> Optional[TimeEncoding]:
+    """
+    The CF time encoding of a datetime64 variable from its `units` and `calendar` attributes
+    and the `dtype` encoding entry (automatic, lossless selection if not specified).
+
+    :param var: The CF variable
+    :param encoding: Encoding settings of the variable
+    :param max_block_bytes: Maximum number of bytes per data block
+
+    :return: The time encoding or None for variables without datetime64 data
+    """
+    if var.datatype.kind != "M":
+        return None
+    return get_time_encoding(
+        var.value,
+        units=var._attrs.units,
+        calendar=getattr(var._attrs, "calendar", None),
+        dtype=encoding.get("dtype"),
+        max_block_bytes=max_block_bytes
+    )
+
+
+def get_packing_attributes(params: PackingParameters, unpacked_dtype: np.dtype) -> Dict[str, Any]:
+    """
+    Packing attributes with the data types required by the CF conventions: `scale_factor`
+    and `add_offset` in the unpacked data type, all other attributes in the packed data type.
+
+    :param params: The packing parameters
+    :param unpacked_dtype: The data type of the unpacked data
+
+    :return: Attribute dictionary
+    """
+    return {
+        name: np.asarray(value, dtype=unpacked_dtype if name in ["scale_factor", "add_offset"] else params.dtype)
+        for name, value in params.attributes.items()
+    }
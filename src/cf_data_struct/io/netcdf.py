@@ -0,0 +1,806 @@
+# -*- coding: utf-8 -*-
+
+"""
+Native netCDF4 export (and import) of the CF data structures.
+
+The writer creates dimensions and variables directly with netCDF4-python
+and streams the variable data to disk in hyperslabs of bounded size, so that
+the memory consumption of the export does not depend on the product size.
+The reader opens existing files as data structures with lazy variable data.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import contextlib
+import functools
+from pathlib import Path
+from typing import (TYPE_CHECKING, Any, Callable, Dict, Iterable, List,
+                    Optional, Tuple, Type, Union)
+
+import netCDF4
+import numpy as np
+import pydantic
+from loguru import logger
+
+from cf_data_struct.coding.flags import is_flag_variable
+from cf_data_struct.coding.packing import (PackingParameters,
+                                           get_packing_parameters, pack_block)
+from cf_data_struct.coding.quantization import (QUANTIZATION_ALGORITHM,
+                                                QUANTIZATION_VARIABLE,
+                                                quantize_block,
+                                                significant_digits_to_bits)
+from cf_data_struct.coding.times import TimeEncoding, encode_times
+from cf_data_struct.datamodels import (BasicCFGlobalAttributes, BasicVarAttrs,
+                                       get_variable_attribute_model)
+from cf_data_struct.datastruct.lazy import DeferredArray
+from cf_data_struct.datastruct.statistics import StatisticsAccumulator
+from cf_data_struct.instrumentation import instrumented, record_bytes
+from cf_data_struct.io.digest import (DIGEST_ATTRIBUTE, compute_digest,
+                                      read_digest)
+from cf_data_struct.io.encoding import (get_actual_range,
+                                        get_packing_attributes,
+                                        get_variable_time_encoding)
+from cf_data_struct.utils import (DEFAULT_BLOCK_BYTES, VALID_ENCODING_KEYS,
+                                  iter_blocks)
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import CFStructBaseClass, CFVariable
+
+# Variable attributes that must have the same data type as the variable
+DTYPE_MATCHED_ATTRIBUTES = [
+    "actual_range", "missing_value", "valid_min", "valid_max", "valid_range", "flag_values", "flag_masks"
+]
+
+
+@instrumented("file_writing", label=lambda struct, path, *args, **kwargs: path)
+def write_netcdf(
+        struct: "CFStructBaseClass",
+        path: Union[str, Path],
+        encoding: Dict[str, Dict[str, Any]] = None,
+        zlib: bool = True,
+        complevel: int = 4,
+        shuffle: bool = True,
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+        unlimited_dims: Iterable[str] = None,
+        file_format: str = "NETCDF4",
+        skip_unchanged: bool = False,
+) -> Path:
+    """
+    Write a CF data structure to a netCDF file. Variable data is written in
+    blocks of at most `max_block_bytes`, which defines the memory ceiling of the export
+    (in addition to the memory used by netCDF/HDF5 chunk caches).
+
+    :param struct: The CF data structure (dimensions, variables and global attributes)
+    :param path: The target file path
+    :param encoding: Per-variable encoding settings ({var_name: {"zlib": ..., "chunksizes": ...}})
+        that overwrite the default compression settings. Floating point variables with a
+        `packed_dtype` entry (e.g. "int16") are packed block-wise during the export. Floating point
+        variables with a `quantize_nsb` (significant bits) or `quantize_digits` (significant
+        decimal digits) entry or a `quantization_nsb` attribute are quantized by bit rounding.
+        datetime64 variables are encoded with their `units`/`calendar` attributes or with the
+        coarsest lossless time unit and the smallest integer type (see `get_time_encoding`).
+        Packing and the compact data type of integer flag variables require the value range
+        before the first block is written: lazy variables without cached statistics are then
+        read twice (statistics pass and write pass).
+    :param zlib: Default zlib compression flag
+    :param complevel: Default zlib compression level
+    :param shuffle: Default HDF5 shuffle filter flag
+    :param max_block_bytes: Maximum number of bytes per written data block
+    :param unlimited_dims: Names of dimensions that should be created as unlimited
+    :param file_format: netCDF file format
+    :param skip_unchanged: Store the content digest (see `cf_data_struct.io.digest`) as global
+        attribute and skip the export if the existing file has the same digest
+
+    :return: The file path
+    """
+    path = Path(path)
+    encoding = encoding if encoding is not None else {}
+    unlimited_dims = set(unlimited_dims) if unlimited_dims is not None else set()
+    default_encoding = {"zlib": zlib, "complevel": complevel, "shuffle": shuffle}
+
+    digest = None
+    if skip_unchanged:
+        options = {
+            "writer": "netcdf", "encoding": encoding, "unlimited_dims": sorted(unlimited_dims),
+            "file_format": file_format, **default_encoding
+        }
+        digest = compute_digest(struct, options=options)
+        if read_digest(path) == digest:
+            logger.debug(f"Skip export of unchanged file {path}")
+            return path
+
+    with netCDF4.Dataset(path, mode="w", format=file_format) as dataset:
+        # All data is written explicitly, no need to pre-fill the variables
+        dataset.set_fill_off()
+
+        for name, size in struct._dim_shape.items():
+            dataset.createDimension(name, None if name in unlimited_dims else size)
+
+        has_quantization = False
+        for var in list(struct._dims.values()) + list(struct._vars.values()):
+            var_encoding = {**default_encoding, **encoding.get(var.name, {})}
+            time_encoding = get_variable_time_encoding(var, var_encoding, max_block_bytes=max_block_bytes)
+            if time_encoding is not None:
+                var_encoding["dtype"] = time_encoding.dtype
+            nc_var = create_variable(dataset, var, var_encoding, add_actual_range=False)
+            chunks = nc_var.chunking()
+            chunks = chunks if isinstance(chunks, list) and not unlimited_dims.intersection(var.dims) else None
+            transform = None
+            if time_encoding is not None:
+                nc_var.setncatts(time_encoding.attributes)
+                transform = functools.partial(encode_times, encoding=time_encoding)
+            if "packed_dtype" in var_encoding:
+                params = get_packing_parameters(var.stats.value_range, dtype=var_encoding["packed_dtype"])
+                nc_var.setncatts(get_packing_attributes(params, var.datatype))
+                transform = functools.partial(pack_block, params=params)
+            nsb = get_quantization_nsb(var, var_encoding)
+            if nsb is not None:
+                nc_var.setncatts({"quantization": QUANTIZATION_VARIABLE, "quantization_nsb": np.int32(nsb)})
+                transform = functools.partial(quantize_block, nsb=nsb)
+                has_quantization = True
+
+            # Variable statistics are computed from the written blocks if not cached yet,
+            # so that lazy data is loaded/computed only once
+            accumulator = None
+            if var._stats is None:
+                accumulator = StatisticsAccumulator(var.datatype, var.value.size, var._attrs.missing_value)
+            write_variable_data(
+                nc_var,
+                var.value,
+                max_block_bytes=max_block_bytes,
+                chunks=chunks,
+                transform=transform,
+                callback=None if accumulator is None else accumulator.update
+            )
+            if accumulator is not None:
+                var._stats = accumulator.result()
+            actual_range = get_actual_range(var, time_encoding=time_encoding)
+            if "actual_range" not in nc_var.ncattrs() and actual_range is not None:
+                # actual_range of packed variables is given in unpacked units
+                range_dtype = nc_var.dtype
+                if "packed_dtype" in var_encoding:
+                    range_dtype = var.datatype
+                elif var._attrs.scale_factor is not None or var._attrs.add_offset is not None:
+                    range_dtype = np.result_type(*actual_range)
+                nc_var.setncattr("actual_range", np.asarray(actual_range, dtype=range_dtype))
+
+        if has_quantization and QUANTIZATION_VARIABLE not in dataset.variables:
+            container = dataset.createVariable(QUANTIZATION_VARIABLE, "i4", ())
+            container.setncatts({"algorithm": QUANTIZATION_ALGORITHM, "implementation": "cf_data_struct"})
+
+        # Global attributes last, coverage attributes use the variable statistics
+        dataset.setncatts(get_global_attributes(struct))
+        if digest is not None:
+            dataset.setncattr(DIGEST_ATTRIBUTE, digest)
+
+    return path
+
+
+@instrumented("file_writing", label=lambda struct, path, *args, **kwargs: path)
+def append_netcdf(
+        struct: "CFStructBaseClass",
+        path: Union[str, Path],
+        record_dim: str = "time",
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+        **kwargs
+) -> Path:
+    """
+    Append the records of a CF data structure along the unlimited dimension `record_dim`
+    of an existing netCDF file. The file is created with `record_dim` as unlimited
+    dimension if it does not exist yet.
+
+    Only the new records are written, with the encoding of the existing file variables
+    (time units, packing parameters, bit rounding and data type). The `actual_range` attributes of all numerical
+    variables and the global `time_coverage_start`/`time_coverage_end` attributes are updated
+    incrementally from the new records.
+
+    :param struct: The CF data structure
+    :param path: The target file path
+    :param record_dim: The name of the unlimited dimension
+    :param max_block_bytes: Maximum number of bytes per written data block
+    :param kwargs: Keywords for `write_netcdf` (only used if the file is created)
+
+    :raises ValueError: File and data structure are incompatible or the new records cannot
+        be encoded like the file variables (e.g. values outside the range of a packed variable)
+
+    :return: The file path
+    """
+    path = Path(path)
+    if record_dim not in struct._dim_shape:
+        raise ValueError(f"{record_dim=} is not a dimension of the data structure [{struct.dims}]")
+
+    if not path.is_file():
+        write_netcdf(struct, path, unlimited_dims=[record_dim], max_block_bytes=max_block_bytes, **kwargs)
+        with netCDF4.Dataset(path, mode="a") as dataset:
+            _update_record_attributes(dataset, struct, record_dim)
+        return path
+
+    with netCDF4.Dataset(path, mode="a") as dataset:
+        record_variables = _get_record_variables(dataset, struct, record_dim)
+        offset = dataset.dimensions[record_dim].size
+        # All variables are validated before the first record is written
+        transforms = {var.name: _get_append_transform(var, dataset.variables[var.name]) for var in record_variables}
+        for var in record_variables:
+            nc_var = dataset.variables[var.name]
+            nc_var.set_auto_maskandscale(False)
+            write_variable_data(
+                nc_var, var.value, max_block_bytes=max_block_bytes, offset=offset, transform=transforms[var.name]
+            )
+        _update_record_attributes(dataset, struct, record_dim)
+
+    return path
+
+
+def read_netcdf(
+        path: Union[str, Path],
+        struct_class: Type["CFStructBaseClass"] = None,
+        lazy: bool = True,
+) -> "CFStructBaseClass":
+    """
+    Open a CF netCDF file as CF data structure. Global attributes, dimension variables
+    and variable attributes are read eagerly. Variable attributes are validated with the
+    most specific attribute model (see `cf_data_struct.datamodels.get_variable_attribute_model`).
+    With `lazy=True`, variable data is not loaded: each variable holds a lazy array that
+    reads the requested hyperslab from the file on access (the file is opened per access).
+
+    Data is read as stored (no masking or unpacking). The file must not be overwritten
+    while lazy variables of the data structure are in use (export to a different path).
+
+    :param path: The netCDF file path
+    :param struct_class: The data structure class (default: inferred from `featureType`,
+        `cf_role`/`sample_dimension` and `grid_mapping` attributes)
+    :param lazy: Keep variable data on disk until accessed
+
+    :raises IOError: Invalid file path
+
+    :return: The CF data structure
+    """
+    from cf_data_struct.datastruct import (CFVariable, GridCFStruct,
+                                           TrajectoryCFStruct,
+                                           TrajectoryCollectionCFStruct)
+
+    path = Path(path)
+    if not path.is_file():
+        raise IOError(f"Not a valid file: {path}")
+
+    with netCDF4.Dataset(path, mode="r") as dataset:
+        attributes = BasicCFGlobalAttributes(**{
+            name: _from_nc_attribute(dataset.getncattr(name)) for name in dataset.ncattrs()
+        })
+        variables = {}
+        used_var_ids = set()
+        for name, nc_var in dataset.variables.items():
+            nc_var.set_auto_maskandscale(False)
+            var_attributes = _get_read_attributes(nc_var)
+            is_dimension = nc_var.dimensions == (name, )
+            if lazy and not is_dimension and nc_var.ndim > 0 and nc_var.dtype != str:
+                value = DeferredArray(nc_var.shape, nc_var.dtype, functools.partial(_read_hyperslab, path, name))
+            else:
+                value = np.asarray(nc_var[...])
+            var = CFVariable(
+                name,
+                value,
+                nc_var.dimensions,
+                var_id=_get_unique_var_id(name, used_var_ids),
+                attributes=var_attributes,
+            )
+            variables[name] = var
+        dim_sizes = {name: dimension.size for name, dimension in dataset.dimensions.items()}
+
+    dimensions = [var for name, var in variables.items() if var.dims == (name, )]
+    data_variables = [var for name, var in variables.items() if var.dims != (name, )]
+    struct_class = _infer_struct_class(attributes, data_variables) if struct_class is None else struct_class
+
+    if struct_class is TrajectoryCollectionCFStruct:
+        row_size = next(var for var in data_variables if getattr(var.attrs, "sample_dimension", None) is not None)
+        instance_dim = row_size.dims[0]
+        struct = TrajectoryCollectionCFStruct(
+            trajectory_ids=variables[instance_dim],
+            row_size=CFVariable(
+                row_size.name, np.asarray(row_size.value[...]), row_size.dims, var_id=row_size.id,
+                attributes=row_size.attrs
+            ),
+            instance_dim=instance_dim,
+            sample_dim=row_size.attrs.sample_dimension,
+            attributes=attributes,
+            dims=[var for var in dimensions if var.name != instance_dim],
+        )
+        data_variables = [var for var in data_variables if var.name != row_size.name]
+    elif struct_class in (GridCFStruct, TrajectoryCFStruct):
+        struct = struct_class(attributes=attributes, dims=dimensions)
+    else:
+        raise ValueError(f"Reading {struct_class} is not supported")
+
+    # Dimensions without dimension variable (e.g. bounds)
+    for name, size in dim_sizes.items():
+        struct._dim_shape.setdefault(name, size)
+    struct.add_variables(data_variables)
+    if isinstance(struct, GridCFStruct):
+        grid_mappings = [var.attrs.grid_mapping for var in data_variables if hasattr(var.attrs, "grid_mapping")]
+        struct.grid_mapping = grid_mappings[0] if grid_mappings else None
+    return struct
+
+
+def _read_hyperslab(path: Path, var_name: str, hyperslab: Tuple[slice, ...]) -> np.ndarray:
+    """
+    Read a hyperslab of a netCDF variable (as stored, without masking and scaling)
+    """
+    with netCDF4.Dataset(path, mode="r") as dataset:
+        nc_var = dataset.variables[var_name]
+        nc_var.set_auto_maskandscale(False)
+        return np.asarray(nc_var[hyperslab])
+
+
+def _get_read_attributes(nc_var: netCDF4.Variable) -> BasicVarAttrs:
+    """
+    Validate the attributes of a netCDF variable with the most specific variable attribute
+    model. `_FillValue` is mapped to `missing_value` (unless present) and `long_name` defaults
+    to the variable name. Attributes that do not validate with the specific model are
+    validated with the basic model.
+    """
+    attributes = {name: _from_nc_attribute(nc_var.getncattr(name)) for name in nc_var.ncattrs()}
+    fill_value = attributes.pop("_FillValue", None)
+    if fill_value is not None and "missing_value" not in attributes:
+        attributes["missing_value"] = fill_value
+    attributes.setdefault("long_name", nc_var.name)
+    model = get_variable_attribute_model(attributes)
+    try:
+        return model(**attributes)
+    except pydantic.ValidationError as error:
+        if model is BasicVarAttrs:
+            raise ValueError(f"Invalid CF variable attributes of {nc_var.name}: {attributes}") from error
+        logger.warning(f"Attributes of {nc_var.name} are not valid {model.__name__}, using BasicVarAttrs: {error}")
+        return BasicVarAttrs(**attributes)
+
+
+def _infer_struct_class(attributes: BasicCFGlobalAttributes, variables: List["CFVariable"]) -> type:
+    """
+    Data structure class from the CF attributes: `featureType=trajectory` with a
+    `sample_dimension` variable (contiguous ragged array) or without (single trajectory),
+    variables with `grid_mapping` (grid). Files with only one dimension are trajectories.
+    """
+    from cf_data_struct.datastruct import (GridCFStruct, TrajectoryCFStruct,
+                                           TrajectoryCollectionCFStruct)
+    is_ragged = any(getattr(var.attrs, "sample_dimension", None) is not None for var in variables)
+    if str(getattr(attributes, "featureType", "")).lower() == "trajectory":
+        return TrajectoryCollectionCFStruct if is_ragged else TrajectoryCFStruct
+    if any(getattr(var.attrs, "grid_mapping", None) is not None for var in variables):
+        return GridCFStruct
+    dims = {dim for var in variables for dim in var.dims}
+    return TrajectoryCFStruct if len(dims) <= 1 else GridCFStruct
+
+
+def _get_unique_var_id(name: str, used_var_ids: set) -> str:
+    """
+    Variable id (the default abbreviation of the name or the name itself) that is not in use yet
+    """
+    from cf_data_struct.datastruct import CFVariable
+    candidates = [name.lower()]
+    with contextlib.suppress(ValueError):
+        candidates.insert(0, CFVariable._validate_var_id(None, name))
+    var_id = next((candidate for candidate in candidates if candidate not in used_var_ids), None)
+    index = 1
+    while var_id is None or var_id in used_var_ids:
+        var_id, index = f"{name.lower()}_{index}", index + 1
+    used_var_ids.add(var_id)
+    return var_id
+
+
+def _from_nc_attribute(value: Any) -> Any:
+    """
+    Convert a netCDF attribute value to a Python type (numpy scalars to scalars, arrays to lists)
+    """
+    if isinstance(value, np.ndarray):
+        return value.item() if value.size == 1 and value.ndim == 0 else value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _get_record_variables(dataset: netCDF4.Dataset, struct: "CFStructBaseClass", record_dim: str) -> List["CFVariable"]:
+    """
+    Validate that the data structure can be appended to the netCDF dataset and return
+    all variables (including dimension variables) along the record dimension.
+
+    :param dataset: The netCDF dataset opened in append mode
+    :param struct: The CF data structure
+    :param record_dim: The name of the unlimited dimension
+
+    :raises ValueError: File and data structure are incompatible
+
+    :return: List of CF variables with `record_dim` as first dimension
+    """
+    if record_dim not in dataset.dimensions or not dataset.dimensions[record_dim].isunlimited():
+        raise ValueError(f"{record_dim=} is not an unlimited dimension in {dataset.filepath()}")
+
+    struct_vars = {**struct._dims, **struct._vars}
+    file_vars = {name for name, nc_var in dataset.variables.items() if record_dim in nc_var.dimensions}
+    record_vars = {name for name, var in struct_vars.items() if record_dim in var.dims}
+    if file_vars != record_vars:
+        raise ValueError(f"Variables along {record_dim=} do not match: file={file_vars}, struct={record_vars}")
+
+    for name in record_vars:
+        var, nc_var = struct_vars[name], dataset.variables[name]
+        if var.dims != nc_var.dimensions or var.dims[0] != record_dim:
+            raise ValueError(f"Dimensions of {name} do not match: {var.dims} != {nc_var.dimensions}")
+        if var.value.shape[1:] != nc_var.shape[1:]:
+            raise ValueError(f"Shape of {name} does not match: {var.value.shape[1:]} != {nc_var.shape[1:]}")
+    return [struct_vars[name] for name in sorted(record_vars)]
+
+
+def _get_append_transform(var: "CFVariable", nc_var: netCDF4.Variable) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """
+    Block transform that encodes the new records of a variable like the existing netCDF
+    variable: datetime64 data with the time encoding of the file, floating point data of
+    packed variables with the packing parameters of the file, bit rounding with the
+    `quantization_nsb` attribute and integer data (e.g. compact flag variables) with the
+    data type of the file.
+
+    :param var: The CF variable with the new records
+    :param nc_var: The existing netCDF variable
+
+    :raises ValueError: The new records cannot be encoded without loss
+
+    :return: The block transform or None (data is written as is)
+    """
+    if var.datatype.kind == "M":
+        return functools.partial(encode_times, encoding=_get_file_time_encoding(nc_var))
+
+    packing_attributes = [name for name in ["scale_factor", "add_offset"] if name in nc_var.ncattrs()]
+    if packing_attributes and nc_var.dtype.kind in "iu":
+        if var.datatype.kind != "f":
+            # Packed data is written as is, if packed with the same parameters
+            var_packing = {name: getattr(var._attrs, name) for name in ["scale_factor", "add_offset"]}
+            file_packing = {name: _from_nc_attribute(getattr(nc_var, name, None)) for name in var_packing}
+            if var_packing != file_packing:
+                raise ValueError(f"Packing of {var.name} does not match the file: {var_packing} != {file_packing}")
+            return _get_cast_transform(var, nc_var)
+        params = _get_file_packing_parameters(nc_var)
+        value_range, valid_range = var.stats.value_range, _get_unpacked_valid_range(params)
+        tolerance = 0.5 * abs(params.scale_factor)
+        if value_range is not None and (
+                value_range[0] < valid_range[0] - tolerance or value_range[1] > valid_range[1] + tolerance
+        ):
+            raise ValueError(f"Records of {var.name} {value_range} exceed the packed range {valid_range}")
+        return functools.partial(pack_block, params=params)
+
+    nsb = getattr(nc_var, "quantization_nsb", None)
+    if nsb is not None:
+        return functools.partial(quantize_block, nsb=int(nsb))
+    return _get_cast_transform(var, nc_var)
+
+
+def _get_cast_transform(var: "CFVariable", nc_var: netCDF4.Variable) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """
+    Cast of integer data to the (smaller) integer type of the file variable
+
+    :raises ValueError: The data range exceeds the data type of the file variable
+    """
+    if var.datatype == nc_var.dtype or var.datatype.kind not in "iu" or nc_var.dtype.kind not in "iu":
+        return None
+    value_range, info = var.stats.value_range, np.iinfo(nc_var.dtype)
+    if value_range is not None and (value_range[0] < info.min or value_range[1] > info.max):
+        raise ValueError(f"Records of {var.name} {value_range} exceed the file data type [{info.dtype}]")
+    return functools.partial(np.asarray, dtype=nc_var.dtype)
+
+
+def _get_file_packing_parameters(nc_var: netCDF4.Variable) -> PackingParameters:
+    """
+    The packing parameters of a packed netCDF variable. Missing `missing_value`, `valid_min`
+    and `valid_max` attributes default to the values of `get_packing_parameters`.
+
+    :raises ValueError: Packed data type not supported
+    """
+    info = np.iinfo(nc_var.dtype)
+    params = {
+        "scale_factor": 1.0,
+        "add_offset": 0.0,
+        "missing_value": int(info.min) + 1,
+        "valid_min": int(info.min) + 2,
+        "valid_max": int(info.max)
+    }
+    for name in params:
+        if name in nc_var.ncattrs():
+            params[name] = _from_nc_attribute(nc_var.getncattr(name))
+    return PackingParameters(dtype=nc_var.dtype.name, **params)
+
+
+def _get_unpacked_valid_range(params: PackingParameters) -> Tuple[float, float]:
+    """
+    The range of valid packed values in unpacked units
+    """
+    bounds = [value * params.scale_factor + params.add_offset for value in (params.valid_min, params.valid_max)]
+    return min(bounds), max(bounds)
+
+
+def _update_record_attributes(
+        dataset: netCDF4.Dataset,
+        struct: "CFStructBaseClass",
+        record_dim: str,
+) -> None:
+    """
+    Merge the `actual_range` variable attributes and the global time coverage attributes
+    of the netCDF dataset with the value range of the new records.
+
+    :param dataset: The netCDF dataset opened in append mode
+    :param struct: The CF data structure with the new records
+    :param record_dim: The name of the unlimited dimension
+
+    :return: None
+    """
+    for var in list(struct._dims.values()) + list(struct._vars.values()):
+        nc_var = dataset.variables[var.name]
+        if record_dim not in var.dims:
+            continue
+        time_encoding = _get_file_time_encoding(nc_var) if var.datatype.kind == "M" else None
+        value_range = get_actual_range(var, time_encoding=time_encoding)
+        if value_range is None:
+            continue
+        # Both ranges are in unpacked units, actual_range of packed variables has the unpacked data type
+        range_dtype = nc_var.dtype
+        packing_attributes = [name for name in ["scale_factor", "add_offset"] if name in nc_var.ncattrs()]
+        if packing_attributes:
+            range_dtype = np.result_type(*[np.asarray(nc_var.getncattr(name)) for name in packing_attributes])
+        if "actual_range" in nc_var.ncattrs():
+            file_range = np.atleast_1d(nc_var.getncattr("actual_range"))
+            value_range = (min(value_range[0], file_range[0]), max(value_range[1], file_range[-1]))
+        nc_var.setncattr("actual_range", np.asarray(value_range, dtype=range_dtype))
+
+    time_var = dataset.variables.get(record_dim)
+    if time_var is None or "since" not in getattr(time_var, "units", ""):
+        return
+    time_range = np.atleast_1d(time_var.getncattr("actual_range"))
+    calendar = getattr(time_var, "calendar", "standard")
+    dataset.setncatts(_get_time_coverage(time_range, time_var.units, calendar))
+
+
+def create_variable(
+        dataset: netCDF4.Dataset,
+        var: "CFVariable",
+        encoding: Dict[str, Any],
+        add_actual_range: bool = True,
+) -> netCDF4.Variable:
+    """
+    Create a netCDF variable with attributes (but without data) from a CF variable.
+
+    :param dataset: The open netCDF dataset
+    :param var: The CF variable
+    :param encoding: Encoding settings of the variable
+    :param add_actual_range: Add `actual_range` from the variable statistics if not in the attributes
+
+    :return: The netCDF variable
+    """
+    invalid_keys = set(encoding).difference(VALID_ENCODING_KEYS)
+    if invalid_keys:
+        raise ValueError(f"Invalid encoding keys for {var.name}: {invalid_keys} [{VALID_ENCODING_KEYS=}]")
+    encoding = dict(encoding)
+    if "dtype" in encoding:
+        dtype = np.dtype(encoding.pop("dtype"))
+    elif is_flag_variable(var._attrs) and var.datatype.kind in "iu":
+        # Flag variables are stored with the smallest possible integer type
+        dtype = var.get_flag_dtype(allow_unsigned=dataset.data_model == "NETCDF4")
+    else:
+        dtype = var.datatype
+    chunk_cache = encoding.pop("chunk_cache", None)
+    packed_dtype = encoding.pop("packed_dtype", None)
+    encoding.pop("quantize_nsb", None)
+    encoding.pop("quantize_digits", None)
+    if packed_dtype is not None:
+        if var.datatype.kind != "f":
+            raise ValueError(f"Only floating point variables can be packed: {var.name} [{var.datatype}]")
+        dtype = np.dtype(packed_dtype)
+
+    # Compression filters are not available for variable length data
+    if dtype.kind in "OSU":
+        dtype = str
+        encoding = {"chunksizes": encoding.get("chunksizes")}
+
+    nc_var = dataset.createVariable(var.name, dtype, var.dims, fill_value=False, **encoding)
+    if chunk_cache is not None:
+        nc_var.set_var_chunk_cache(size=chunk_cache)
+
+    # Data is written as is, packing/masking is handled by the data structure
+    nc_var.set_auto_maskandscale(False)
+    attributes = get_variable_attributes(
+        var,
+        dtype=var.datatype if packed_dtype else dtype,
+        add_actual_range=add_actual_range
+    )
+    nc_var.setncatts(attributes)
+    return nc_var
+
+
+@instrumented("variable_writing", label=lambda nc_var, *args, **kwargs: nc_var.name)
+def write_variable_data(
+        nc_var: netCDF4.Variable,
+        value: np.ndarray,
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+        offset: int = 0,
+        chunks: List[int] = None,
+        transform: Callable[[np.ndarray], np.ndarray] = None,
+        callback: Callable[[np.ndarray], None] = None,
+) -> None:
+    """
+    Write array data into a netCDF variable in blocks of bounded size.
+
+    :param nc_var: The netCDF variable
+    :param value: Array(-like) data
+    :param max_block_bytes: Maximum number of bytes per written block
+    :param offset: Index offset along the first dimension (for appending)
+    :param chunks: HDF5 chunk shape of the variable. If given, blocks are aligned with
+        the chunks, so that each chunk is compressed only once.
+    :param transform: Function applied to each block before writing (e.g. packing)
+    :param callback: Function called with each (untransformed) block (e.g. statistics)
+
+    :return: None
+    """
+    blocks = iter_blocks(value.shape, value.dtype.itemsize, max_bytes=max_block_bytes, chunks=chunks)
+    for block in blocks:
+        target = block
+        if offset and block:
+            target = (slice(block[0].start + offset, block[0].stop + offset),) + block[1:]
+        data = np.asarray(value[block])
+        if callback is not None:
+            callback(data)
+        if transform is not None:
+            data = transform(data)
+            record_bytes(copied=data.nbytes)
+        nc_var[target] = data
+        record_bytes(written=data.nbytes)
+
+
+def get_quantization_nsb(var: "CFVariable", encoding: Dict[str, Any]) -> Optional[int]:
+    """
+    Number of significant bits for the bit rounding of a variable from the encoding
+    (`quantize_nsb` or `quantize_digits`) or the `quantization_nsb` attribute.
+
+    :param var: The CF variable
+    :param encoding: Encoding settings of the variable
+
+    :raises ValueError: Quantization of non floating point or packed variables
+
+    :return: Number of significant bits or None (no quantization)
+    """
+    if encoding.get("quantize_nsb") is not None:
+        nsb = int(encoding["quantize_nsb"])
+    elif encoding.get("quantize_digits") is not None:
+        nsb = significant_digits_to_bits(encoding["quantize_digits"])
+    else:
+        nsb = var._attrs.quantization_nsb
+    if nsb is None:
+        return None
+    if var.datatype.kind != "f":
+        raise ValueError(f"Only floating point variables can be quantized: {var.name} [{var.datatype}]")
+    if "packed_dtype" in encoding:
+        raise ValueError(f"Variable {var.name} cannot be packed and quantized")
+    return nsb
+
+
+def get_global_attributes(struct: "CFStructBaseClass") -> Dict[str, Any]:
+    """
+    Global attributes of a CF data structure as netCDF compatible dictionary. ACDD
+    geospatial and time coverage attributes are added from the cached variable statistics
+    unless they are explicitly set in the global attributes.
+
+    :param struct: The CF data structure
+
+    :return: Attribute dictionary
+    """
+    attributes = get_coverage_attributes(struct)
+    # The content digest is set by the writer (e.g. a digest read from a file is outdated)
+    attributes.update(struct.gattrs.model_dump(exclude_none=True, exclude={DIGEST_ATTRIBUTE}))
+    return {name: _to_nc_attribute(value) for name, value in attributes.items()}
+
+
+def get_coverage_attributes(struct: "CFStructBaseClass") -> Dict[str, Any]:
+    """
+    ACDD geospatial (`geospatial_lat_min`, ...) and time coverage (`time_coverage_start`,
+    `time_coverage_end`) attributes from the statistics of the latitude, longitude and
+    time variables. Variables are identified by their standard name or their name.
+    Packed coordinate variables (`scale_factor`/`add_offset`) are unpacked.
+
+    :param struct: The CF data structure
+
+    :return: Attribute dictionary
+    """
+    attributes = {}
+    for var in list(struct._dims.values()) + list(struct._vars.values()):
+        standard_name = var._attrs.standard_name
+        coordinate = standard_name if standard_name in ["latitude", "longitude", "time"] else var.name
+        if coordinate not in ["latitude", "longitude", "time"]:
+            continue
+        value_range = var.stats.value_range if var.datatype.kind == "M" else get_actual_range(var)
+        if value_range is None:
+            continue
+        if coordinate in ["latitude", "longitude"]:
+            prefix = f"geospatial_{coordinate[:3]}"
+            attributes.setdefault(f"{prefix}_min", value_range[0])
+            attributes.setdefault(f"{prefix}_max", value_range[1])
+        elif "time_coverage_start" in attributes:
+            continue
+        elif var.datatype.kind == "M":
+            attributes.update(_get_time_coverage(value_range))
+        elif "since" in (var._attrs.units or ""):
+            calendar = getattr(var._attrs, "calendar", None) or "standard"
+            attributes.update(_get_time_coverage(value_range, var._attrs.units, calendar))
+    return attributes
+
+
+def _get_time_coverage(time_range: Iterable[Any], units: str = None, calendar: str = "standard") -> Dict[str, str]:
+    """
+    ACDD time coverage attributes from the range of datetime64 or numerical time values
+
+    :param time_range: (start, end) as datetime64 or in `units`
+    :param units: CF time units ("<unit> since <epoch>") of numerical time values
+    :param calendar: CF calendar of numerical time values
+
+    :return: Attribute dictionary
+    """
+    if units is None:
+        start, end = np.datetime_as_string(np.asarray(time_range).astype("M8[s]"))
+        return {"time_coverage_start": f"{start}Z", "time_coverage_end": f"{end}Z"}
+    start, end = netCDF4.num2date(np.asarray(time_range), units, calendar=calendar)
+    return {
+        "time_coverage_start": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "time_coverage_end": end.strftime("%Y-%m-%dT%H:%M:%SZ")
+    }
+
+
+def get_variable_attributes(
+        var: "CFVariable",
+        dtype: np.dtype = None,
+        add_actual_range: bool = True
+) -> Dict[str, Any]:
+    """
+    Variable attributes of a CF variable as netCDF compatible dictionary. Attributes
+    that must have the data type of the variable are cast to `dtype`.
+
+    :param var: The CF variable
+    :param dtype: The data type of the netCDF variable (default: data type of the variable)
+    :param add_actual_range: Add `actual_range` from the variable statistics if not in the attributes
+
+    :return: Attribute dictionary
+    """
+    dtype = var.datatype if dtype is None else dtype
+    numeric_dtype = isinstance(dtype, np.dtype) and dtype.kind in "iuf"
+    # actual_range of packed variables is given in unpacked units
+    is_packed = var._attrs.scale_factor is not None or var._attrs.add_offset is not None
+    attributes = var._attrs.model_dump(exclude_none=True)
+    if add_actual_range and "actual_range" not in attributes and (actual_range := get_actual_range(var)) is not None:
+        attributes["actual_range"] = actual_range
+    for name, value in attributes.items():
+        if numeric_dtype and name in DTYPE_MATCHED_ATTRIBUTES and not (is_packed and name == "actual_range"):
+            value = np.asarray(value, dtype=dtype)
+        attributes[name] = _to_nc_attribute(value)
+    return attributes
+
+
+def _get_file_time_encoding(nc_var: netCDF4.Variable) -> TimeEncoding:
+    """
+    The time encoding of an existing netCDF time variable
+
+    :raises ValueError: The variable is not a CF time variable
+    """
+    if "since" not in getattr(nc_var, "units", ""):
+        raise ValueError(f"datetime64 data cannot be appended to {nc_var.name} without CF time units")
+    return TimeEncoding(
+        units=nc_var.units,
+        calendar=getattr(nc_var, "calendar", "standard"),
+        dtype=nc_var.dtype.name,
+        missing_value=_from_nc_attribute(getattr(nc_var, "missing_value", None))
+    )
+
+
+def _to_nc_attribute(value: Any) -> Any:
+    """
+    Convert an attribute value to a type that netCDF4 can store.
+
+    :param value: The attribute value
+
+    :return: netCDF compatible attribute value
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        return np.asarray(value)
+    return value
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""
+Background export queue that overlaps building and writing of data products.
+
+Products are written by a background thread, while the calling thread builds the
+next product. netCDF4/HDF5 releases the GIL during writing and compression, so
+both stages run concurrently. The queue depth is bounded: `submit` blocks if
+`max_queue_size` products are waiting (backpressure), which limits the memory to
+`max_queue_size + 1` products in flight (double buffering for `max_queue_size=1`).
+
+The variable statistics (required for `actual_range` and coverage attributes)
+are computed per variable in a thread pool before a product is written.
+
+HDF5 serializes all calls of the library, therefore the compression of the variables
+of a netCDF file cannot run in parallel. Parallel per-chunk compression requires a
+backend with independent chunk objects (e.g. `to_zarr`).
+
+Usage:
+
+    with ExportQueue(max_queue_size=1) as export_queue:
+        for granule in granules:
+            struct = build_struct(granule)
+            futures.append(export_queue.submit(struct, path))
+    paths = [future.result() for future in futures]
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import asyncio
+import concurrent.futures
+import queue
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Tuple, Union
+
+from loguru import logger
+
+from cf_data_struct.io.batch import VALID_EXPORT_METHODS
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import CFStructBaseClass
+
+# Queue item: (struct, path, method, writer keywords, future)
+QueueItem = Tuple["CFStructBaseClass", Path, str, dict, concurrent.futures.Future]
+
+
+class ExportQueue(object):
+    """
+    Bounded queue of data products that are written by a background thread
+    """
+
+    def __init__(
+            self,
+            max_queue_size: int = 1,
+            max_workers: int = None,
+            method: str = "to_netcdf",
+            **writer_kwargs
+    ) -> None:
+        """
+        :param max_queue_size: Maximum number of products waiting to be written
+        :param max_workers: Number of threads for the per-variable preparation (statistics)
+        :param method: Default export method of the data structures
+        :param writer_kwargs: Default keywords of the export method
+        """
+        if max_queue_size < 1:
+            raise ValueError(f"{max_queue_size=} must be at least 1")
+        if method not in VALID_EXPORT_METHODS:
+            raise ValueError(f"{method=} not in {VALID_EXPORT_METHODS=}")
+        self.method = method
+        self.writer_kwargs = writer_kwargs
+        self._queue: "queue.Queue[Optional[QueueItem]]" = queue.Queue(maxsize=max_queue_size)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="cf_data_struct_prepare"
+        )
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="cf_data_struct_export", daemon=True)
+        self._thread.start()
+
+    def submit(
+            self,
+            struct: "CFStructBaseClass",
+            path: Union[str, Path],
+            method: str = None,
+            timeout: float = None,
+            **writer_kwargs
+    ) -> concurrent.futures.Future:
+        """
+        Add a data structure to the export queue. Blocks while the queue is full.
+        The data structure must not be modified until the export is finished.
+
+        :param struct: The CF data structure
+        :param path: The target file path
+        :param method: Export method (default: method of the queue)
+        :param timeout: Maximum time in seconds to wait for a free queue slot
+        :param writer_kwargs: Keywords of the export method (override the queue defaults)
+
+        :raises queue.Full: No free queue slot within `timeout`
+        :raises RuntimeError: The queue is closed
+
+        :return: Future with the file path of the written product
+        """
+        method = self.method if method is None else method
+        if method not in VALID_EXPORT_METHODS:
+            raise ValueError(f"{method=} not in {VALID_EXPORT_METHODS=}")
+        future = concurrent.futures.Future()
+        item = (struct, Path(path), method, {**self.writer_kwargs, **writer_kwargs}, future)
+        # The closed check and the put must not be interleaved with `close`, otherwise
+        # the item may end up behind the stop sentinel and is never written
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot submit to a closed export queue")
+            self._queue.put(item, timeout=timeout)
+        return future
+
+    async def submit_async(
+            self,
+            struct: "CFStructBaseClass",
+            path: Union[str, Path],
+            method: str = None,
+            **writer_kwargs
+    ) -> "asyncio.Future[Path]":
+        """
+        Add a data structure to the export queue without blocking the event loop.
+        Awaiting this coroutine waits for a free queue slot (backpressure), awaiting
+        the returned future waits for the export to finish.
+
+        :param struct: The CF data structure
+        :param path: The target file path
+        :param method: Export method (default: method of the queue)
+        :param writer_kwargs: Keywords of the export method
+
+        :return: asyncio future with the file path of the written product
+        """
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, lambda: self.submit(struct, path, method=method, **writer_kwargs))
+        return asyncio.wrap_future(future, loop=loop)
+
+    def join(self) -> None:
+        """
+        Wait until all submitted products have been written
+        """
+        self._queue.join()
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stop accepting new products and shut down the background thread after
+        all submitted products have been written.
+
+        :param wait: Wait for the background thread to finish
+
+        :return: None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        if wait:
+            self._thread.join()
+            self._executor.shutdown(wait=True)
+
+    async def aclose(self) -> None:
+        """
+        Close the queue without blocking the event loop (see `close`)
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def __enter__(self) -> "ExportQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close(wait=True)
+
+    async def __aenter__(self) -> "ExportQueue":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def n_waiting(self) -> int:
+        """
+        Number of products waiting to be written (approximate)
+        """
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        """
+        Background thread: write the queued products until the stop sentinel is received
+        """
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                struct, path, method, writer_kwargs, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    self._prepare(struct)
+                    future.set_result(getattr(struct, method)(path, **writer_kwargs))
+                except BaseException as error:
+                    logger.error(f"Export of {path} failed: {error}")
+                    future.set_exception(error)
+            finally:
+                self._queue.task_done()
+
+    def _prepare(self, struct: Any) -> None:
+        """
+        Compute the missing statistics of all in-memory variables concurrently. Lazy
+        variables are skipped, their statistics are computed while they are written.
+        """
+        variables = [
+            var for var in list(struct._dims.values()) + list(struct._vars.values())
+            if var._stats is None and not var.is_lazy
+        ]
+        for _ in self._executor.map(lambda var: var.stats, variables):
+            pass
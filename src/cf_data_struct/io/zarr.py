@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+
+"""
+Export of CF data structures to Zarr stores (local directory stores).
+
+The Zarr store has the same structure and CF attributes as the netCDF export:
+one array per dimension variable and variable, the dimension names (`_ARRAY_DIMENSIONS`
+attribute for Zarr format 2, `dimension_names` for format 3) and the global attributes
+as group attributes. Variable data is written in chunk-aligned blocks by a thread pool,
+so that the compression of independent chunks runs in parallel (the compressors release
+the GIL). Consolidated metadata is written after all arrays.
+
+`zarr` is an optional dependency (`pip install zarr`). Both zarr-python 2 and 3 are supported.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import concurrent.futures
+import functools
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+from cf_data_struct.coding.flags import is_flag_variable
+from cf_data_struct.coding.packing import get_packing_parameters, pack_block
+from cf_data_struct.coding.quantization import (QUANTIZATION_ALGORITHM,
+                                                QUANTIZATION_VARIABLE,
+                                                quantize_block)
+from cf_data_struct.coding.times import encode_times
+from cf_data_struct.datastruct.statistics import StatisticsAccumulator
+from cf_data_struct.instrumentation import instrumented, record_bytes
+from cf_data_struct.io.digest import (DIGEST_ATTRIBUTE, compute_digest,
+                                      read_digest)
+from cf_data_struct.io.encoding import (get_actual_range,
+                                        get_packing_attributes,
+                                        get_variable_time_encoding)
+from cf_data_struct.io.netcdf import (get_global_attributes,
+                                      get_quantization_nsb,
+                                      get_variable_attributes)
+from cf_data_struct.utils import iter_blocks
+
+if TYPE_CHECKING:
+    from cf_data_struct.datastruct import CFStructBaseClass, CFVariable
+
+VALID_COMPRESSORS = ["zstd", "blosc", "zlib", None]
+
+# Encoding keywords per variable (chunk shape, storage data type, compression,
+# integer type for CF packing and number of significant bits/digits for bit rounding)
+VALID_ZARR_ENCODING_KEYS = [
+    "chunks", "dtype", "compressor", "complevel", "packed_dtype", "quantize_nsb", "quantize_digits"
+]
+
+# Blocks are the unit of parallel work and should contain a few chunks
+DEFAULT_ZARR_BLOCK_BYTES = 8 * 1024 ** 2
+
+
+@instrumented("file_writing", label=lambda struct, path, *args, **kwargs: path)
+def write_zarr(
+        struct: "CFStructBaseClass",
+        path: Union[str, Path],
+        encoding: Dict[str, Dict[str, Any]] = None,
+        compressor: Optional[str] = "zstd",
+        complevel: int = 3,
+        zarr_format: int = None,
+        max_workers: int = None,
+        max_block_bytes: int = DEFAULT_ZARR_BLOCK_BYTES,
+        consolidated: bool = True,
+        skip_unchanged: bool = False,
+) -> Path:
+    """
+    Write a CF data structure to a Zarr directory store. An existing store is overwritten.
+
+    :param struct: The CF data structure (dimensions, variables and global attributes)
+    :param path: The target directory
+    :param encoding: Per-variable encoding settings ({var_name: {"chunks": ..., "compressor": ...}},
+        see `VALID_ZARR_ENCODING_KEYS`) that overwrite the default compression settings.
+        Packing (`packed_dtype`) and the compact data type of integer flag variables require
+        the value range before the first block is written: lazy variables without cached
+        statistics are then read twice (statistics pass and write pass).
+    :param compressor: Default compressor (one of `VALID_COMPRESSORS`)
+    :param complevel: Default compression level
+    :param zarr_format: Zarr format version (2 or 3, default: default of the zarr library)
+    :param max_workers: Number of threads writing chunks in parallel (default: number of CPUs)
+    :param max_block_bytes: Maximum number of bytes per written block (a block covers whole chunks)
+    :param consolidated: Write consolidated metadata
+    :param skip_unchanged: Store the content digest (see `cf_data_struct.io.digest`) as group
+        attribute and skip the export if the existing store has the same digest
+
+    :return: The store path
+    """
+    zarr = _import_zarr()
+    path = Path(path)
+    encoding = encoding if encoding is not None else {}
+    default_encoding = {"compressor": compressor, "complevel": complevel}
+
+    digest = None
+    if skip_unchanged:
+        options = {
+            "writer": "zarr", "encoding": encoding, "zarr_format": zarr_format, "consolidated": consolidated,
+            **default_encoding
+        }
+        digest = compute_digest(struct, options=options, max_workers=max_workers)
+        if read_digest(path) == digest:
+            logger.debug(f"Skip export of unchanged store {path}")
+            return path
+    group = _open_group(zarr, path, zarr_format)
+    group_format = _get_zarr_format(group)
+    max_workers = (os.cpu_count() or 1) if max_workers is None else max(1, max_workers)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zarr_write") as executor:
+        has_quantization = False
+        for var in list(struct._dims.values()) + list(struct._vars.values()):
+            var_encoding = {**default_encoding, **encoding.get(var.name, {})}
+            array, transform, attributes = _create_array(group, group_format, struct, var, var_encoding)
+            has_quantization = has_quantization or "quantization" in attributes
+
+            accumulator = None
+            if var._stats is None:
+                accumulator = StatisticsAccumulator(var.datatype, var.value.size, var._attrs.missing_value)
+            write_array_data(
+                array,
+                var.value,
+                executor,
+                max_block_bytes=max_block_bytes,
+                max_in_flight=2 * max_workers,
+                transform=transform,
+                accumulator=accumulator,
+            )
+            if accumulator is not None:
+                var._stats = accumulator.result()
+            variable_attributes = get_variable_attributes(
+                var,
+                dtype=var.datatype if "packed_dtype" in var_encoding else np.dtype(array.dtype),
+                add_actual_range=True
+            )
+            array.attrs.update(_to_json_attributes({**variable_attributes, **attributes}))
+
+    if has_quantization:
+        container = _create_zarr_array(group, group_format, QUANTIZATION_VARIABLE, (), np.dtype("int32"), (), None)
+        container.attrs.update({"algorithm": QUANTIZATION_ALGORITHM, "implementation": "cf_data_struct"})
+
+    # Global attributes last, coverage attributes use the variable statistics
+    global_attributes = get_global_attributes(struct)
+    if digest is not None:
+        global_attributes[DIGEST_ATTRIBUTE] = digest
+    group.attrs.update(_to_json_attributes(global_attributes))
+    if consolidated:
+        zarr.consolidate_metadata(str(path))
+    return path
+
+
+def write_array_data(
+        array: Any,
+        value: np.ndarray,
+        executor: concurrent.futures.Executor,
+        max_block_bytes: int = DEFAULT_ZARR_BLOCK_BYTES,
+        max_in_flight: int = 8,
+        transform: Callable[[np.ndarray], np.ndarray] = None,
+        accumulator: StatisticsAccumulator = None,
+) -> None:
+    """
+    Write array data into a Zarr array in chunk-aligned blocks with a thread pool. Each
+    chunk is part of exactly one block, so blocks can be compressed and written concurrently.
+
+    :param array: The Zarr array
+    :param value: Array(-like) data
+    :param executor: Thread pool for the block writes
+    :param max_block_bytes: Maximum number of bytes per block (at least one chunk)
+    :param max_in_flight: Maximum number of submitted but unfinished blocks (memory limit)
+    :param transform: Function applied to each block before writing (e.g. packing)
+    :param accumulator: Statistics accumulator updated with each (untransformed) block
+
+    :return: None
+    """
+    lock = threading.Lock()
+
+    def write_block(block) -> None:
+        data = np.asarray(value[block])
+        if accumulator is not None:
+            with lock:
+                accumulator.update(data)
+        if transform is not None:
+            data = transform(data)
+            record_bytes(copied=data.nbytes)
+        array[block] = data
+        record_bytes(written=data.nbytes)
+
+    chunks = tuple(array.chunks) if len(value.shape) > 0 else None
+    pending = set()
+    for block in iter_blocks(value.shape, value.dtype.itemsize, max_bytes=max_block_bytes, chunks=chunks):
+        if len(pending) >= max_in_flight:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        pending.add(executor.submit(write_block, block))
+    for future in concurrent.futures.as_completed(pending):
+        future.result()
+
+
+def _create_array(
+        group: Any,
+        group_format: int,
+        struct: "CFStructBaseClass",
+        var: "CFVariable",
+        encoding: Dict[str, Any],
+) -> tuple:
+    """
+    Create the Zarr array of a CF variable (without data and CF attributes).
+
+    :return: (Zarr array, block transform or None, encoding attributes)
+    """
+    invalid_keys = set(encoding).difference(VALID_ZARR_ENCODING_KEYS)
+    if invalid_keys:
+        raise ValueError(f"Invalid encoding keys for {var.name}: {invalid_keys} [{VALID_ZARR_ENCODING_KEYS=}]")
+    if encoding.get("compressor") not in VALID_COMPRESSORS:
+        raise ValueError(f"Invalid compressor for {var.name}: {encoding['compressor']} [{VALID_COMPRESSORS=}]")
+
+    transform, attributes = None, {}
+    if "dtype" in encoding:
+        dtype = np.dtype(encoding["dtype"])
+    elif is_flag_variable(var._attrs) and var.datatype.kind in "iu":
+        dtype = var.get_flag_dtype(allow_unsigned=True)
+    else:
+        dtype = var.datatype
+    time_encoding = get_variable_time_encoding(var, encoding)
+    if time_encoding is not None:
+        dtype = np.dtype(time_encoding.dtype)
+        attributes.update(time_encoding.attributes)
+        actual_range = get_actual_range(var, time_encoding=time_encoding)
+        if actual_range is not None:
+            attributes["actual_range"] = np.asarray(actual_range, dtype=dtype)
+        transform = functools.partial(encode_times, encoding=time_encoding)
+    if encoding.get("packed_dtype") is not None:
+        if var.datatype.kind != "f":
+            raise ValueError(f"Only floating point variables can be packed: {var.name} [{var.datatype}]")
+        params = get_packing_parameters(var.stats.value_range, dtype=encoding["packed_dtype"])
+        dtype = np.dtype(encoding["packed_dtype"])
+        attributes.update(get_packing_attributes(params, var.datatype))
+        transform = functools.partial(pack_block, params=params)
+    nsb = get_quantization_nsb(var, encoding)
+    if nsb is not None:
+        attributes.update({"quantization": QUANTIZATION_VARIABLE, "quantization_nsb": nsb})
+        transform = functools.partial(quantize_block, nsb=nsb)
+    if transform is None and dtype != var.datatype:
+        transform = functools.partial(np.asarray, dtype=dtype)
+
+    shape = struct.get_dimensions(var.dims)
+    chunks = tuple(encoding["chunks"]) if encoding.get("chunks") is not None else None
+    codec = _get_compressor(group_format, encoding.get("compressor"), encoding.get("complevel", 3), dtype)
+    array = _create_zarr_array(group, group_format, var.name, shape, dtype, var.dims, codec, chunks=chunks)
+    return array, transform, attributes
+
+
+def _create_zarr_array(
+        group: Any,
+        group_format: int,
+        name: str,
+        shape: tuple,
+        dtype: np.dtype,
+        dims: tuple,
+        codec: Any,
+        chunks: tuple = None,
+) -> Any:
+    """
+    Create an empty Zarr array with dimension names (zarr-python 2 and 3 API).
+    Arrays in format 2 have no fill value, i.e. no values are masked by readers.
+    """
+    dims = list(dims)
+    if not hasattr(group, "create_array"):
+        # zarr-python 2
+        array = group.create_dataset(
+            name, shape=shape, dtype=dtype, chunks=True if chunks is None else chunks, compressor=codec,
+            fill_value=None
+        )
+        array.attrs["_ARRAY_DIMENSIONS"] = dims
+        return array
+    kwargs = {"compressors": codec}
+    if group_format == 2:
+        kwargs.update(fill_value=None, attributes={"_ARRAY_DIMENSIONS": dims})
+    else:
+        kwargs.update(dimension_names=dims)
+    return group.create_array(name, shape=shape, dtype=dtype, chunks="auto" if chunks is None else chunks, **kwargs)
+
+
+def _get_compressor(group_format: int, compressor: Optional[str], complevel: int, dtype: np.dtype) -> Any:
+    """
+    Compressor codec for the Zarr format (numcodecs codecs for format 2, zarr codecs for format 3)
+    """
+    if compressor is None:
+        return None
+    if group_format == 2:
+        import numcodecs
+        return {
+            "zstd": lambda: numcodecs.Zstd(level=complevel),
+            "blosc": lambda: numcodecs.Blosc(cname="zstd", clevel=complevel, shuffle=numcodecs.Blosc.SHUFFLE),
+            "zlib": lambda: numcodecs.Zlib(level=complevel),
+        }[compressor]()
+    from zarr import codecs
+    return {
+        "zstd": lambda: codecs.ZstdCodec(level=complevel),
+        "blosc": lambda: codecs.BloscCodec(cname="zstd", clevel=complevel, shuffle="shuffle", typesize=dtype.itemsize),
+        "zlib": lambda: codecs.GzipCodec(level=complevel),
+    }[compressor]()
+
+
+def _open_group(zarr: Any, path: Path, zarr_format: Optional[int]) -> Any:
+    if zarr_format not in (None, 2, 3):
+        raise ValueError(f"{zarr_format=} must be 2 or 3")
+    if _get_zarr_major_version(zarr) < 3:
+        if zarr_format == 3:
+            raise ValueError("Zarr format 3 requires zarr-python >= 3")
+        return zarr.open_group(str(path), mode="w")
+    return zarr.open_group(store=str(path), mode="w", zarr_format=zarr_format)
+
+
+def _get_zarr_format(group: Any) -> int:
+    metadata = getattr(group, "metadata", None)
+    return int(getattr(metadata, "zarr_format", 2))
+
+
+def _get_zarr_major_version(zarr: Any) -> int:
+    return int(zarr.__version__.split(".")[0])
+
+
+def _to_json_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert attribute values (numpy scalars and arrays) to JSON serializable types
+    """
+    json_attributes = {}
+    for name, value in attributes.items():
+        if isinstance(value, (np.ndarray, np.generic)):
+            value = value.tolist()
+        elif isinstance(value, bytes):
+            value = list(value)
+        json_attributes[name] = value
+    return json_attributes
+
+
+def _import_zarr() -> Any:
+    try:
+        import zarr
+    except ImportError as error:
+        raise ImportError("The Zarr export requires the optional dependency zarr (pip install zarr)") from error
+    return zarr
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+Loader for yaml output templates.
+
+A template file is parsed and validated only once: the compiled template
+(`cf_data_struct.datamodels.output_template.OutputTemplate`) is cached in memory
+and optionally in a cache directory on disk, keyed by the hash of the file content.
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import hashlib
+import pickle
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+import numpy as np
+from pydantic_yaml import parse_yaml_raw_as
+
+from cf_data_struct.datamodels.output_template import OutputTemplate
+from cf_data_struct.datastruct import (CFStructBaseClass, CFVariable,
+                                       GridCFStruct, TrajectoryCFStruct)
+from cf_data_struct.instrumentation import instrumented
+
+# Changes to the template data models invalidate the disk cache
+TEMPLATE_CACHE_VERSION = "1"
+
+STRUCT_CLASSES = {"Grid": GridCFStruct, "Trajectory": TrajectoryCFStruct}
+
+# In-memory caches: {content hash: template} and {(path, mtime, size): content hash}
+_TEMPLATE_CACHE: Dict[str, OutputTemplate] = {}
+_FILE_HASH_CACHE: Dict[Tuple[str, int, int], str] = {}
+
+
+@instrumented("template_loading", label=lambda filepath, *args, **kwargs: filepath)
+def load_template(filepath: Union[str, Path], cache_dir: Union[str, Path] = None) -> OutputTemplate:
+    """
+    Load an output template from a yaml file. Templates are cached in memory by the
+    hash of the file content and, if `cache_dir` is given, stored as pickled compiled
+    templates in the cache directory. The cache directory must only be writeable by
+    trusted users, since pickle files are loaded from it.
+
+    :param filepath: Path to the yaml template file
+    :param cache_dir: Directory for the on-disk template cache (optional)
+
+    :raises IOError: Invalid file path
+    :raises pydantic.ValidationError: Invalid template content
+
+    :return: The compiled output template
+    """
+    filepath = Path(filepath)
+    if not filepath.is_file():
+        raise IOError(f"Not a valid file: {filepath}")
+
+    # Avoid reading and hashing the file if it has not changed since the last call
+    stat = filepath.stat()
+    stat_key = (str(filepath.resolve()), stat.st_mtime_ns, stat.st_size)
+    content = None
+    if (file_hash := _FILE_HASH_CACHE.get(stat_key)) is None:
+        content = filepath.read_bytes()
+        file_hash = hashlib.sha256(TEMPLATE_CACHE_VERSION.encode() + content).hexdigest()
+        _FILE_HASH_CACHE[stat_key] = file_hash
+
+    if (template := _TEMPLATE_CACHE.get(file_hash)) is not None:
+        return template
+
+    cache_file = Path(cache_dir) / f"{file_hash}.pickle" if cache_dir is not None else None
+    if cache_file is not None and cache_file.is_file():
+        with cache_file.open("rb") as fileobj:
+            template = pickle.load(fileobj)
+    else:
+        content = filepath.read_bytes() if content is None else content
+        template = parse_yaml_raw_as(OutputTemplate, content.decode("utf-8"))
+        if cache_file is not None:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(".tmp")
+            with tmp_file.open("wb") as fileobj:
+                pickle.dump(template, fileobj, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_file.replace(cache_file)
+
+    _TEMPLATE_CACHE[file_hash] = template
+    return template
+
+
+def clear_template_cache() -> None:
+    """
+    Clear the in-memory template cache (the on-disk cache is not affected).
+    """
+    _TEMPLATE_CACHE.clear()
+    _FILE_HASH_CACHE.clear()
+
+
+def build_struct(
+        template: OutputTemplate,
+        data: Dict[str, np.ndarray],
+        datatype: str = None,
+) -> CFStructBaseClass:
+    """
+    Create a CF data structure from an output template and a data dictionary
+    with the values for all dimensions and variables of the template.
+
+    :param template: The compiled output template
+    :param data: Dictionary {variable name: variable data}
+    :param datatype: The data type of the data structure (default: datatype of the template)
+
+    :raises ValueError: Missing data or invalid datatype
+
+    :return: The CF data structure
+    """
+    datatype = template.datatype if datatype is None else datatype
+    if datatype not in STRUCT_CLASSES:
+        raise ValueError(f"{datatype=} not in {list(STRUCT_CLASSES)}")
+    missing = set(template.dimensions).union(template.variables).difference(data)
+    if missing:
+        raise ValueError(f"No data for template variables: {sorted(missing)}")
+
+    def get_variable(name, var_template):
+        return CFVariable(
+            name,
+            data[name],
+            var_template.dims,
+            var_id=var_template.var_id,
+            attributes=var_template.attributes,
+        )
+
+    struct = STRUCT_CLASSES[datatype](
+        attributes=template.global_attributes.model_copy(),
+        dims=[get_variable(name, dim_template) for name, dim_template in template.dimensions.items()]
+    )
+    for name, var_template in template.variables.items():
+        struct.add_variable(get_variable(name, var_template))
+    return struct
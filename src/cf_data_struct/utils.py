@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Helper functions shared by the data structure and input/output modules
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import itertools
+from typing import Iterator, Optional, Sequence, Tuple
+
+DEFAULT_BLOCK_BYTES = 64 * 1024 ** 2
+
+# Encoding keywords of the netCDF export that are passed to netCDF4.Dataset.createVariable
+# (+ HDF5 chunk cache size in bytes of the writing file handle, integer
+# type for CF packing and number of significant bits/digits for bit rounding)
+VALID_ENCODING_KEYS = [
+    "zlib", "complevel", "shuffle", "chunksizes", "fletcher32", "contiguous", "endian", "dtype", "chunk_cache",
+    "packed_dtype", "quantize_nsb", "quantize_digits"
+]
+
+
+def iter_blocks(
+        shape: Tuple[int, ...],
+        itemsize: int,
+        max_bytes: int = DEFAULT_BLOCK_BYTES,
+        chunks: Optional[Sequence[int]] = None,
+) -> Iterator[Tuple[slice, ...]]:
+    """
+    Split an array shape into hyperslabs with a size of at most `max_bytes`
+    (or a single element row if that is larger). Blocks are contiguous in C-order,
+    i.e. the split is done along the leading dimensions.
+
+    If `chunks` (the storage chunk shape) is given, blocks are composed of whole chunks,
+    so that no storage chunk is split between two blocks (a single chunk may exceed `max_bytes`).
+
+    :param shape: The shape of the array
+    :param itemsize: The number of bytes per array element
+    :param max_bytes: Upper limit of the number of bytes per block
+    :param chunks: Storage chunk shape the blocks should be aligned with
+
+    :return: Iterator over tuples of slices, one per dimension
+    """
+    if chunks is not None:
+        chunk_grid = tuple(-(-size // chunk) for size, chunk in zip(shape, chunks))
+        chunk_bytes = itemsize
+        for chunk in chunks:
+            chunk_bytes *= chunk
+        for grid_block in iter_blocks(chunk_grid, chunk_bytes, max_bytes=max_bytes):
+            yield tuple(
+                slice(block.start * chunk, min(block.stop * chunk, size))
+                for block, chunk, size in zip(grid_block, chunks, shape)
+            )
+        return
+
+    if len(shape) == 0:
+        yield ()
+        return
+    if any(size == 0 for size in shape):
+        return
+
+    # Find the outermost axis for which the trailing hyperslab fits in the memory limit
+    inner_bytes = itemsize
+    split_axis = len(shape) - 1
+    for axis in range(len(shape) - 1, -1, -1):
+        if inner_bytes * shape[axis] > max_bytes:
+            split_axis = axis
+            break
+        inner_bytes *= shape[axis]
+    else:
+        yield tuple(slice(0, size) for size in shape)
+        return
+
+    step = max(1, max_bytes // inner_bytes)
+    trailing = tuple(slice(0, size) for size in shape[split_axis + 1:])
+    for leading in itertools.product(*(range(size) for size in shape[:split_axis])):
+        leading_slices = tuple(slice(index, index + 1) for index in leading)
+        for start in range(0, shape[split_axis], step):
+            stop = min(start + step, shape[split_axis])
+            yield leading_slices + (slice(start, stop),) + trailing
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the parallel batch export
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import os
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.datastruct import CFVariable, TrajectoryCFStruct
+from cf_data_struct.io import ExportTask, export_batch
+
+
+def make_trajectory(n_records: int) -> TrajectoryCFStruct:
+    if n_records < 0:
+        raise ValueError("Invalid number of records")
+    struct = TrajectoryCFStruct(dims=CFVariable("time", np.arange(float(n_records)), "time"))
+    struct.add_variable(CFVariable("some_name", np.full(n_records, float(n_records)), "time"))
+    return struct
+
+
+def make_trajectory_or_crash(n_records: int) -> TrajectoryCFStruct:
+    if n_records < 0:
+        os._exit(1)
+    return make_trajectory(n_records)
+
+
+@pytest.mark.parametrize("max_workers", [0, 2])
+def test_export_batch(tmp_path, max_workers: int) -> None:
+    sizes = [10, 20, -1, 40]
+    tasks = [ExportTask(path=tmp_path / f"trajectory_{i}.nc", factory=make_trajectory, args=(n,))
+             for i, n in enumerate(sizes)]
+    progress = []
+    report = export_batch(
+        tasks,
+        max_workers=max_workers,
+        max_in_flight=2,
+        progress=lambda result, rep: progress.append(rep.n_done)
+    )
+    assert report.n_done == 4
+    assert report.n_failed == 1
+    assert progress == [1, 2, 3, 4]
+    assert report.failed[0].path == tmp_path / "trajectory_2.nc"
+    assert "Invalid number of records" in report.failed[0].error
+    assert report.bytes_written > 0
+    with netCDF4.Dataset(tmp_path / "trajectory_3.nc") as dataset:
+        assert np.all(dataset.variables["some_name"][:] == 40.0)
+
+
+def test_export_batch_worker_crash(tmp_path) -> None:
+    sizes = [10, -1, 30, 40, -1, 60]
+    tasks = [ExportTask(path=tmp_path / f"trajectory_{i}.nc", factory=make_trajectory_or_crash, args=(n,))
+             for i, n in enumerate(sizes)]
+    report = export_batch(tasks, max_workers=2, max_in_flight=1)
+    assert report.n_done == 6
+    assert [result.path.name for result in report.failed] == ["trajectory_1.nc", "trajectory_4.nc"]
+    assert "BrokenProcessPool" in report.failed[0].error
+    for i in [0, 2, 3, 5]:
+        assert (tmp_path / f"trajectory_{i}.nc").is_file()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the binning of trajectories into grids
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import numpy as np
+import pytest
+
+from cf_data_struct.datamodels import GridVarAttrs
+from cf_data_struct.datastruct import (CFVariable, GridCFStruct,
+                                       TrajectoryCFStruct)
+from cf_data_struct.datastruct.binning import TrajectoryBinner
+
+
+def _get_grid() -> GridCFStruct:
+    dims = (CFVariable("yc", np.arange(3.5, -0.5, -1.0), "yc"), CFVariable("xc", np.arange(0.5, 5.0, 1.0), "xc"))
+    grid = GridCFStruct(dims=dims)
+    grid.grid_mapping = "crs"
+    return grid
+
+
+def _get_trajectory(seed: int, size: int = 1000) -> TrajectoryCFStruct:
+    rng = np.random.default_rng(seed)
+    trajectory = TrajectoryCFStruct(dims=CFVariable("time", np.arange(size, dtype="float64"), "time"))
+    trajectory.add_variable(CFVariable("xc", rng.uniform(-1, 6, size), "time"))
+    trajectory.add_variable(CFVariable("yc", rng.uniform(-1, 5, size), "time"))
+    attributes = {"long_name": "sea ice thickness", "units": "m", "standard_name": "sea_ice_thickness"}
+    value = rng.normal(2.0, 0.5, size).astype("float32")
+    value[::17] = np.nan
+    trajectory.add_variable(CFVariable("sea_ice_thickness", value, "time", attributes=attributes))
+    return trajectory
+
+
+def _reference(trajectories, grid):
+    x = np.concatenate([t._vars["xc"].value for t in trajectories])
+    y = np.concatenate([t._vars["yc"].value for t in trajectories])
+    value = np.concatenate([t._vars["sea_ice_thickness"].value for t in trajectories]).astype("float64")
+    ix, iy = np.floor(x).astype(int), 3 - np.floor(y).astype(int)
+    valid = (x >= 0) & (x < 5) & (y >= 0) & (y < 4) & np.isfinite(value)
+    mean, std, count = np.full((4, 5), np.nan), np.full((4, 5), np.nan), np.zeros((4, 5), dtype=int)
+    for j in range(4):
+        for i in range(5):
+            cell = value[valid & (ix == i) & (iy == j)]
+            count[j, i] = cell.size
+            if cell.size:
+                mean[j, i], std[j, i] = cell.mean(), cell.std()
+    return mean, std, count
+
+
+def test_bin_trajectories() -> None:
+    grid = _get_grid()
+    trajectories = [_get_trajectory(seed) for seed in range(3)]
+    gridded = grid.bin_trajectories(iter(trajectories), "sea_ice_thickness", max_block_bytes=1024)
+    mean, std, count = _reference(trajectories, grid)
+    assert gridded.get_dimensions(("yc", "xc")) == (4, 5)
+    assert np.array_equal(gridded._vars["sea_ice_thickness_count"].value, count)
+    assert np.allclose(gridded._vars["sea_ice_thickness_mean"].value, mean, equal_nan=True, rtol=1e-6)
+    assert np.allclose(gridded._vars["sea_ice_thickness_std"].value, std, equal_nan=True, rtol=1e-5)
+    assert gridded._vars["sea_ice_thickness_mean"].datatype == np.dtype("float32")
+    attrs = gridded._vars["sea_ice_thickness_mean"].attrs
+    assert isinstance(attrs, GridVarAttrs)
+    assert attrs.grid_mapping == "crs"
+    assert attrs.cell_methods == "area: mean"
+    assert attrs.units == "m"
+    assert gridded._vars["sea_ice_thickness_count"].attrs.cell_methods == "area: sum"
+    assert np.all(gridded._vars["sea_ice_thickness_min"].value <= gridded._vars["sea_ice_thickness_max"].value)
+
+
+def test_bin_trajectories_invalid() -> None:
+    grid = _get_grid()
+    with pytest.raises(ValueError):
+        TrajectoryBinner(grid, "sea_ice_thickness", x="lon")
+    binner = TrajectoryBinner(grid, "sea_ice_thickness")
+    binner.add(_get_trajectory(0))
+    with pytest.raises(ValueError):
+        binner.result(statistics=["median"])
+    grid.grid_mapping = None
+    with pytest.raises(ValueError):
+        binner.result()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the CF data structures
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import numpy as np
+import pytest
+
+from cf_data_struct.datastruct import (CFVariable, GridCFStruct,
+                                       TrajectoryCFStruct)
+
+
+def test_trajectory_add_variable_keeps_view() -> None:
+    time = CFVariable("time", np.arange(10.0), "time")
+    value = np.zeros(10)
+    struct = TrajectoryCFStruct(dims=time)
+    struct.add_variable(CFVariable("some_name", value, "time"))
+    assert struct.variable_names == ["some_name"]
+    assert struct._vars["some_name"].value is value
+
+
+def test_grid_add_variable_dimension_mismatch() -> None:
+    struct = GridCFStruct(dims=(CFVariable("xc", np.arange(5.0), "xc"), CFVariable("yc", np.arange(4.0), "yc")))
+    assert struct.get_dimensions(("yc", "xc")) == (4, 5)
+    with pytest.raises(ValueError):
+        struct.add_variable(CFVariable("some_name", np.zeros((5, 4)), ("yc", "xc")))
+
+
+def test_add_variables_mapping() -> None:
+    struct = TrajectoryCFStruct(dims=CFVariable("time", np.arange(10.0), "time"))
+    variables = {
+        f"some_name_{i}": {"value": np.zeros(10), "dims": "time", "var_id": f"sn{i}", "attributes": {"long_name": "x"}}
+        for i in range(200)
+    }
+    struct.add_variables(variables)
+    assert len(struct.variable_names) == 200
+    with pytest.raises(ValueError):
+        struct.add_variables({"other_name": {"value": np.zeros(10), "dims": "time", "var_id": "sn0"}})
+
+
+def test_add_variable_overwrite() -> None:
+    struct = TrajectoryCFStruct(dims=CFVariable("time", np.arange(10.0), "time"))
+    struct.add_variable(CFVariable("some_name", np.zeros(10), "time"))
+    struct.add_variable(CFVariable("some_name", np.ones(10), "time", var_id="other_id"), overwrite=True)
+    assert struct.variable_id_dict == {"other_id": "some_name"}
+
+
+def _get_grid() -> GridCFStruct:
+    dims = (
+        CFVariable("yc", np.arange(0.0, 1000.0, 100.0), "yc"),
+        CFVariable("xc", np.arange(-500.0, 500.0, 50.0), "xc")
+    )
+    struct = GridCFStruct(dims=dims)
+    struct.add_variable(CFVariable(
+        "sea_ice_thickness", np.arange(200.0).reshape(10, 20), ("yc", "xc"),
+        attributes={"long_name": "sea ice thickness", "actual_range": (0.0, 199.0)}
+    ))
+    struct.grid_mapping = "Lambert_Azimuthal_Grid"
+    return struct
+
+
+def test_isel_returns_views() -> None:
+    struct = _get_grid()
+    subset = struct.isel(yc=slice(2, 5), xc=[4, 6, 8])
+    assert isinstance(subset, GridCFStruct)
+    assert subset.grid_mapping == "Lambert_Azimuthal_Grid"
+    assert subset.get_dimensions(("yc", "xc")) == (3, 3)
+    value = subset._vars["sea_ice_thickness"].value
+    assert np.shares_memory(value, struct._vars["sea_ice_thickness"].value)
+    assert np.array_equal(value, np.arange(200.0).reshape(10, 20)[2:5, 4:9:2])
+    assert subset._vars["sea_ice_thickness"].attrs.actual_range is None
+    assert subset._vars["sea_ice_thickness"].stats.value_range == (44.0, 88.0)
+    assert struct._vars["sea_ice_thickness"].attrs.actual_range == (0.0, 199.0)
+
+    struct.plotting_cache = "derived state"
+    assert not hasattr(struct.isel(yc=0), "plotting_cache")
+
+    subset = struct.isel(xc=[5, 1], yc=-1)
+    assert subset.get_dimensions(("yc", "xc")) == (1, 2)
+    assert np.array_equal(subset._vars["sea_ice_thickness"].value, [[185.0, 181.0]])
+    with pytest.raises(ValueError):
+        struct.isel(time=0)
+
+
+def test_sel_bounding_box() -> None:
+    struct = _get_grid()
+    subset = struct.sel(xc=slice(0, -100), yc=slice(250, None))
+    assert np.array_equal(subset._dims["xc"].value, [-100.0, -50.0, 0.0])
+    assert np.array_equal(subset._dims["yc"].value, np.arange(300.0, 1000.0, 100.0))
+    assert np.shares_memory(subset._vars["sea_ice_thickness"].value, struct._vars["sea_ice_thickness"].value)
+    assert struct.sel(yc=[300.0, 100.0]).get_dimensions(("yc", )) == (2, )
+    with pytest.raises(ValueError):
+        struct.sel(yc=150.0)
+
+
+def test_sel_trajectory_time_window() -> None:
+    time = np.datetime64("2024-01-01T00:00:00") + np.arange(100) * np.timedelta64(1, "h")
+    struct = TrajectoryCFStruct(dims=CFVariable("time", time, "time"))
+    struct.add_variable(CFVariable("sea_ice_thickness", np.arange(100.0), "time"))
+    subset = struct.sel(time=slice(np.datetime64("2024-01-02T00:00"), np.datetime64("2024-01-02T23:00")))
+    assert subset.get_dimensions(("time", )) == (24, )
+    assert subset._vars["sea_ice_thickness"].stats.value_range == (24.0, 47.0)
+
+
+def _get_segment(start: int, size: int, time_unit: str = "s") -> TrajectoryCFStruct:
+    time = (np.datetime64("2024-01-01T00:00:00") + np.arange(start, start + size) * np.timedelta64(1, "s"))
+    struct = TrajectoryCFStruct(dims=CFVariable("time", time.astype(f"datetime64[{time_unit}]"), "time"))
+    struct.add_variable(CFVariable("sea_ice_thickness", np.arange(start, start + size, dtype="float32"), "time"))
+    flag_attrs = {"long_name": "flag", "flag_values": [0, 1], "flag_meanings": "ok bad"}
+    struct.add_variable(CFVariable("flag", np.zeros(size, dtype="int8"), "time", attributes=flag_attrs))
+    return struct
+
+
+def test_trajectory_concat() -> None:
+    segments = [_get_segment(100 * i, 100, time_unit="ns" if i == 3 else "s") for i in range(5)]
+    segments[0]._vars["sea_ice_thickness"].stats
+    trajectory = TrajectoryCFStruct.concat(segments[::-1], sort=True, max_workers=2)
+    assert trajectory.get_dimensions(("time", )) == (500, )
+    assert trajectory._dims["time"].datatype == np.dtype("datetime64[ns]")
+    assert np.all(np.diff(trajectory._dims["time"].value) == np.timedelta64(1, "s"))
+    assert np.array_equal(trajectory._vars["sea_ice_thickness"].value, np.arange(500, dtype="float32"))
+    assert trajectory._vars["flag"].datatype == np.dtype("int8")
+    assert trajectory._vars["sea_ice_thickness"].stats.value_range == (0.0, 499.0)
+
+
+def test_trajectory_concat_incompatible() -> None:
+    other = _get_segment(100, 10)
+    other._vars["flag"]._value = np.zeros(10, dtype="float32")
+    with pytest.raises(ValueError):
+        TrajectoryCFStruct.concat([_get_segment(0, 10), other])
+    other = _get_segment(100, 10)
+    other.add_variable(CFVariable("snow_depth", np.zeros(10), "time"))
+    with pytest.raises(ValueError):
+        TrajectoryCFStruct.concat([_get_segment(0, 10), other])
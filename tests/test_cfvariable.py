@@ -90,3 +90,77 @@ def test_cfvariable_dims_cast_to_tuple(test_input: Dict, expected_result: Tuple[
 def test_cfvariable_varattr_cast_to_object(test_input: Dict) -> None:
     var = CFVariable(**test_input)
     assert isinstance(var.attrs, BasicVarAttrs)
+
+
+def test_cfvariable_no_copy_by_default() -> None:
+    value = np.zeros(10)
+    var = CFVariable("some_name", value, "time")
+    assert var.value is value
+    assert not var.owns_data
+
+
+@pytest.mark.parametrize(
+    "test_input, copy, owns_data",
+    [
+        (np.zeros(10), True, True),
+        (np.zeros(10), None, False),
+        (np.zeros(10), False, False),
+        (bytearray(10), None, False),
+        ([0, 1, 2], None, True),
+    ]
+)
+def test_cfvariable_copy_ownership(test_input, copy, owns_data: bool) -> None:
+    var = CFVariable("some_name", test_input, "time", copy=copy)
+    assert var.owns_data == owns_data
+
+
+def test_cfvariable_copy_false_raises() -> None:
+    with pytest.raises(ValueError):
+        CFVariable("some_name", [0, 1, 2], "time", copy=False)
+
+
+def test_cfvariable_memmap_kept_as_view(tmp_path) -> None:
+    value = np.memmap(tmp_path / "data.bin", dtype="f4", mode="w+", shape=(4, 5))
+    var = CFVariable("some_name", value, ("time", "xc"), copy=False)
+    assert isinstance(var.value, np.memmap)
+    assert np.shares_memory(var.value, value)
+
+
+def test_cfvariable_read_only_keeps_input_writeable() -> None:
+    value = np.zeros(10)
+    var = CFVariable("some_name", value, "time", read_only=True)
+    assert var.read_only
+    assert value.flags.writeable
+    assert np.shares_memory(var.value, value)
+    with pytest.raises(ValueError):
+        var.value[0] = 1.0
+
+
+def test_cfvariable_to_xarray_var() -> None:
+    value = np.zeros(10)
+    var = CFVariable("some_name", value, "time", attributes={"long_name": "some name", "units": "m"})
+    xr_var = var.to_xarray_var(ignore_attribute_list=["units"])
+    assert xr_var.dims == ("time",)
+    assert xr_var.attrs == {"long_name": "some name"}
+    assert np.shares_memory(xr_var.values, value)
+
+
+def test_cfvariable_attrs_read_only_and_memoized() -> None:
+    attributes = {"long_name": "some name", "flag_values": [0, 1]}
+    var = CFVariable("some_name", np.zeros(10), "time", attributes=attributes)
+    other_var = CFVariable("other_name", np.zeros(10), "time", attributes=dict(attributes))
+    assert var.attrs is other_var.attrs
+    with pytest.raises(ValueError):
+        var.attrs.units = "m"
+    assert var.attrs.model_copy(update={"units": "m"}).units == "m"
+
+
+def test_cfvariable_from_records_trusted() -> None:
+    records = [
+        {"name": f"some_name_{i}", "value": np.zeros(10), "dims": ("time",), "var_id": f"sn{i}"}
+        for i in range(3)
+    ]
+    variables = CFVariable.from_records(records, trusted=True)
+    assert [var.id for var in variables] == ["sn0", "sn1", "sn2"]
+    assert all(isinstance(var.attrs, BasicVarAttrs) for var in variables)
+    assert variables[0].value is records[0]["value"]
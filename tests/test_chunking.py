@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the chunk planner
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.datastruct import CFVariable, GridCFStruct
+from cf_data_struct.io.chunking import plan_variable_chunks, set_chunk_caches
+
+
+@pytest.mark.parametrize(
+    "shape, access_pattern, expected_chunks",
+    [
+        ((365, 100, 100), "map", (1, 100, 100)),
+        ((365, 1000, 1000), "map", (1, 500, 500)),
+        ((365, 100, 100), "timeseries", (365, 32, 16)),
+        ((100, 100), "timeseries", (100, 100)),
+    ]
+)
+def test_plan_variable_chunks(shape, access_pattern, expected_chunks) -> None:
+    plan = plan_variable_chunks(shape, "f4", access_pattern=access_pattern)
+    assert plan.chunksizes == expected_chunks
+    assert np.prod(plan.chunksizes) * 4 <= 1024 ** 2
+
+
+def test_plan_variable_chunks_small_variable() -> None:
+    plan = plan_variable_chunks((10,), "f8")
+    assert plan.chunksizes is None
+    assert plan.encoding["contiguous"]
+
+
+def test_plan_variable_chunks_invalid_access_pattern() -> None:
+    with pytest.raises(ValueError):
+        plan_variable_chunks((10, 10), "f8", access_pattern="random")
+
+
+def _get_grid() -> GridCFStruct:
+    dims = (
+        CFVariable("time", np.arange(20.0), "time"),
+        CFVariable("yc", np.arange(40.0), "yc"),
+        CFVariable("xc", np.arange(50.0), "xc")
+    )
+    struct = GridCFStruct(dims=dims)
+    value = np.random.default_rng(0).random((20, 40, 50)).astype("f4")
+    struct.add_variable(CFVariable("some_name", value, ("time", "yc", "xc")))
+    return struct
+
+
+def test_grid_to_netcdf_access_pattern(tmp_path) -> None:
+    struct = _get_grid()
+    path = struct.to_netcdf(tmp_path / "grid.nc", access_pattern="timeseries", max_block_bytes=4096)
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset.variables["some_name"]
+        assert nc_var.chunking() == [20, 40, 50]
+        assert np.array_equal(nc_var[:], struct._vars["some_name"].value)
+
+
+def test_set_chunk_caches(tmp_path) -> None:
+    struct = _get_grid()
+    plans = struct.plan_chunks("timeseries", chunk_bytes=4096)
+    assert "chunk_cache" not in plans["some_name"].encoding
+    path = struct.to_netcdf(tmp_path / "grid.nc", encoding={name: plan.encoding for name, plan in plans.items()})
+    with netCDF4.Dataset(path) as dataset:
+        set_chunk_caches(dataset, plans)
+        assert dataset.variables["some_name"].get_var_chunk_cache()[0] == plans["some_name"].chunk_cache
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the content digest and skip-if-unchanged exports
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.datastruct import (CFStructBaseClass, CFVariable,
+                                       GridCFStruct)
+from cf_data_struct.io import compute_digest, digest, read_digest
+
+
+def _get_grid(offset: float = 0.0) -> GridCFStruct:
+    dims = (CFVariable("yc", np.arange(40, dtype="f8"), "yc"),
+            CFVariable("xc", np.arange(50, dtype="f8"), "xc"))
+    grid = GridCFStruct(dims=dims)
+    grid.gattrs.title = "Sea ice thickness"
+    value = np.random.default_rng(0).random((40, 50)).astype("float32") + offset
+    attributes = {"long_name": "sea ice thickness", "units": "m"}
+    grid.add_variable(CFVariable("sea_ice_thickness", value, ("yc", "xc"), attributes=attributes))
+    return grid
+
+
+def test_compute_digest(monkeypatch) -> None:
+    # Small blocks, so that the data is hashed by several threads
+    monkeypatch.setattr(digest, "DIGEST_BLOCK_BYTES", 1024)
+    grid = _get_grid()
+    grid_digest = compute_digest(grid, options={"zlib": True}, max_workers=1)
+    assert grid_digest.startswith("sha256:")
+    assert compute_digest(grid, options={"zlib": True}, max_workers=4) == grid_digest
+    assert compute_digest(grid, options={"zlib": False}) != grid_digest
+    assert compute_digest(_get_grid(offset=1e-3), options={"zlib": True}) != grid_digest
+    changed = _get_grid()
+    changed.gattrs.title = "Sea ice thickness (v2)"
+    assert compute_digest(changed, options={"zlib": True}) != grid_digest
+
+
+def test_write_netcdf_skip_unchanged(tmp_path) -> None:
+    path = tmp_path / "grid.nc"
+    _get_grid().to_netcdf(path, skip_unchanged=True)
+    file_digest = read_digest(path)
+    assert file_digest is not None
+    modified = path.stat().st_mtime_ns
+
+    # Unchanged product: the file is not written
+    assert _get_grid().to_netcdf(path, skip_unchanged=True) == path
+    assert path.stat().st_mtime_ns == modified
+
+    # Changed writer options or data: the file is overwritten
+    _get_grid().to_netcdf(path, skip_unchanged=True, complevel=1)
+    assert read_digest(path) not in [None, file_digest]
+    _get_grid(offset=1.0).to_netcdf(path, skip_unchanged=True, complevel=1)
+    with netCDF4.Dataset(path) as dataset:
+        assert dataset["sea_ice_thickness"][0, 0] >= 1.0
+
+    # The digest of a read file is not copied to a new file
+    struct = CFStructBaseClass.from_netcdf(path)
+    struct.to_netcdf(tmp_path / "copy.nc")
+    assert read_digest(tmp_path / "copy.nc") is None
+    assert read_digest(tmp_path / "missing.nc") is None
+
+
+def test_write_zarr_skip_unchanged(tmp_path) -> None:
+    pytest.importorskip("zarr")
+    path = tmp_path / "grid.zarr"
+    _get_grid().to_zarr(path, skip_unchanged=True)
+    store_digest = read_digest(path)
+    assert store_digest is not None
+    assert store_digest != compute_digest(_get_grid())
+    marker = path / "marker"
+    marker.touch()
+    _get_grid().to_zarr(path, skip_unchanged=True)
+    assert marker.exists()
+    _get_grid(offset=1.0).to_zarr(path, skip_unchanged=True)
+    assert not marker.exists()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for flag variables (compact data types and mask decoding)
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.coding import (get_flag_dtype, get_flag_mask,
+                                   pack_flag_masks)
+from cf_data_struct.datamodels import FlagVarAttrs
+from cf_data_struct.datastruct import CFVariable, GridCFStruct
+
+
+def _get_grid(var: CFVariable) -> GridCFStruct:
+    dims = (CFVariable("yc", np.arange(var.value.shape[0], dtype="f8"), "yc"),
+            CFVariable("xc", np.arange(var.value.shape[1], dtype="f8"), "xc"))
+    grid = GridCFStruct(dims=dims)
+    grid.add_variable(var)
+    return grid
+
+
+@pytest.mark.parametrize("values,allow_unsigned,expected", [
+    ([0, 1, 255], True, "uint8"),
+    ([0, 1, 255], False, "int16"),
+    ([-1, 0, 100], True, "int8"),
+    ([0, 70000], True, "uint32"),
+    ([], True, "uint8"),
+])
+def test_get_flag_dtype(values, allow_unsigned, expected) -> None:
+    assert get_flag_dtype(values, allow_unsigned=allow_unsigned) == np.dtype(expected)
+
+
+def test_get_flag_mask() -> None:
+    value = np.array([0, 1, 2, 5, 6, 7], dtype="int64")
+    attrs = FlagVarAttrs(long_name="x", flag_values=[0, 1, 2], flag_meanings="a b c")
+    assert get_flag_mask(value, attrs, "b").tolist() == [False, True, False, False, False, False]
+    attrs = FlagVarAttrs(long_name="x", flag_masks=[1, 2, 4], flag_meanings="a b c")
+    assert get_flag_mask(value, attrs, "c").tolist() == [False, False, False, True, True, True]
+    # Bit field with several states: bits 0-1 (0, 1, 2) and bit 2
+    attrs = FlagVarAttrs(long_name="x", flag_masks=[3, 3, 4], flag_values=[1, 2, 4], flag_meanings="a b c")
+    assert get_flag_mask(value, attrs, "a").tolist() == [False, True, False, True, False, False]
+    assert get_flag_mask(value, attrs, "b").tolist() == [False, False, True, False, True, False]
+    with pytest.raises(ValueError):
+        get_flag_mask(value, attrs, "d")
+
+
+def test_flag_attributes_validation() -> None:
+    with pytest.raises(ValueError):
+        FlagVarAttrs(long_name="x", flag_meanings="a b")
+    with pytest.raises(ValueError):
+        FlagVarAttrs(long_name="x", flag_masks=[1, 2, 4], flag_meanings="a b")
+    assert FlagVarAttrs(long_name="x", flag_values=[0, 1], flag_meanings="a b").flag_masks is None
+
+
+def test_pack_flag_masks() -> None:
+    rng = np.random.default_rng(0)
+    flags = {f"flag_{i}": rng.random((20, 30)) > 0.5 for i in range(10)}
+    packed, attributes = pack_flag_masks(flags)
+    assert packed.dtype == np.dtype("uint16")
+    assert attributes["flag_masks"][-1] == 512
+    var = CFVariable.from_flags("surface_type", flags, ("yc", "xc"))
+    assert np.array_equal(var.value, packed)
+    for meaning, mask in var.get_flag_masks().items():
+        assert np.array_equal(mask, flags[meaning])
+
+
+def test_compact_flags() -> None:
+    attrs = FlagVarAttrs(long_name="x", flag_values=[0, 1, 2], flag_meanings="a b c")
+    var = CFVariable("status_flag", np.array([0, 1, 2, 1], dtype="int64"), "time", attributes=attrs)
+    assert var.get_flag_dtype() == np.dtype("uint8")
+    assert var.get_flag_dtype(allow_unsigned=False) == np.dtype("int8")
+    compact = var.compact_flags()
+    assert compact.datatype == np.dtype("uint8")
+    assert np.array_equal(compact.get_flag_mask("b"), var.get_flag_mask("b"))
+    assert CFVariable("x", np.zeros(3, dtype="int64"), "time").get_flag_dtype() is None
+
+
+def test_write_netcdf_flag_dtype(tmp_path) -> None:
+    attrs = FlagVarAttrs(long_name="x", flag_values=[0, 1, 2], flag_meanings="a b c")
+    value = np.random.default_rng(0).integers(0, 3, size=(50, 40)).astype("int64")
+    var = CFVariable("status_flag", value, ("yc", "xc"), attributes=attrs)
+    path = _get_grid(var).to_netcdf(tmp_path / "flags.nc")
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset["status_flag"]
+        assert nc_var.dtype == np.dtype("uint8")
+        assert nc_var.flag_values.dtype == np.dtype("uint8")
+        assert np.array_equal(nc_var[:], value)
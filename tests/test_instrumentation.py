@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the opt-in instrumentation of processing stages
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import json
+import threading
+
+import numpy as np
+
+from cf_data_struct.datastruct import CFVariable, GridCFStruct
+from cf_data_struct.instrumentation import instrument, is_active, stage
+
+
+def _get_grid() -> GridCFStruct:
+    dims = (CFVariable("yc", np.arange(20, dtype="f8"), "yc"),
+            CFVariable("xc", np.arange(30, dtype="f8"), "xc"))
+    grid = GridCFStruct(dims=dims)
+    grid.add_variable(CFVariable("sea_ice_thickness", np.zeros((20, 30), dtype="f4"), ("yc", "xc")))
+    return grid
+
+
+def test_instrument_stages(tmp_path) -> None:
+    records = []
+    with instrument(callback=records.append) as report:
+        assert is_active()
+        grid = _get_grid()
+        path = grid.to_netcdf(tmp_path / "grid.nc")
+    assert not is_active()
+    assert records == report.records
+
+    summary = report.summary()
+    assert summary["variable_validation"]["count"] == 3
+    assert summary["add_variable"]["count"] == 1
+    assert summary["variable_writing"]["count"] == 3
+    assert summary["file_writing"]["bytes_allocated"] is None
+
+    file_record, = report.filter(stage="file_writing")
+    assert file_record.label == str(path)
+    assert file_record.bytes_written == 20 * 8 + 30 * 8 + 20 * 30 * 4
+    assert file_record.duration >= sum(record.duration for record in report.filter(stage="variable_writing"))
+    variable_record, = report.filter(stage="variable_writing", label="sea_ice_thickness")
+    assert variable_record.depth == 1 and variable_record.bytes_written == 20 * 30 * 4
+    assert json.loads(json.dumps(report.to_dict()))["summary"]["file_writing"]["count"] == 1
+    assert "file_writing" in report.format_table()
+
+    # No records outside of the context
+    _get_grid()
+    assert len(report.records) == len(records)
+
+
+def test_instrument_bytes_copied() -> None:
+    value = np.zeros(1000)
+    with instrument(trace_allocations=True) as report:
+        CFVariable("freeboard", value, "time")
+        CFVariable("thickness", value, "time", copy=True)
+        CFVariable("freeboard", value, "time", attributes={"long_name": "freeboard", "comment": "instrumented"})
+    no_copy, copy, _ = report.filter(stage="variable_validation")
+    assert no_copy.bytes_copied == 0
+    assert copy.bytes_copied == value.nbytes
+    assert copy.bytes_allocated >= value.nbytes
+    assert report.filter(stage="attribute_validation", label="freeboard")[0].depth == 1
+
+
+def test_instrument_threads() -> None:
+    with instrument() as report:
+        thread = threading.Thread(target=_get_grid)
+        thread.start()
+        thread.join()
+        with stage("template_loading", "custom") as record:
+            assert record is not None
+    assert report.summary()["add_variable"]["count"] == 1
+    assert report.filter(label="custom")[0].depth == 0
+    with stage("template_loading") as record:
+        assert record is None
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for lazy variable data
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.datastruct import CFVariable, GridCFStruct
+from cf_data_struct.datastruct.lazy import DeferredArray
+from cf_data_struct.datastruct.statistics import compute_statistics
+
+
+class _CountingLoader(object):
+
+    def __init__(self, data: np.ndarray) -> None:
+        self.data = data
+        self.loaded_bytes = 0
+
+    def __call__(self, hyperslab):
+        subset = self.data[hyperslab]
+        self.loaded_bytes += subset.nbytes
+        return subset
+
+
+def test_deferred_array_indexing() -> None:
+    data = np.arange(60.0).reshape(3, 4, 5)
+    array = DeferredArray(data.shape, data.dtype, _CountingLoader(data))
+    assert np.array_equal(array[1], data[1])
+    assert np.array_equal(array[..., -1], data[..., -1])
+    assert np.array_equal(array[:, 1:3], data[:, 1:3])
+    assert np.array_equal(array[::2], data[::2])
+    assert np.array_equal(np.asarray(array), data)
+
+
+def test_deferred_array_bounds_and_iteration() -> None:
+    data = np.arange(5.0)
+    array = DeferredArray(data.shape, data.dtype, _CountingLoader(data))
+    assert array[-5] == data[0]
+    assert array[4] == data[4]
+    for index in [5, 7, -6]:
+        with pytest.raises(IndexError):
+            array[index]
+    with pytest.raises(IndexError):
+        array[0, 0]
+    with pytest.raises(IndexError):
+        DeferredArray((0, 3), data.dtype, _CountingLoader(np.zeros((0, 3))))[0]
+    assert [float(value) for value in array] == data.tolist()
+    assert list(DeferredArray((0, ), data.dtype, _CountingLoader(data[:0]))) == []
+
+
+def test_cfvariable_lazy_value_not_loaded() -> None:
+    data = np.arange(60.0).reshape(3, 4, 5)
+    loader = _CountingLoader(data)
+    var = CFVariable("some_name", DeferredArray(data.shape, data.dtype, loader), ("time", "yc", "xc"))
+    assert var.is_lazy
+    assert var.read_only
+    assert var.datatype == np.dtype("f8")
+    assert loader.loaded_bytes == 0
+    with pytest.raises(ValueError):
+        CFVariable("some_name", DeferredArray(data.shape, data.dtype, loader), ("time", "yc"))
+
+
+def _get_lazy_grid(value):
+    dims = (
+        CFVariable("time", np.arange(10.0), "time"),
+        CFVariable("yc", np.arange(20.0), "yc"),
+        CFVariable("xc", np.arange(30.0), "xc")
+    )
+    struct = GridCFStruct(dims=dims)
+    struct.add_variable(CFVariable("some_name", value, ("time", "yc", "xc")))
+    return struct
+
+
+def test_lazy_variable_to_netcdf_single_pass(tmp_path) -> None:
+    data = np.random.default_rng(0).random((10, 20, 30))
+    loader = _CountingLoader(data)
+    struct = _get_lazy_grid(DeferredArray(data.shape, data.dtype, loader))
+    assert loader.loaded_bytes == 0
+    path = struct.to_netcdf(tmp_path / "lazy.nc", max_block_bytes=4800)
+    assert loader.loaded_bytes == data.nbytes
+    with netCDF4.Dataset(path) as dataset:
+        assert np.array_equal(dataset.variables["some_name"][:], data)
+        assert np.array_equal(dataset.variables["some_name"].actual_range, [data.min(), data.max()])
+
+
+def test_dask_variable_to_netcdf(tmp_path) -> None:
+    da = pytest.importorskip("dask.array")
+    value = da.random.random((10, 20, 30), chunks=(5, 20, 30))
+    struct = _get_lazy_grid(value)
+    assert struct._vars["some_name"].is_lazy
+    path = struct.to_netcdf(tmp_path / "dask.nc", max_block_bytes=4800)
+    with netCDF4.Dataset(path) as dataset:
+        assert np.allclose(dataset.variables["some_name"][:], value.compute())
+
+
+def test_lazy_statistics_large_blocks() -> None:
+    data = np.random.default_rng(0).random((10, 20, 30))
+    calls = []
+    value = DeferredArray(data.shape, data.dtype, lambda hyperslab: calls.append(hyperslab) or data[hyperslab])
+    stats = compute_statistics(value, max_block_bytes=1024)
+    assert stats.value_range == (data.min(), data.max())
+    assert len(calls) == 1
+    calls.clear()
+    value.chunks = (3, 20, 30)
+    compute_statistics(value, max_block_bytes=1024, max_load_bytes=30000)
+    assert [hyperslab[0] for hyperslab in calls] == [slice(0, 6), slice(6, 10)]
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the netCDF export
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.datamodels import BasicCFGlobalAttributes, GridVarAttrs
+from cf_data_struct.datastruct import (CFVariable, GridCFStruct,
+                                       TrajectoryCFStruct)
+from cf_data_struct.utils import iter_blocks
+
+
+@pytest.mark.parametrize(
+    "shape, itemsize, max_bytes",
+    [
+        ((10,), 8, 32),
+        ((3, 4, 5), 8, 80),
+        ((3, 4, 5), 8, 1),
+        ((3, 4, 5), 8, 10 ** 6),
+    ]
+)
+def test_iter_blocks_cover_array(shape, itemsize, max_bytes) -> None:
+    covered = np.zeros(shape, dtype=int)
+    for block in iter_blocks(shape, itemsize, max_bytes=max_bytes):
+        covered[block] += 1
+        assert covered[block].size * itemsize <= max(max_bytes, itemsize)
+    assert np.all(covered == 1)
+
+
+def test_trajectory_to_netcdf(tmp_path) -> None:
+    time = CFVariable("time", np.arange(1000.0), "time", attributes={"long_name": "time", "units": "s"})
+    struct = TrajectoryCFStruct(dims=time, attributes=BasicCFGlobalAttributes(title="test"))
+    value = np.random.default_rng(0).random(1000).astype("f4")
+    attrs = {"long_name": "some name", "actual_range": (0.0, 1.0)}
+    struct.add_variable(CFVariable("some_name", value, "time", attributes=attrs))
+    path = struct.to_netcdf(tmp_path / "trajectory.nc", max_block_bytes=256, complevel=1)
+
+    with netCDF4.Dataset(path) as dataset:
+        assert dataset.title == "test"
+        assert dataset.dimensions["time"].size == 1000
+        nc_var = dataset.variables["some_name"]
+        assert np.array_equal(nc_var[:], value)
+        assert nc_var.actual_range.dtype == np.dtype("f4")
+        assert nc_var.filters()["zlib"]
+        assert nc_var.filters()["complevel"] == 1
+
+
+def test_grid_to_netcdf_encoding(tmp_path) -> None:
+    dims = (CFVariable("yc", np.arange(20.0), "yc"), CFVariable("xc", np.arange(30.0), "xc"))
+    struct = GridCFStruct(dims=dims)
+    value = np.arange(600, dtype="i4").reshape(20, 30)
+    attrs = GridVarAttrs(long_name="some name", grid_mapping="crs")
+    struct.add_variable(CFVariable("some_name", value, ("yc", "xc"), attributes=attrs))
+    encoding = {"some_name": {"zlib": False, "chunksizes": (5, 30)}}
+    path = struct.to_netcdf(tmp_path / "grid.nc", encoding=encoding, max_block_bytes=100)
+
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset.variables["some_name"]
+        assert np.array_equal(nc_var[:], value)
+        assert nc_var.grid_mapping == "crs"
+        assert nc_var.chunking() == [5, 30]
+        assert not nc_var.filters()["zlib"]
+
+
+def test_to_netcdf_invalid_encoding(tmp_path) -> None:
+    struct = TrajectoryCFStruct(dims=CFVariable("time", np.arange(10.0), "time"))
+    with pytest.raises(ValueError):
+        struct.to_netcdf(tmp_path / "invalid.nc", encoding={"time": {"compression": "gzip"}})
+
+
+def _get_trajectory_segment(start: int, size: int) -> TrajectoryCFStruct:
+    time_attrs = {"long_name": "time", "units": "seconds since 2020-01-01", "calendar": "standard"}
+    time = CFVariable("time", np.arange(start, start + size, dtype="f8"), "time", attributes=time_attrs)
+    struct = TrajectoryCFStruct(dims=time)
+    value = np.linspace(start, start + 1, size)
+    struct.add_variable(CFVariable("some_name", value, "time"))
+    return struct
+
+
+def test_trajectory_append_to_netcdf(tmp_path) -> None:
+    path = tmp_path / "trajectory.nc"
+    segments = [_get_trajectory_segment(start, 100) for start in (0, 100, 200)]
+    for segment in segments:
+        segment.append_to_netcdf(path, max_block_bytes=256)
+
+    with netCDF4.Dataset(path) as dataset:
+        assert dataset.dimensions["time"].isunlimited()
+        assert dataset.dimensions["time"].size == 300
+        expected = np.concatenate([segment._vars["some_name"].value for segment in segments])
+        assert np.array_equal(dataset.variables["some_name"][:], expected)
+        assert np.array_equal(dataset.variables["some_name"].actual_range, [0.0, 201.0])
+        assert np.array_equal(dataset.variables["time"].actual_range, [0.0, 299.0])
+        assert dataset.time_coverage_start == "2020-01-01T00:00:00Z"
+        assert dataset.time_coverage_end == "2020-01-01T00:04:59Z"
+
+
+def test_trajectory_append_incompatible(tmp_path) -> None:
+    path = tmp_path / "trajectory.nc"
+    _get_trajectory_segment(0, 10).to_netcdf(path)
+    with pytest.raises(ValueError):
+        _get_trajectory_segment(10, 10).append_to_netcdf(path)
+
+
+def test_trajectory_append_packed(tmp_path) -> None:
+    path = tmp_path / "trajectory.nc"
+    encoding = {"some_name": {"packed_dtype": "int16"}}
+    first, second = _get_trajectory_segment(100, 100), _get_trajectory_segment(100, 50)
+    first.append_to_netcdf(path, encoding=encoding)
+    second._dims["time"].value[:] += 100
+    second.append_to_netcdf(path)
+
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset.variables["some_name"]
+        assert nc_var.dtype == np.dtype("int16")
+        expected = np.concatenate([first._vars["some_name"].value, second._vars["some_name"].value])
+        assert np.allclose(nc_var[:], expected, atol=nc_var.scale_factor)
+        assert nc_var.actual_range.dtype == np.dtype("f8")
+        assert np.array_equal(nc_var.actual_range, [100.0, 101.0])
+
+    # Values outside the range of the packed variable
+    segment = _get_trajectory_segment(300, 10)
+    with pytest.raises(ValueError):
+        segment.append_to_netcdf(path)
+    with netCDF4.Dataset(path) as dataset:
+        assert dataset.dimensions["time"].size == 150
+
+
+def test_trajectory_append_quantized_and_flags(tmp_path) -> None:
+    path = tmp_path / "trajectory.nc"
+    flag_attrs = {"long_name": "status flag", "flag_values": [0, 1, 2], "flag_meanings": "a b c"}
+    segments = []
+    for start in (0, 100):
+        segment = _get_trajectory_segment(start, 100)
+        flag = np.arange(100, dtype="i8") % 3
+        segment.add_variable(CFVariable("status_flag", flag, "time", attributes=flag_attrs))
+        segments.append(segment)
+    segments[0].append_to_netcdf(path, encoding={"some_name": {"quantize_nsb": 8}})
+    segments[1].append_to_netcdf(path)
+
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset.variables["some_name"]
+        expected = np.concatenate([segment._vars["some_name"].value for segment in segments])
+        assert nc_var.quantization_nsb == 8
+        assert not np.array_equal(nc_var[:], expected)
+        assert np.allclose(nc_var[:], expected, rtol=2.0 ** -8)
+        flag_var = dataset.variables["status_flag"]
+        assert flag_var.dtype == np.dtype("u1")
+        assert np.array_equal(flag_var[:], np.concatenate([segment._vars["status_flag"].value for segment in segments]))
+
+    segment = _get_trajectory_segment(200, 10)
+    segment.add_variable(CFVariable("status_flag", np.full(10, 300, dtype="i8"), "time", attributes=flag_attrs))
+    with pytest.raises(ValueError):
+        segment.append_to_netcdf(path)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the yaml output templates
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pydantic
+import pytest
+
+from cf_data_struct.datamodels import GridVarAttrs
+from cf_data_struct.datastruct import GridCFStruct
+from cf_data_struct.output_templates import (build_struct,
+                                             clear_template_cache,
+                                             load_template)
+
+TEMPLATE = """
+datatype: Grid
+global_attributes:
+  title: Sea ice thickness
+  summary: Monthly gridded sea ice thickness
+dimensions:
+  yc:
+    attributes:
+      long_name: y coordinate
+  xc:
+    attributes:
+      long_name: x coordinate
+variables:
+  sea_ice_thickness:
+    var_id: sit
+    dims: [yc, xc]
+    attribute_type: GridVarAttrs
+    attributes:
+      long_name: sea ice thickness
+      units: m
+      grid_mapping: Lambert_Azimuthal_Grid
+    encoding:
+      packed_dtype: int16
+"""
+
+
+@pytest.fixture
+def template_file(tmp_path):
+    clear_template_cache()
+    filepath = tmp_path / "template.yaml"
+    filepath.write_text(TEMPLATE)
+    yield filepath
+    clear_template_cache()
+
+
+def test_load_template(template_file) -> None:
+    template = load_template(template_file)
+    assert template.global_attributes.summary == "Monthly gridded sea ice thickness"
+    assert template.dimensions["yc"].dims == ["yc"]
+    assert isinstance(template.variables["sea_ice_thickness"].attributes, GridVarAttrs)
+    assert template.encoding == {"sea_ice_thickness": {"packed_dtype": "int16"}}
+    assert load_template(template_file) is template
+
+
+def test_load_template_disk_cache(template_file, tmp_path) -> None:
+    cache_dir = tmp_path / "cache"
+    template = load_template(template_file, cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.pickle"))) == 1
+    clear_template_cache()
+    cached_template = load_template(template_file, cache_dir=cache_dir)
+    assert cached_template is not template
+    assert cached_template == template
+
+
+def test_load_template_invalid(tmp_path) -> None:
+    filepath = tmp_path / "invalid.yaml"
+    filepath.write_text(TEMPLATE.replace("      grid_mapping: Lambert_Azimuthal_Grid\n", ""))
+    with pytest.raises(pydantic.ValidationError):
+        load_template(filepath)
+    with pytest.raises(IOError):
+        load_template(tmp_path / "missing.yaml")
+
+
+@pytest.mark.parametrize("encoding", ["packed_dtype: int16\n      zlibb: true", "packed_dtype: int17"])
+def test_load_template_invalid_encoding(tmp_path, encoding) -> None:
+    filepath = tmp_path / "invalid.yaml"
+    filepath.write_text(TEMPLATE.replace("packed_dtype: int16", encoding))
+    with pytest.raises(pydantic.ValidationError):
+        load_template(filepath)
+
+
+def test_build_struct_to_netcdf(template_file, tmp_path) -> None:
+    template = load_template(template_file)
+    data = {"yc": np.arange(20.0), "xc": np.arange(30.0), "sea_ice_thickness": np.ones((20, 30))}
+    struct = build_struct(template, data)
+    assert isinstance(struct, GridCFStruct)
+    assert struct.variable_ids == ["sit"]
+    path = struct.to_netcdf(tmp_path / "grid.nc", encoding=template.encoding)
+    with netCDF4.Dataset(path) as dataset:
+        assert dataset.summary == "Monthly gridded sea ice thickness"
+        assert dataset.variables["sea_ice_thickness"].dtype == np.dtype("int16")
+    with pytest.raises(ValueError):
+        build_struct(template, {"yc": np.arange(20.0)})
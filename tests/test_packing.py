@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the CF packing engine
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.coding import (get_packing_parameters, pack_array,
+                                   unpack_array)
+from cf_data_struct.datastruct import CFVariable, TrajectoryCFStruct
+
+
+def _get_test_data() -> np.ndarray:
+    value = np.random.default_rng(0).uniform(-5.0, 20.0, size=(200, 30)).astype("f4")
+    value[3, 4] = np.nan
+    return value
+
+
+@pytest.mark.parametrize("dtype", ["int8", "int16", "int32"])
+def test_pack_unpack_round_trip(dtype: str) -> None:
+    value = _get_test_data()
+    params = get_packing_parameters((np.nanmin(value), np.nanmax(value)), dtype=dtype)
+    packed = pack_array(value, params, max_block_bytes=1024)
+    assert packed.dtype == np.dtype(dtype)
+    assert packed[3, 4] == params.missing_value
+    assert packed.min() == params.missing_value
+    assert packed[~np.isnan(value)].min() == params.valid_min
+    unpacked = unpack_array(packed, max_block_bytes=512, **params.attributes)
+    assert np.isnan(unpacked[3, 4])
+    assert np.nanmax(np.abs(unpacked - value)) <= params.scale_factor / 2 * 1.001
+
+
+def test_get_packing_parameters_invalid_dtype() -> None:
+    with pytest.raises(ValueError):
+        get_packing_parameters((0.0, 1.0), dtype="float32")
+
+
+def test_cfvariable_pack_unpack() -> None:
+    value = _get_test_data()
+    var = CFVariable("some_name", value, ("time", "xc"), attributes={"long_name": "some name", "units": "m"})
+    packed = var.pack(dtype="int16")
+    assert packed.datatype == np.dtype("int16")
+    assert packed.attrs.missing_value == -32767
+    assert packed.attrs.units == "m"
+    unpacked = packed.unpack()
+    assert unpacked.attrs.scale_factor is None
+    assert np.nanmax(np.abs(unpacked.value - value)) < 1e-3
+    with pytest.raises(ValueError):
+        unpacked.unpack()
+
+
+def test_to_netcdf_packed_dtype(tmp_path) -> None:
+    value = np.random.default_rng(0).uniform(0.0, 1.0, size=1000)
+    value[10] = np.nan
+    struct = TrajectoryCFStruct(dims=CFVariable("time", np.arange(1000.0), "time"))
+    struct.add_variable(CFVariable("some_name", value, "time"))
+    path = struct.to_netcdf(tmp_path / "packed.nc", encoding={"some_name": {"packed_dtype": "int16"}})
+
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset.variables["some_name"]
+        assert nc_var.dtype == np.dtype("int16")
+        assert nc_var.missing_value.dtype == np.dtype("int16")
+        assert nc_var.scale_factor.dtype == np.dtype("f8")
+        data = nc_var[:]
+        assert data.mask[10]
+        assert np.allclose(data.filled(np.nan), value, atol=nc_var.scale_factor, equal_nan=True)
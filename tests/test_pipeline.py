@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the background export queue
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import asyncio
+import queue
+import threading
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.datastruct import CFVariable, TrajectoryCFStruct
+from cf_data_struct.io import ExportQueue
+
+
+class BlockingTrajectory(TrajectoryCFStruct):
+    """
+    Trajectory whose export waits for an event (to fill the queue)
+    """
+
+    def __init__(self, event: threading.Event, **kwargs) -> None:
+        super(BlockingTrajectory, self).__init__(**kwargs)
+        self.event = event
+
+    def to_netcdf(self, path, **kwargs):
+        self.event.wait(timeout=10)
+        return super(BlockingTrajectory, self).to_netcdf(path, **kwargs)
+
+
+def make_trajectory(n_records: int) -> TrajectoryCFStruct:
+    struct = TrajectoryCFStruct(dims=CFVariable("time", np.arange(float(n_records)), "time"))
+    struct.add_variable(CFVariable("some_name", np.full(n_records, float(n_records)), "time"))
+    return struct
+
+
+def test_export_queue(tmp_path) -> None:
+    with ExportQueue(max_queue_size=1, complevel=1) as export_queue:
+        futures = [export_queue.submit(make_trajectory(n), tmp_path / f"trajectory_{n}.nc") for n in (10, 20, 30)]
+        failed = export_queue.submit(make_trajectory(5), tmp_path / "missing" / "trajectory.nc")
+    assert export_queue.closed
+    assert [future.result() for future in futures] == [tmp_path / f"trajectory_{n}.nc" for n in (10, 20, 30)]
+    with pytest.raises(OSError):
+        failed.result()
+    with netCDF4.Dataset(tmp_path / "trajectory_30.nc") as dataset:
+        assert np.all(dataset.variables["some_name"][:] == 30.0)
+        assert list(dataset.variables["some_name"].actual_range) == [30.0, 30.0]
+    with pytest.raises(RuntimeError):
+        export_queue.submit(make_trajectory(10), tmp_path / "closed.nc")
+
+
+def test_export_queue_backpressure(tmp_path) -> None:
+    event = threading.Event()
+    export_queue = ExportQueue(max_queue_size=1)
+    struct = BlockingTrajectory(event, dims=CFVariable("time", np.arange(10.0), "time"))
+    first = export_queue.submit(struct, tmp_path / "first.nc")
+    # The first product is being written (blocked), the second waits in the queue
+    while not first.running():
+        pass
+    second = export_queue.submit(make_trajectory(10), tmp_path / "second.nc")
+    with pytest.raises(queue.Full):
+        export_queue.submit(make_trajectory(10), tmp_path / "third.nc", timeout=0.05)
+    event.set()
+    export_queue.close()
+    assert first.result().is_file() and second.result().is_file()
+
+
+def test_export_queue_submit_during_close(tmp_path) -> None:
+    event = threading.Event()
+    export_queue = ExportQueue(max_queue_size=1)
+    struct = BlockingTrajectory(event, dims=CFVariable("time", np.arange(10.0), "time"))
+    first = export_queue.submit(struct, tmp_path / "first.nc")
+    while not first.running():
+        pass
+    second = export_queue.submit(make_trajectory(10), tmp_path / "second.nc")
+
+    # The third submit waits for a free queue slot while the queue is closed
+    futures = []
+    thread = threading.Thread(
+        target=lambda: futures.append(export_queue.submit(make_trajectory(20), tmp_path / "third.nc"))
+    )
+    thread.start()
+    while not export_queue._lock.locked():
+        pass
+    closing = threading.Thread(target=export_queue.close)
+    closing.start()
+    event.set()
+    thread.join(timeout=10)
+    closing.join(timeout=10)
+    assert not closing.is_alive()
+    assert first.result(timeout=10).is_file() and second.result(timeout=10).is_file()
+    assert futures[0].result(timeout=10) == tmp_path / "third.nc"
+
+
+def test_export_queue_async(tmp_path) -> None:
+
+    async def produce():
+        async with ExportQueue(max_queue_size=2) as export_queue:
+            futures = [await export_queue.submit_async(make_trajectory(n), tmp_path / f"{n}.nc") for n in range(1, 5)]
+            return await asyncio.gather(*futures)
+
+    paths = asyncio.run(produce())
+    assert paths == [tmp_path / f"{n}.nc" for n in range(1, 5)]
+    assert all(path.is_file() for path in paths)
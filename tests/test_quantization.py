@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the bit rounding quantization
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.coding import bitround_array, significant_digits_to_bits
+from cf_data_struct.datastruct import CFVariable, GridCFStruct
+
+
+def _get_grid(value: np.ndarray, **attributes) -> GridCFStruct:
+    dims = (CFVariable("yc", np.arange(value.shape[0], dtype="f8"), "yc"),
+            CFVariable("xc", np.arange(value.shape[1], dtype="f8"), "xc"))
+    grid = GridCFStruct(dims=dims)
+    grid.add_variable(CFVariable("sea_ice_thickness", value, ("yc", "xc"), attributes={"long_name": "x", **attributes}))
+    return grid
+
+
+@pytest.mark.parametrize("dtype,nsb", [("float32", 7), ("float64", 12), ("float32", 23)])
+def test_bitround_error_bound(dtype: str, nsb: int) -> None:
+    value = np.random.default_rng(0).normal(0.0, 10.0, size=(100, 50)).astype(dtype)
+    value[0, :3] = [np.nan, np.inf, -np.inf]
+    quantized = bitround_array(value, nsb, max_block_bytes=1024)
+    assert np.isnan(quantized[0, 0]) and quantized[0, 1] == np.inf and quantized[0, 2] == -np.inf
+    finite = np.isfinite(value)
+    relative_error = np.abs(quantized[finite] - value[finite]) / np.abs(value[finite])
+    assert np.all(relative_error <= 2.0 ** -(nsb + 1))
+    assert np.array_equal(bitround_array(quantized, nsb), quantized, equal_nan=True)
+    assert not np.shares_memory(quantized, value)
+
+
+def test_significant_digits_to_bits() -> None:
+    assert significant_digits_to_bits(3) == 10
+    with pytest.raises(ValueError):
+        significant_digits_to_bits(0)
+
+
+def test_cfvariable_quantize() -> None:
+    var = CFVariable("sea_ice_thickness", np.linspace(0, 5, 1000), "time")
+    quantized = var.quantize(significant_digits=3)
+    assert quantized.attrs.quantization_nsb == 10
+    assert quantized.attrs.quantization == "quantization_info"
+    assert np.allclose(quantized.value, var.value, rtol=1e-3)
+    with pytest.raises(ValueError):
+        CFVariable("flag", np.zeros(10, dtype="int8"), "time").quantize(nsb=3)
+
+
+def test_write_netcdf_quantized(tmp_path) -> None:
+    value = np.random.default_rng(0).normal(2.0, 0.5, size=(200, 200)).astype("float32")
+    reference = _get_grid(value).to_netcdf(tmp_path / "reference.nc")
+    path = _get_grid(value).to_netcdf(
+        tmp_path / "quantized.nc",
+        encoding={"sea_ice_thickness": {"quantize_nsb": 7}}
+    )
+    assert path.stat().st_size < 0.6 * reference.stat().st_size
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset["sea_ice_thickness"]
+        assert nc_var.getncattr("quantization") == "quantization_info"
+        assert nc_var.quantization_nsb == 7
+        assert dataset["quantization_info"].algorithm == "bitround"
+        assert np.array_equal(nc_var[:], bitround_array(value, 7))
+
+    # Quantization from the variable attributes
+    path = _get_grid(value, quantization_nsb=7).to_netcdf(tmp_path / "attributes.nc")
+    with netCDF4.Dataset(path) as dataset:
+        assert np.array_equal(dataset["sea_ice_thickness"][:], bitround_array(value, 7))
+    assert np.array_equal(value, _get_grid(value)._vars["sea_ice_thickness"].value)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for trajectory collections in contiguous ragged array representation
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct import (CFVariable, TrajectoryCFStruct,
+                            TrajectoryCollectionCFStruct)
+
+ROW_SIZE = [5, 0, 12, 3]
+
+
+def _get_trajectory(start: int, size: int) -> TrajectoryCFStruct:
+    time_attrs = {"long_name": "time", "standard_name": "time", "units": "seconds since 2024-01-01"}
+    time = CFVariable("time", np.arange(start, start + size, dtype="float64"), "time", attributes=time_attrs)
+    trajectory = TrajectoryCFStruct(dims=time)
+    trajectory.add_variable(CFVariable("sea_ice_thickness", np.full(size, start, dtype="float32"), "time"))
+    return trajectory
+
+
+def _get_collection() -> TrajectoryCollectionCFStruct:
+    trajectories = [_get_trajectory(100 * i, size) for i, size in enumerate(ROW_SIZE)]
+    return TrajectoryCollectionCFStruct.from_trajectories(trajectories, trajectory_ids=[11, 12, 13, 14])
+
+
+def test_collection_from_trajectories() -> None:
+    collection = _get_collection()
+    assert collection.n_trajectories == 4
+    assert collection.get_dimensions(("trajectory", "obs")) == (4, 20)
+    assert collection.gattrs.featureType == "trajectory"
+    assert np.array_equal(collection.offsets, [0, 5, 5, 17, 20])
+    assert collection.get_trajectory_slice(-2) == slice(5, 17)
+    assert collection._vars["row_size"].attrs.sample_dimension == "obs"
+    assert collection._dims["trajectory"].attrs.cf_role == "trajectory_id"
+
+    trajectory = collection.get_trajectory(2)
+    assert trajectory.get_dimensions(("time", )) == (12, )
+    assert np.array_equal(trajectory._dims["time"].value, np.arange(200, 212))
+    assert np.all(trajectory._vars["sea_ice_thickness"].value == 200)
+    assert np.shares_memory(trajectory._vars["sea_ice_thickness"].value, collection._vars["sea_ice_thickness"].value)
+    assert [t.get_dimensions(("time", ))[0] for t in collection.iter_trajectories()] == ROW_SIZE
+
+
+def test_collection_validation() -> None:
+    with pytest.raises(ValueError):
+        TrajectoryCollectionCFStruct(trajectory_ids=[1, 2], row_size=[3, -1])
+    with pytest.raises(ValueError):
+        TrajectoryCollectionCFStruct(trajectory_ids=[1, 2], row_size=[3])
+    collection = TrajectoryCollectionCFStruct(trajectory_ids=[1, 2], row_size=[3, 1])
+    with pytest.raises(ValueError):
+        collection.add_variable(CFVariable("sea_ice_thickness", np.zeros(3), "obs"))
+    collection.add_variable(CFVariable("sea_ice_thickness", np.zeros(4), "obs"))
+
+
+def test_collection_to_netcdf(tmp_path) -> None:
+    path = _get_collection().to_netcdf(tmp_path / "collection.nc", max_block_bytes=32)
+    with netCDF4.Dataset(path) as dataset:
+        assert dataset.featureType == "trajectory"
+        assert dataset.dimensions["obs"].size == 20
+        assert "obs" not in dataset.variables
+        assert dataset["row_size"].sample_dimension == "obs"
+        assert list(dataset["row_size"][:]) == ROW_SIZE
+        assert dataset["time"].dimensions == ("obs", )
+        assert np.array_equal(dataset["time"][5:17], np.arange(200, 212))
+
+
+def test_collection_isel_sel() -> None:
+    collection = _get_collection()
+    collection.add_variable(CFVariable("platform_id", np.array([1, 2, 3, 4]), "trajectory"))
+
+    subset = collection.isel(trajectory=slice(1, 3))
+    assert isinstance(subset, TrajectoryCollectionCFStruct)
+    assert np.array_equal(subset.row_size, [0, 12])
+    assert np.array_equal(subset.offsets, [0, 0, 12])
+    assert np.array_equal(subset._vars["platform_id"].value, [2, 3])
+    assert np.shares_memory(subset._vars["sea_ice_thickness"].value, collection._vars["sea_ice_thickness"].value)
+    assert np.array_equal(subset.get_trajectory(1)._dims["time"].value, np.arange(200, 212))
+
+    subset = collection.isel(trajectory=[3, 0])
+    assert np.array_equal(subset._dims["trajectory"].value, [14, 11])
+    assert np.array_equal(subset.row_size, [3, 5])
+    assert subset.get_dimensions(("obs", )) == (8, )
+    expected = np.concatenate([np.full(3, 300), np.full(5, 0)])
+    assert np.array_equal(subset._vars["sea_ice_thickness"].value, expected)
+    assert [t.get_dimensions(("time", ))[0] for t in subset.iter_trajectories()] == [3, 5]
+
+    subset = collection.sel(trajectory=[12, 13])
+    assert np.array_equal(subset.row_size, [0, 12])
+    assert collection.isel(trajectory=[True, False, False, True]).get_dimensions(("obs", )) == (8, )
+    with pytest.raises(ValueError):
+        collection.isel(obs=slice(0, 5))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the (lazy) netCDF reader
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.datamodels import (BasicCFGlobalAttributes, FlagVarAttrs,
+                                       GridFlagVarAttrs, GridVarAttrs,
+                                       TimeVarAttrs)
+from cf_data_struct.datastruct import (CFStructBaseClass, CFVariable,
+                                       GridCFStruct, TrajectoryCFStruct,
+                                       TrajectoryCollectionCFStruct)
+
+
+def _get_grid() -> GridCFStruct:
+    time_attrs = TimeVarAttrs(long_name="time", units="seconds since 1970-01-01", calendar="standard")
+    dims = (CFVariable("time", np.array([1.7e9]), "time", attributes=time_attrs),
+            CFVariable("yc", np.arange(20, dtype="f8"), "yc"),
+            CFVariable("xc", np.arange(30, dtype="f8"), "xc"))
+    grid = GridCFStruct(dims=dims, attributes=BasicCFGlobalAttributes(title="Sea ice thickness", summary="x"))
+    value = np.random.default_rng(0).random((1, 20, 30)).astype("float32")
+    attributes = GridVarAttrs(long_name="sea ice thickness", units="m", grid_mapping="Lambert_Azimuthal_Grid")
+    grid.add_variable(CFVariable("sea_ice_thickness", value, ("time", "yc", "xc"), attributes=attributes))
+    attributes = GridFlagVarAttrs(
+        long_name="sea ice type", flag_values=[0, 1, 2], flag_meanings="open_water fyi myi",
+        grid_mapping="Lambert_Azimuthal_Grid"
+    )
+    flag = np.random.default_rng(1).integers(0, 3, size=(1, 20, 30))
+    grid.add_variable(CFVariable("sea_ice_type", flag, ("time", "yc", "xc"), var_id="sityp", attributes=attributes))
+    grid.add_variable(CFVariable("Lambert_Azimuthal_Grid", np.array(0, dtype="int32"), (), var_id="crs"))
+    return grid
+
+
+def test_read_netcdf_grid(tmp_path) -> None:
+    grid = _get_grid()
+    path = grid.to_netcdf(tmp_path / "grid.nc")
+    struct = CFStructBaseClass.from_netcdf(path)
+
+    assert isinstance(struct, GridCFStruct)
+    assert struct.grid_mapping == "Lambert_Azimuthal_Grid"
+    assert struct.gattrs.title == "Sea ice thickness"
+    assert struct.dims == ["time", "yc", "xc"]
+    assert isinstance(struct._dims["time"].attrs, TimeVarAttrs)
+    assert struct._dims["time"].attrs.calendar == "standard"
+    assert not struct._dims["yc"].is_lazy
+
+    thickness = struct._vars["sea_ice_thickness"]
+    assert thickness.is_lazy
+    assert isinstance(thickness.attrs, GridVarAttrs)
+    assert thickness.attrs.actual_range is not None
+    assert np.array_equal(thickness.value[0, 5:7, :3], grid._vars["sea_ice_thickness"].value[0, 5:7, :3])
+    ice_type = struct._vars["sea_ice_type"]
+    assert isinstance(ice_type.attrs, GridFlagVarAttrs)
+    assert ice_type.datatype == np.dtype("uint8")
+    assert np.array_equal(ice_type.get_flag_mask("myi"), grid._vars["sea_ice_type"].get_flag_mask("myi"))
+    # Variable ids are not stored in the file, colliding abbreviations fall back to the name
+    assert sorted(struct.variable_ids) == ["lag", "sea_ice_type", "sit"]
+
+    # Patch metadata and export to a new file (lazy data is copied block-wise)
+    struct.gattrs.title = "Sea ice thickness (v2)"
+    patched = struct.to_netcdf(tmp_path / "patched.nc")
+    with netCDF4.Dataset(patched) as dataset:
+        assert dataset.title == "Sea ice thickness (v2)"
+        assert np.array_equal(dataset["sea_ice_thickness"][:], grid._vars["sea_ice_thickness"].value)
+        assert dataset["Lambert_Azimuthal_Grid"].ndim == 0
+
+    eager = GridCFStruct.from_netcdf(path, lazy=False)
+    assert not eager._vars["sea_ice_thickness"].is_lazy
+    with pytest.raises(IOError):
+        GridCFStruct.from_netcdf(tmp_path / "missing.nc")
+
+
+def test_read_netcdf_trajectories(tmp_path) -> None:
+    time_attrs = {"long_name": "time", "units": "seconds since 2024-01-01"}
+    time = CFVariable("time", np.arange(10.0), "time", attributes=time_attrs)
+    trajectory = TrajectoryCFStruct(dims=time)
+    attributes = FlagVarAttrs(long_name="status", flag_masks=[1, 2], flag_meanings="a b")
+    trajectory.add_variable(CFVariable("status_flag", np.arange(10) % 4, "time", attributes=attributes))
+    struct = CFStructBaseClass.from_netcdf(trajectory.to_netcdf(tmp_path / "trajectory.nc"))
+    assert isinstance(struct, TrajectoryCFStruct)
+    assert isinstance(struct._vars["status_flag"].attrs, FlagVarAttrs)
+    assert np.array_equal(struct._vars["status_flag"].get_flag_mask("b"), (np.arange(10) % 4) >= 2)
+
+    collection = TrajectoryCollectionCFStruct(trajectory_ids=[11, 12], row_size=[3, 2])
+    collection.add_variable(CFVariable("sea_ice_thickness", np.arange(5.0), "obs"))
+    struct = CFStructBaseClass.from_netcdf(collection.to_netcdf(tmp_path / "collection.nc"))
+    assert isinstance(struct, TrajectoryCollectionCFStruct)
+    assert struct.sample_dim == "obs" and struct.n_trajectories == 2
+    assert np.array_equal(struct._vars["sea_ice_thickness"].value[struct.get_trajectory_slice(1)], [3.0, 4.0])
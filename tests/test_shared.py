@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the shared memory transfer of CF data structures
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import multiprocessing
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+
+from cf_data_struct.datastruct import (CFVariable, GridCFStruct,
+                                       TrajectoryCFStruct,
+                                       TrajectoryCollectionCFStruct)
+from cf_data_struct.datastruct.shared import attach_struct
+
+
+def _get_trajectory() -> TrajectoryCFStruct:
+    time = CFVariable("time", np.arange(1000).astype("datetime64[s]"), "time")
+    struct = TrajectoryCFStruct(dims=time)
+    struct.add_variable(CFVariable("sea_ice_thickness", np.linspace(0, 3, 1000), "time", var_id="sit"))
+    struct.add_variable(CFVariable("flag", np.zeros(1000, dtype="int8"), "time", read_only=True))
+    return struct
+
+
+def _sum_in_child(descriptor) -> float:
+    struct = attach_struct(descriptor)
+    return float(struct._vars["sea_ice_thickness"].value.sum())
+
+
+def test_shared_struct_roundtrip() -> None:
+    struct = _get_trajectory()
+    shared = struct.to_shared_memory()
+    try:
+        assert len(pickle.dumps(shared.descriptor)) < 8192
+        restored = attach_struct(pickle.loads(pickle.dumps(shared.descriptor)))
+        assert restored.datatype == "Trajectory"
+        assert restored.variable_id_dict == struct.variable_id_dict
+        for name, var in struct._vars.items():
+            restored_var = restored._vars[name]
+            assert np.array_equal(restored_var.value, var.value)
+            assert restored_var.value.dtype == var.value.dtype
+            assert restored_var.attrs == var.attrs
+            assert restored_var.read_only == var.read_only
+        assert np.array_equal(restored._dims["time"].value, struct._dims["time"].value)
+
+        # Views on the same buffer, no copies
+        shared_value = restored._vars["sea_ice_thickness"].value
+        shared_value[0] = -1.0
+        assert attach_struct(shared.descriptor)._vars["sea_ice_thickness"].value[0] == -1.0
+        del restored, shared_value
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def test_shared_grid_roundtrip() -> None:
+    dims = (CFVariable("yc", np.arange(20.0), "yc"), CFVariable("xc", np.arange(30.0), "xc"))
+    grid = GridCFStruct(dims=dims)
+    grid.grid_mapping = "polar_stereographic"
+    grid.add_variable(CFVariable("sea_ice_thickness", np.ones((20, 30)), ("yc", "xc")))
+    shared = grid.to_shared_memory()
+    try:
+        restored = attach_struct(shared.descriptor)
+        assert isinstance(restored, GridCFStruct)
+        assert restored.grid_mapping == "polar_stereographic"
+        assert np.array_equal(restored._vars["sea_ice_thickness"].value, grid._vars["sea_ice_thickness"].value)
+        del restored
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def test_shared_collection_roundtrip() -> None:
+    collection = TrajectoryCollectionCFStruct(trajectory_ids=[11, 12, 13], row_size=[4, 0, 6], sample_dim="obs")
+    collection.add_variable(CFVariable("sea_ice_thickness", np.arange(10.0), "obs"))
+    shared = collection.to_shared_memory()
+    try:
+        restored = attach_struct(shared.descriptor)
+        assert isinstance(restored, TrajectoryCollectionCFStruct)
+        assert (restored.instance_dim, restored.sample_dim) == ("trajectory", "obs")
+        assert restored.get_dimensions(("trajectory", "obs")) == (3, 10)
+        assert np.array_equal(restored.offsets, collection.offsets)
+        assert np.array_equal(restored.row_size, [4, 0, 6])
+        thickness = restored._vars["sea_ice_thickness"].value
+        assert np.array_equal(thickness[restored.get_trajectory_slice(2)], np.arange(4.0, 10.0))
+        del restored, thickness
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def test_shared_struct_other_process() -> None:
+    struct = _get_trajectory()
+    shared = struct.to_shared_memory()
+    try:
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            result = pool.apply(_sum_in_child, (shared.descriptor, ))
+        assert np.isclose(result, struct._vars["sea_ice_thickness"].value.sum())
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def test_shared_struct_independent_consumer_exits_first(tmp_path) -> None:
+    # A consumer outside the process tree of the producer (with its own resource tracker)
+    # must not unlink the shared memory block when it exits
+    struct = _get_trajectory()
+    shared = struct.to_shared_memory()
+    try:
+        descriptor_file = tmp_path / "descriptor.pickle"
+        descriptor_file.write_bytes(pickle.dumps(shared.descriptor))
+        script = (
+            "import pickle, sys\n"
+            "from cf_data_struct.datastruct.shared import attach_struct\n"
+            "struct = attach_struct(pickle.loads(open(sys.argv[1], 'rb').read()))\n"
+            "print(float(struct._vars['sea_ice_thickness'].value.sum()))\n"
+        )
+        process = subprocess.run(
+            [sys.executable, "-c", script, str(descriptor_file)], capture_output=True, text=True, check=True
+        )
+        assert np.isclose(float(process.stdout), struct._vars["sea_ice_thickness"].value.sum())
+        assert "leaked" not in process.stderr
+        restored = attach_struct(shared.descriptor)
+        assert np.array_equal(restored._vars["sea_ice_thickness"].value, struct._vars["sea_ice_thickness"].value)
+        del restored
+    finally:
+        shared.close()
+        shared.unlink()
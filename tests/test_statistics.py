@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the variable statistics cache
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import netCDF4
+import numpy as np
+
+from cf_data_struct.datastruct import CFVariable, TrajectoryCFStruct
+from cf_data_struct.datastruct.statistics import compute_statistics
+from cf_data_struct.io.netcdf import get_coverage_attributes
+
+
+def test_compute_statistics() -> None:
+    value = np.arange(100000, dtype="f4").reshape(100, 1000)
+    value[0, 0] = np.nan
+    value[50, 10] = -999.0
+    value[99, 999] = np.nan
+    stats = compute_statistics(value, fill_value=-999.0, max_block_bytes=1024)
+    assert stats.value_range == (1.0, 99998.0)
+    assert stats.nan_count == 2
+    assert stats.fill_count == 1
+    assert stats.valid_count == 100000 - 3
+
+
+def test_compute_statistics_no_valid_data() -> None:
+    stats = compute_statistics(np.full(10, np.nan))
+    assert stats.value_range is None
+    assert stats.nan_count == 10
+
+
+def test_cfvariable_stats_cache() -> None:
+    var = CFVariable("some_name", np.arange(10.0), "time")
+    stats = var.stats
+    assert stats.value_range == (0.0, 9.0)
+    assert var.stats is stats
+    var.value = np.arange(20.0)
+    assert var.stats.value_range == (0.0, 19.0)
+
+
+def test_to_netcdf_coverage_attributes(tmp_path) -> None:
+    time_attrs = {"long_name": "time", "units": "days since 2020-01-01", "calendar": "standard"}
+    struct = TrajectoryCFStruct(dims=CFVariable("time", np.arange(10.0), "time", attributes=time_attrs))
+    lat_attrs = {"long_name": "latitude", "standard_name": "latitude", "units": "degrees_north"}
+    struct.add_variable(CFVariable("lat", np.linspace(60.0, 80.0, 10), "time", attributes=lat_attrs))
+    struct.add_variable(CFVariable("longitude", np.linspace(-10.0, 10.0, 10), "time"))
+    path = struct.to_netcdf(tmp_path / "coverage.nc")
+
+    with netCDF4.Dataset(path) as dataset:
+        assert dataset.geospatial_lat_min == 60.0
+        assert dataset.geospatial_lat_max == 80.0
+        assert dataset.geospatial_lon_min == -10.0
+        assert dataset.time_coverage_start == "2020-01-01T00:00:00Z"
+        assert dataset.time_coverage_end == "2020-01-10T00:00:00Z"
+        assert np.array_equal(dataset.variables["lat"].actual_range, [60.0, 80.0])
+
+
+def test_coverage_attributes_packed_coordinates(tmp_path) -> None:
+    time_attrs = {"long_name": "time", "units": "days since 2020-01-01", "scale_factor": 0.5}
+    struct = TrajectoryCFStruct(dims=CFVariable("time", np.arange(10, dtype="i2"), "time", attributes=time_attrs))
+    lat_attrs = {
+        "long_name": "latitude", "standard_name": "latitude", "scale_factor": 0.01, "add_offset": 70.0
+    }
+    struct.add_variable(CFVariable("lat", np.linspace(-1000, 1000, 10).astype("i2"), "time", attributes=lat_attrs))
+    attributes = get_coverage_attributes(struct)
+    assert np.isclose(attributes["geospatial_lat_min"], 60.0)
+    assert np.isclose(attributes["geospatial_lat_max"], 80.0)
+    assert attributes["time_coverage_end"] == "2020-01-05T12:00:00Z"
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the memory-mapped variable storage
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import gc
+
+import netCDF4
+import numpy as np
+
+from cf_data_struct.datastruct import CFVariable, GridCFStruct
+
+
+def _get_grid(**kwargs) -> GridCFStruct:
+    dims = (CFVariable("yc", np.arange(100.0), "yc"), CFVariable("xc", np.arange(100.0), "xc"))
+    return GridCFStruct(dims=dims, **kwargs)
+
+
+def test_cfvariable_spill(tmp_path) -> None:
+    value = np.random.default_rng(0).random((100, 100))
+    var = CFVariable("some_name", value, ("yc", "xc"), read_only=True)
+    stats = var.stats
+    assert var.spill(tmp_path)
+    assert isinstance(var.value, np.memmap)
+    assert var.read_only
+    assert var.stats is stats
+    assert np.array_equal(var.value, value)
+    assert len(list(tmp_path.glob("some_name_*.dat"))) == 1
+    assert not var.spill(tmp_path)
+    del var
+    gc.collect()
+    assert len(list(tmp_path.glob("*.dat"))) == 0
+
+
+def test_cfvariable_spill_view_keeps_file(tmp_path) -> None:
+    var = CFVariable("some_name", np.arange(10000.0).reshape(100, 100), ("yc", "xc"))
+    assert var.spill(tmp_path)
+    view = np.asarray(var.value[10:20])
+    del var
+    gc.collect()
+    assert len(list(tmp_path.glob("some_name_*.dat"))) == 1
+    assert np.array_equal(view[0], np.arange(1000.0, 1100.0))
+    del view
+    gc.collect()
+    assert len(list(tmp_path.glob("*.dat"))) == 0
+
+
+def test_struct_memory_budget(tmp_path) -> None:
+    struct = _get_grid(memory_budget=200_000, scratch_dir=tmp_path)
+    for i in range(4):
+        struct.add_variable(CFVariable(f"some_name_{i}", np.full((100, 100), float(i)), ("yc", "xc")))
+    assert struct.memory_usage <= 200_000
+    spilled = [name for name, var in struct._vars.items() if isinstance(var.value, np.memmap)]
+    assert len(spilled) == 2
+    path = struct.to_netcdf(tmp_path / "grid.nc")
+    with netCDF4.Dataset(path) as dataset:
+        assert np.all(dataset.variables["some_name_3"][:] == 3.0)
+
+
+def test_struct_netcdf_backed_variable(tmp_path) -> None:
+    struct = _get_grid()
+    struct.add_variable(CFVariable("some_name", np.ones((100, 100)), ("yc", "xc")))
+    path = struct.to_netcdf(tmp_path / "source.nc")
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset.variables["some_name"]
+        nc_var.set_auto_maskandscale(False)
+        target = _get_grid()
+        target.add_variable(CFVariable("some_name", nc_var, ("yc", "xc")))
+        assert target._vars["some_name"].is_lazy
+        assert target.memory_usage == 1600
+        target.to_netcdf(tmp_path / "target.nc")
+    with netCDF4.Dataset(tmp_path / "target.nc") as dataset:
+        assert np.all(dataset.variables["some_name"][:] == 1.0)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the CF time encoding and decoding
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import cftime
+import netCDF4
+import numpy as np
+import pytest
+
+from cf_data_struct.coding import (TimeEncoding, decode_times, encode_times,
+                                   get_time_encoding)
+from cf_data_struct.datastruct import CFVariable, TrajectoryCFStruct
+
+
+def _get_times(unit: str = "s") -> np.ndarray:
+    # Spans a year end and (in the standard calendar) a leap day
+    time = np.datetime64("2023-12-30T06:00:00") + np.arange(0, 90 * 86400, 3601).astype("m8[s]")
+    time = time.astype(f"M8[{unit}]")
+    time[7] = np.datetime64("NaT")
+    return time
+
+
+def _to_cftime(time: np.ndarray, calendar: str) -> list:
+    return [cftime.datetime(*value.astype("M8[s]").item().timetuple()[:6], calendar=calendar) for value in time]
+
+
+@pytest.mark.parametrize("calendar", ["standard", "gregorian", "proleptic_gregorian", "julian", "all_leap", "366_day"])
+def test_time_round_trip(calendar: str) -> None:
+    time = _get_times()
+    encoding = get_time_encoding(time, calendar=calendar, max_block_bytes=1024)
+    assert encoding.units == "seconds since 1970-01-01 00:00:00"
+    assert encoding.dtype == "int32"
+    assert encoding.missing_value == np.iinfo("int32").min + 1
+    encoded = encode_times(time, encoding)
+    assert encoded[7] == encoding.missing_value
+    valid = ~np.isnat(time)
+    reference = cftime.date2num(_to_cftime(time[valid], calendar), encoding.units, calendar=calendar)
+    assert np.array_equal(encoded[valid], reference)
+    decoded = decode_times(encoded, encoding.units, calendar=calendar, missing_value=encoding.missing_value)
+    assert decoded.dtype == np.dtype("M8[s]")
+    assert np.array_equal(decoded, time, equal_nan=True)
+
+
+@pytest.mark.parametrize("calendar", ["noleap", "360_day"])
+def test_time_round_trip_model_calendars(calendar: str) -> None:
+    time = np.array(["2001-01-30T12:00", "2001-02-28T00:00", "2001-03-01T06:30"], dtype="M8[m]")
+    encoding = get_time_encoding(time, units="minutes since 2001-01-01", calendar=calendar)
+    encoded = encode_times(time, encoding)
+    assert np.array_equal(encoded, cftime.date2num(_to_cftime(time, calendar), encoding.units, calendar=calendar))
+    assert np.array_equal(decode_times(encoded, encoding.units, calendar=calendar), time)
+
+    invalid_date = "2000-02-29" if calendar == "noleap" else "2001-01-31"
+    with pytest.raises(ValueError):
+        encode_times(np.array([invalid_date], dtype="M8[D]"), encoding)
+    if calendar == "360_day":
+        # 2001-02-30
+        with pytest.raises(ValueError):
+            decode_times(np.array([59]), "days since 2001-01-01", calendar=calendar)
+
+
+def test_time_standard_calendar_before_reform() -> None:
+    time = np.array(["1500-03-01T12:00", "1582-10-04", "1582-10-15", "2000-01-01"], dtype="M8[h]")
+    encoded = encode_times(time, TimeEncoding(units="hours since 1600-01-01", calendar="standard"))
+    reference = cftime.date2num(_to_cftime(time, "standard"), "hours since 1600-01-01", calendar="standard")
+    assert np.array_equal(encoded, reference)
+    assert encoded[2] - encoded[1] == 24
+    assert np.array_equal(decode_times(encoded, "hours since 1600-01-01"), time)
+
+
+def test_get_time_encoding() -> None:
+    days = np.array(["2000-01-01", "2000-01-03"], dtype="M8[ns]")
+    assert get_time_encoding(days).units == "days since 1970-01-01 00:00:00"
+    milliseconds = np.array(["2000-01-01T00:00:00.5"], dtype="M8[ms]")
+    encoding = get_time_encoding(milliseconds)
+    assert (encoding.units, encoding.dtype) == ("milliseconds since 1970-01-01 00:00:00", "int64")
+    # Given units that cannot represent the values exactly
+    encoding = get_time_encoding(milliseconds, units="seconds since 2000-01-01")
+    assert encoding.dtype == "float64"
+    assert encode_times(milliseconds, encoding)[0] == 0.5
+    with pytest.raises(ValueError):
+        get_time_encoding(milliseconds, units="seconds since 2000-01-01", dtype="int64")
+    with pytest.raises(ValueError):
+        encode_times(milliseconds, TimeEncoding(units="seconds since 2000-01-01", dtype="int64"))
+    with pytest.raises(ValueError):
+        get_time_encoding(milliseconds, calendar="none")
+    with pytest.raises(ValueError):
+        get_time_encoding(milliseconds, units="fortnights since 2000-01-01")
+
+
+def test_decode_times_float() -> None:
+    decoded = decode_times(np.array([0.5, np.nan, 1.25]), "days since 2000-02-28 06:00:00.5", "360_day")
+    expected = np.array(["2000-02-28T18:00:00.5", "NaT", "2000-02-29T12:00:00.5"], dtype="M8[us]")
+    assert np.array_equal(decoded, expected, equal_nan=True)
+
+
+def test_write_netcdf_datetime64(tmp_path) -> None:
+    time = _get_times("ms")
+    attributes = {"long_name": "time", "standard_name": "time", "calendar": "proleptic_gregorian"}
+    struct = TrajectoryCFStruct(dims=CFVariable("time", time, "time", attributes=attributes))
+    struct.add_variable(CFVariable("sea_ice_thickness", np.arange(time.size, dtype="f4"), "time"))
+    path = struct.to_netcdf(tmp_path / "trajectory.nc")
+
+    with netCDF4.Dataset(path) as dataset:
+        nc_var = dataset.variables["time"]
+        assert nc_var.dtype == np.dtype("int32")
+        assert nc_var.units == "seconds since 1970-01-01 00:00:00"
+        assert nc_var.calendar == "proleptic_gregorian"
+        decoded = netCDF4.num2date(nc_var[:], nc_var.units, calendar=nc_var.calendar, only_use_cftime_datetimes=False)
+        assert decoded.mask[7]
+        assert np.array_equal(nc_var.actual_range, encode_times(time[[0, -1]], TimeEncoding(units=nc_var.units)))
+        assert dataset.time_coverage_start == "2023-12-30T06:00:00Z"
+        assert dataset.time_coverage_end == str(time[-1].astype("M8[s]")) + "Z"
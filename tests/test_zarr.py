@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+Software tests using pytests for the Zarr export
+"""
+
+__author__ = "Stefan Hendricks <stefan.hendricks@awi.de>"
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from cf_data_struct.datamodels import FlagVarAttrs
+from cf_data_struct.datastruct import CFVariable, GridCFStruct
+
+zarr = pytest.importorskip("zarr")
+
+
+def _get_grid(shape=(60, 80)) -> GridCFStruct:
+    dims = (CFVariable("yc", np.arange(shape[0], dtype="f8"), "yc"),
+            CFVariable("xc", np.arange(shape[1], dtype="f8"), "xc"))
+    grid = GridCFStruct(dims=dims)
+    grid.gattrs.title = "Sea ice thickness"
+    value = np.random.default_rng(0).normal(2.0, 0.5, size=shape).astype("float32")
+    value[0, 0] = np.nan
+    attributes = {"long_name": "sea ice thickness", "units": "m", "grid_mapping": "Lambert_Azimuthal_Grid"}
+    grid.add_variable(CFVariable("sea_ice_thickness", value, ("yc", "xc"), attributes=attributes))
+    flag = FlagVarAttrs(long_name="status flag", flag_values=[0, 1, 2], flag_meanings="a b c")
+    grid.add_variable(CFVariable("status_flag", np.ones(shape, dtype="int64"), ("yc", "xc"), attributes=flag))
+    return grid
+
+
+@pytest.mark.parametrize("zarr_format", [2, 3])
+def test_write_zarr(tmp_path, zarr_format: int) -> None:
+    if zarr_format == 3 and int(zarr.__version__.split(".")[0]) < 3:
+        pytest.skip("Zarr format 3 requires zarr-python >= 3")
+    grid = _get_grid()
+    path = grid.to_zarr(
+        tmp_path / "grid.zarr",
+        zarr_format=zarr_format,
+        max_workers=4,
+        max_block_bytes=1024,
+        encoding={"sea_ice_thickness": {"chunks": (16, 20)}}
+    )
+    dataset = xr.open_zarr(path, consolidated=True, mask_and_scale=False)
+    variable = dataset["sea_ice_thickness"]
+    assert variable.dims == ("yc", "xc")
+    assert np.array_equal(variable.values, grid._vars["sea_ice_thickness"].value, equal_nan=True)
+    assert variable.attrs["grid_mapping"] == "Lambert_Azimuthal_Grid"
+    assert np.allclose(variable.attrs["actual_range"], grid._vars["sea_ice_thickness"].stats.value_range)
+    assert dataset["status_flag"].dtype == np.dtype("uint8")
+    assert list(dataset["status_flag"].attrs["flag_values"]) == [0, 1, 2]
+    assert dataset.attrs["title"] == "Sea ice thickness"
+    assert zarr.open_array(str(path / "sea_ice_thickness"), mode="r").chunks == (16, 20)
+
+
+def test_write_zarr_quantized(tmp_path) -> None:
+    grid = _get_grid()
+    path = grid.to_zarr(
+        tmp_path / "grid.zarr",
+        access_pattern="map",
+        encoding={"sea_ice_thickness": {"quantize_nsb": 7, "compressor": "blosc"}}
+    )
+    dataset = xr.open_zarr(path)
+    assert dataset["sea_ice_thickness"].attrs["quantization_nsb"] == 7
+    assert dataset["quantization_info"].attrs["algorithm"] == "bitround"
+    with pytest.raises(ValueError):
+        grid.to_zarr(tmp_path / "invalid.zarr", encoding={"sea_ice_thickness": {"zlib": True}})